@@ -1,6 +1,15 @@
 from flask import Flask, jsonify, send_from_directory
 from flask_cors import CORS
 import os
+import database
+import metrics
+import migrations
+import order_store
+from catalog import catalog_cache
+from events import hub
+from db_writer import writer
+import cart_store
+from cart_store import carts
 
 app = Flask(__name__, static_folder='front', static_url_path='')
 
@@ -48,10 +57,45 @@ def api_home():
             'group_orders': '/group_orders',
             'partner_applications': '/partners',
             'restaurant_menu': '/restaurant-menu',
-            'cart': '/cart'
+            'cart': '/cart',
+            'images': '/images'
         }
     })
 
+# Runtime statistics (connection pool saturation etc.)
+COMPONENT_STATS = {
+    'db_pool': database.pool.stats,
+    'catalog_cache': catalog_cache.stats,
+    'event_hub': hub.stats,
+    'db_writer': writer.stats,
+    'transactions': database.transaction_stats,
+    'carts': carts.stats,
+    'cart_sweeper': cart_store.sweeper.stats
+}
+
+@app.route('/api/stats')
+def api_stats():
+    return jsonify({name: stats() for name, stats in COMPONENT_STATS.items()})
+
+# Per-route latency, status and size metrics plus the component stats, in
+# Prometheus text format at /metrics
+metrics.init_app(app, COMPONENT_STATS)
+
+# Request-scoped database connections are returned to the pool on teardown
+database.init_app(app)
+
+# Bring the schema up to date on startup (set YALLAORDER_AUTO_MIGRATE=0 to
+# only migrate explicitly with `flask db-upgrade`)
+migrations.init_app(app)
+if os.environ.get('YALLAORDER_AUTO_MIGRATE', '1') != '0':
+    migrations.upgrade()
+
+# `flask reconcile-order-counts` verifies the per-status order counters
+order_store.init_app(app)
+
+# Abandoned carts are swept in the background (and by `flask sweep-carts`)
+cart_store.init_app(app)
+
 # Import routes
 from routes.user_routes import user_bp
 from routes.restaurant_routes import restaurant_bp
@@ -61,6 +105,7 @@ from routes.group_order_routes import group_order_bp
 from routes.partner_routes import partner_app_bp
 from routes.restaurant_menu_routes import restaurant_menu_bp
 from routes.cart_routes import cart_bp
+from routes.image_routes import image_bp
 
 # Register blueprints
 app.register_blueprint(user_bp, url_prefix='/users')
@@ -71,6 +116,7 @@ app.register_blueprint(group_order_bp, url_prefix='/group_orders')
 app.register_blueprint(partner_app_bp, url_prefix='/partners')
 app.register_blueprint(restaurant_menu_bp, url_prefix='/restaurant-menu')
 app.register_blueprint(cart_bp, url_prefix='/cart')
+app.register_blueprint(image_bp, url_prefix='/images')
 
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,175 @@
+"""Optional ASGI entry point.
+
+    pip install -r requirements-asgi.txt
+    uvicorn asgi:app
+
+The Server-Sent Events streams and the pending-order badge (the long-lived
+and the most frequently polled requests) are answered by async handlers on
+the event loop, reading SQLite through aiosqlite. One process can then hold
+many open dashboard and tracking connections without a thread for each.
+Every other endpoint is served by the unchanged Flask app, running on a
+pool of worker threads. Slow handlers such as password hashing keep one of
+those threads busy, but they no longer hold up the event loop or the
+streams.
+
+`python app.py` keeps working as before; nothing here is imported by it.
+"""
+import asyncio
+import os
+import sqlite3
+from contextlib import asynccontextmanager
+
+try:
+    import aiosqlite
+    from a2wsgi import WSGIMiddleware
+    from starlette.applications import Starlette
+    from starlette.responses import JSONResponse, StreamingResponse
+    from starlette.routing import Mount, Route
+except ImportError as e:  # optional dependencies
+    raise ImportError('The ASGI entry point needs the packages in requirements-asgi.txt') from e
+
+import database
+from app import app as flask_app
+from events import hub, HubFull, restaurant_channel, order_channel
+from order_store import ORDER_COUNT_QUERY
+from routes.order_routes import (
+    STATUS_EVENTS_LIMIT, STATUS_EVENTS_QUERY, RESTAURANT_STATUSES_QUERY,
+    with_order_status, event_id_param
+)
+
+ASYNC_POOL_SIZE = int(os.environ.get('YALLAORDER_ASYNC_POOL_SIZE', 4))
+# Threads running the Flask app
+WSGI_THREADS = int(os.environ.get('YALLAORDER_WSGI_THREADS', 16))
+
+# The Flask app sets these through flask_cors; the async routes bypass it
+CORS_HEADERS = {'Access-Control-Allow-Origin': '*'}
+
+
+class AsyncConnectionPool:
+    """Fixed set of aiosqlite connections shared by the async handlers.
+
+    Each aiosqlite connection runs its queries on its own thread, so a
+    handler awaiting the database never blocks the event loop.
+    """
+
+    def __init__(self, db_name=None, size=ASYNC_POOL_SIZE):
+        self.db_name = db_name or database.DB_NAME
+        self.size = size
+        self._idle = None
+
+    async def open(self):
+        self._idle = asyncio.LifoQueue()
+        for _ in range(self.size):
+            conn = await aiosqlite.connect(self.db_name)
+            conn.row_factory = sqlite3.Row
+            for pragma in database.PRAGMAS:
+                await conn.execute(pragma)
+            self._idle.put_nowait(conn)
+
+    @asynccontextmanager
+    async def connection(self):
+        conn = await self._idle.get()
+        try:
+            yield conn
+        finally:
+            self._idle.put_nowait(conn)
+
+    async def close(self):
+        while not self._idle.empty():
+            await self._idle.get_nowait().close()
+
+
+db = AsyncConnectionPool()
+
+
+def event_stream(subscription):
+    return StreamingResponse(subscription, media_type='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+        **CORS_HEADERS
+    })
+
+
+def streams_full():
+    return JSONResponse({'error': 'Too many open streams, poll instead'}, status_code=503,
+                        headers={'Retry-After': '30', **CORS_HEADERS})
+
+
+# GET /restaurants/orders/<id>/pending-count
+async def pending_orders_count(request):
+    try:
+        async with db.connection() as conn:
+            rows = await conn.execute_fetchall(
+                ORDER_COUNT_QUERY, (request.path_params['restaurant_id'], 'pending')
+            )
+        return JSONResponse({'count': rows[0]['count'] if rows else 0}, headers=CORS_HEADERS)
+
+    except Exception as e:
+        print(f"Error getting pending count: {str(e)}")
+        return JSONResponse({'error': str(e)}, status_code=500, headers=CORS_HEADERS)
+
+
+# GET /restaurants/orders/<id>/stream
+async def stream_restaurant_orders(request):
+    try:
+        subscription = hub.subscribe_async(
+            restaurant_channel(request.path_params['restaurant_id']),
+            request.headers.get('Last-Event-ID')
+        )
+    except HubFull:
+        return streams_full()
+    return event_stream(subscription)
+
+
+# GET /orders/<id>/events/stream
+async def stream_order_status_events(request):
+    order_id = request.path_params['order_id']
+    try:
+        async with db.connection() as conn:
+            found = await conn.execute_fetchall('SELECT 1 FROM orders WHERE id = ?', (order_id,))
+        if not found:
+            return JSONResponse({'error': 'Order not found'}, status_code=404, headers=CORS_HEADERS)
+    except Exception as e:
+        print(f"Error opening order status stream: {str(e)}")
+        return JSONResponse({'error': str(e)}, status_code=500, headers=CORS_HEADERS)
+
+    after_id = event_id_param(request.headers.get('Last-Event-ID') or request.query_params.get('after'))
+
+    async def fetch(after):
+        async with db.connection() as conn:
+            events = [dict(row) for row in await conn.execute_fetchall(
+                STATUS_EVENTS_QUERY, (order_id, after, STATUS_EVENTS_LIMIT)
+            )]
+            if events:
+                statuses = [row['status'] for row in await conn.execute_fetchall(
+                    RESTAURANT_STATUSES_QUERY, (order_id,)
+                )]
+                with_order_status(events, statuses)
+        return [(event['id'], 'status', event) for event in events]
+
+    try:
+        subscription = hub.subscribe_polled_async(order_channel(order_id), fetch, after_id)
+    except HubFull:
+        return streams_full()
+    return event_stream(subscription)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    await db.open()
+    try:
+        yield
+    finally:
+        await db.close()
+
+
+app = Starlette(
+    routes=[
+        Route('/restaurants/orders/{restaurant_id:int}/pending-count', pending_orders_count),
+        Route('/restaurants/orders/{restaurant_id:int}/stream', stream_restaurant_orders),
+        Route('/orders/{order_id:int}/events/stream', stream_order_status_events),
+        # Everything else: the Flask app, on worker threads
+        Mount('/', WSGIMiddleware(flask_app, workers=WSGI_THREADS)),
+    ],
+    lifespan=lifespan,
+)
@@ -0,0 +1,13 @@
+"""Benchmarks for the YallaOrder API.
+
+    python -m benchmarks --scale small                  # run every case
+    python -m benchmarks --scale small --save           # ...and store the baseline
+    python -m benchmarks --scale small --compare        # ...or compare against it
+    python -m benchmarks --only cart_bp                 # one blueprint (or a case name)
+
+The first run at a scale generates its dataset (benchmarks.dataset) under
+--data-dir and reuses it afterwards. Baselines are JSON files, by default
+benchmarks/baselines/<scale>.json; --compare exits 1 if any case's p95
+latency grew by more than 20% (and 0.5 ms) or it runs at least one more
+query per request than before.
+"""
@@ -0,0 +1,59 @@
+import argparse
+import os
+import sys
+
+parser = argparse.ArgumentParser(prog='python -m benchmarks', description='Benchmark every YallaOrder endpoint.')
+parser.add_argument('--scale', default='small', help='tiny, small, medium or large (default: small)')
+parser.add_argument('--seed', type=int, default=1, help='Dataset seed (default: 1)')
+parser.add_argument('--iterations', type=int, default=200, help='Timed requests per case (default: 200)')
+parser.add_argument('--warmup', type=int, default=20, help='Untimed requests per case first (default: 20)')
+parser.add_argument('--only', help='Run only the cases of this blueprint, or whose name contains this')
+parser.add_argument('--data-dir', default=os.path.join('benchmarks', 'data'),
+                    help='Where generated datasets are kept (default: benchmarks/data)')
+parser.add_argument('--baseline', help='Baseline file (default: benchmarks/baselines/<scale>.json)')
+parser.add_argument('--save', action='store_true', help='Save this run as the baseline')
+parser.add_argument('--compare', action='store_true', help='Compare this run against the baseline')
+parser.add_argument('--threshold', type=float, default=0.2,
+                    help='p95 growth that counts as a regression (default: 0.2 = 20%%)')
+args = parser.parse_args()
+
+# The app reads its configuration on import, so point it at the benchmark
+# database and media first. Write cases change the database, so every run
+# works on a fresh copy of the generated dataset. The sweeper would delete
+# the generated carts, and a long flush interval keeps write-behind out of
+# the timings.
+run_path = os.path.join(args.data_dir, f'run-{args.scale}.db')
+os.environ['YALLAORDER_DB'] = run_path
+os.environ['YALLAORDER_MEDIA'] = os.path.join(args.data_dir, 'media')
+os.environ['YALLAORDER_CART_SWEEP_SECONDS'] = '0'
+os.environ.setdefault('YALLAORDER_CART_FLUSH_SECONDS', '60')
+
+from benchmarks import dataset
+
+if args.scale not in dataset.SCALES:
+    parser.error(f'unknown scale {args.scale!r}; choose from {", ".join(dataset.SCALES)}')
+
+dataset.fresh_copy(dataset.ensure(args.data_dir, args.scale, args.seed), run_path)
+
+from app import app
+from benchmarks import runner
+
+report = runner.run(app, run_path, args.scale, dataset.SCALES[args.scale], seed=args.seed,
+                    iterations=args.iterations, warmup=args.warmup, only=args.only)
+
+failed = [name for name, result in report['results'].items()
+          if any(not code.startswith('2') for code in result['statuses'])]
+if failed:
+    print(f"\nNon-2xx responses in: {', '.join(failed)}")
+
+baseline = args.baseline or os.path.join('benchmarks', 'baselines', f'{args.scale}.json')
+if args.save:
+    os.makedirs(os.path.dirname(baseline), exist_ok=True)
+    runner.save(report, baseline)
+    print(f'\nSaved baseline to {baseline}')
+if args.compare:
+    regressions = runner.compare(report, baseline, factor=1 + args.threshold)
+    if regressions:
+        print(f'\n{len(regressions)} regression(s)')
+        sys.exit(1)
+    print('\nNo regressions')
@@ -0,0 +1,406 @@
+"""One benchmark case per endpoint, grouped by blueprint.
+
+A case builds the request for iteration i: build(ctx, i) returns
+(path, json_body). Anything it does itself (creating the row a delete
+will remove, filling a cart before checkout) is setup and is not timed.
+Cases run in the order they are registered here, so the read cases see the
+generated data before the write cases add to it.
+
+The two Server-Sent Events streams are not benchmarked: a stream stays
+open for minutes, so its request latency means nothing.
+"""
+from benchmarks import dataset
+
+
+class Case:
+    __slots__ = ('blueprint', 'name', 'method', 'build')
+
+    def __init__(self, blueprint, name, method, build):
+        self.blueprint = blueprint
+        self.name = name
+        self.method = method
+        self.build = build
+
+
+CASES = []
+
+
+def case(blueprint, method, name):
+    def register(build):
+        CASES.append(Case(blueprint, f'{method} {name}', method, build))
+        return build
+    return register
+
+
+class Context:
+    """What the cases know about the dataset, plus helpers for setup."""
+
+    def __init__(self, client, db, scale, rng):
+        self.client = client
+        # Separate connection for setup writes and lookups
+        self.db = db
+        self.scale = scale
+        self.rng = rng
+
+    def restaurant(self):
+        return self.rng.randint(1, self.scale['restaurants'])
+
+    def menu_item(self, restaurant_id=None):
+        restaurant_id = restaurant_id or self.restaurant()
+        per_restaurant = self.scale['menu_items_per_restaurant']
+        return restaurant_id, (restaurant_id - 1) * per_restaurant + self.rng.randint(1, per_restaurant)
+
+    def user(self):
+        return self.rng.randint(1, self.scale['users'])
+
+    def order(self, group=False):
+        every = self.scale['group_every']
+        if group:
+            return every * self.rng.randint(1, self.scale['orders'] // every)
+        order_id = self.rng.randint(1, self.scale['orders'])
+        return order_id + 1 if dataset.is_group_order(order_id, self.scale) else order_id
+
+    def stored_cart(self):
+        return f"bench-cart-{self.rng.randint(1, self.scale['carts'])}"
+
+    def order_items(self, count=2):
+        items = []
+        restaurant_id = self.restaurant()
+        for _ in range(count):
+            restaurant_id, menu_item_id = self.menu_item(restaurant_id)
+            price = self.db.execute('SELECT price FROM menu_items WHERE id = ?', (menu_item_id,)).fetchone()[0]
+            items.append({'menu_item_id': menu_item_id, 'restaurant_id': restaurant_id,
+                          'quantity': 1, 'price': price, 'subtotal': price})
+        return items
+
+
+# ---------- restaurant_bp ----------
+
+@case('restaurant_bp', 'GET', '/restaurants/')
+def list_restaurants(ctx, i):
+    return '/restaurants/?limit=50', None
+
+
+@case('restaurant_bp', 'GET', '/restaurants/<id>')
+def get_restaurant(ctx, i):
+    return f'/restaurants/{ctx.restaurant()}', None
+
+
+@case('restaurant_bp', 'GET', '/restaurants/search')
+def search_restaurants(ctx, i):
+    return f"/restaurants/search?q={ctx.rng.choice(dataset.DISHES)[:4]}", None
+
+
+@case('restaurant_bp', 'GET', '/restaurants/orders/<id>')
+def restaurant_orders(ctx, i):
+    return f'/restaurants/orders/{ctx.restaurant()}?limit=50', None
+
+
+@case('restaurant_bp', 'GET', '/restaurants/orders/<id>?status=pending')
+def restaurant_pending_orders(ctx, i):
+    return f'/restaurants/orders/{ctx.restaurant()}?status=pending,preparing', None
+
+
+@case('restaurant_bp', 'GET', '/restaurants/orders/<id>/pending-count')
+def pending_count(ctx, i):
+    return f'/restaurants/orders/{ctx.restaurant()}/pending-count', None
+
+
+@case('restaurant_bp', 'POST', '/restaurants/orders/update/<id>')
+def update_order_status(ctx, i):
+    restaurant_order_id = ctx.db.execute(
+        'SELECT id FROM restaurant_orders ORDER BY id DESC LIMIT 1 OFFSET ?', (i % 500,)
+    ).fetchone()[0]
+    return (f'/restaurants/orders/update/{restaurant_order_id}',
+            {'status': dataset.STATUSES[i % 4]})
+
+
+# ---------- restaurant_menu_bp ----------
+
+@case('restaurant_menu_bp', 'GET', '/restaurant-menu/<id>')
+def restaurant_menu(ctx, i):
+    return f'/restaurant-menu/{ctx.restaurant()}', None
+
+
+@case('restaurant_menu_bp', 'GET', '/restaurant-menu/item/<id>')
+def restaurant_menu_item(ctx, i):
+    return f'/restaurant-menu/item/{ctx.menu_item()[1]}', None
+
+
+@case('restaurant_menu_bp', 'GET', '/restaurant-menu/search')
+def search_menu(ctx, i):
+    return f"/restaurant-menu/search?q={ctx.rng.choice(dataset.DISHES)[:5]}", None
+
+
+# ---------- menu_bp ----------
+
+@case('menu_bp', 'GET', '/menu/list/<id>')
+def list_menu(ctx, i):
+    return f'/menu/list/{ctx.restaurant()}', None
+
+
+@case('menu_bp', 'GET', '/menu/item/<id>')
+def get_menu_item(ctx, i):
+    return f'/menu/item/{ctx.menu_item()[1]}', None
+
+
+@case('menu_bp', 'POST', '/menu/add')
+def add_menu_item(ctx, i):
+    return '/menu/add', {'restaurant_id': ctx.restaurant(), 'name': f'Bench dish {i}',
+                         'description': 'Added by the benchmark', 'price': 42.5}
+
+
+@case('menu_bp', 'PUT', '/menu/edit/<id>')
+def edit_menu_item(ctx, i):
+    restaurant_id, menu_item_id = ctx.menu_item()
+    return f'/menu/edit/{menu_item_id}', {'name': f'Edited dish {i}', 'description': 'Edited',
+                                          'price': 50 + i % 20}
+
+
+@case('menu_bp', 'DELETE', '/menu/delete/<id>')
+def delete_menu_item(ctx, i):
+    cursor = ctx.db.execute(
+        'INSERT INTO menu_items (restaurant_id, name, price) VALUES (?, ?, ?)',
+        (ctx.restaurant(), f'Doomed dish {i}', 10)
+    )
+    ctx.db.commit()
+    return f'/menu/delete/{cursor.lastrowid}', None
+
+
+# ---------- cart_bp ----------
+
+@case('cart_bp', 'POST', '/cart/add')
+def cart_add(ctx, i):
+    restaurant_id, menu_item_id = ctx.menu_item()
+    return '/cart/add', {'cart_uuid': f'bench-live-{i % 100}', 'menu_item_id': menu_item_id,
+                         'restaurant_id': restaurant_id, 'quantity': 1}
+
+
+@case('cart_bp', 'POST', '/cart/view')
+def cart_view(ctx, i):
+    return '/cart/view', {'cart_uuid': f'bench-live-{i % 100}'}
+
+
+@case('cart_bp', 'POST', '/cart/view (stored cart)')
+def cart_view_stored(ctx, i):
+    return '/cart/view', {'cart_uuid': ctx.stored_cart()}
+
+
+@case('cart_bp', 'POST', '/cart/count')
+def cart_count(ctx, i):
+    return '/cart/count', {'cart_uuid': f'bench-live-{i % 100}'}
+
+
+@case('cart_bp', 'POST', '/cart/summary')
+def cart_summary(ctx, i):
+    return '/cart/summary', {'cart_uuid': f'bench-live-{i % 100}'}
+
+
+@case('cart_bp', 'POST', '/cart/snapshot')
+def cart_snapshot(ctx, i):
+    return '/cart/snapshot', {'cart_uuid': f'bench-live-{i % 100}'}
+
+
+@case('cart_bp', 'PUT', '/cart/update')
+def cart_update(ctx, i):
+    cart_uuid = f'bench-live-{i % 100}'
+    items = ctx.client.post('/cart/view', json={'cart_uuid': cart_uuid}).json['items']
+    return '/cart/update', {'cart_uuid': cart_uuid, 'cart_item_id': items[0]['id'], 'quantity': 2 + i % 3}
+
+
+@case('cart_bp', 'POST', '/cart/batch')
+def cart_batch(ctx, i):
+    operations = []
+    for _ in range(3):
+        restaurant_id, menu_item_id = ctx.menu_item()
+        operations.append({'op': 'add', 'menu_item_id': menu_item_id, 'restaurant_id': restaurant_id})
+    operations.append({'op': 'update', 'cart_item_id': operations[0]['menu_item_id'], 'quantity': 2})
+    return '/cart/batch', {'cart_uuid': f'bench-batch-{i}', 'operations': operations}
+
+
+@case('cart_bp', 'DELETE', '/cart/remove')
+def cart_remove(ctx, i):
+    cart_uuid = f'bench-live-{i % 100}'
+    items = ctx.client.post('/cart/view', json={'cart_uuid': cart_uuid}).json['items']
+    if not items:
+        restaurant_id, menu_item_id = ctx.menu_item()
+        ctx.client.post('/cart/add', json={'cart_uuid': cart_uuid, 'menu_item_id': menu_item_id,
+                                           'restaurant_id': restaurant_id})
+        items = ctx.client.post('/cart/view', json={'cart_uuid': cart_uuid}).json['items']
+    return '/cart/remove', {'cart_uuid': cart_uuid, 'cart_item_id': items[0]['id']}
+
+
+@case('cart_bp', 'DELETE', '/cart/clear')
+def cart_clear(ctx, i):
+    return '/cart/clear', {'cart_uuid': f'bench-batch-{i}'}
+
+
+# ---------- order_bp ----------
+
+@case('order_bp', 'GET', '/orders/<id>')
+def get_order(ctx, i):
+    return f'/orders/{ctx.order()}', None
+
+
+@case('order_bp', 'GET', '/orders/summary/<id>')
+def order_summary(ctx, i):
+    return f'/orders/summary/{ctx.order()}', None
+
+
+@case('order_bp', 'GET', '/orders/<id>/events')
+def order_events(ctx, i):
+    return f'/orders/{ctx.order()}/events', None
+
+
+@case('order_bp', 'GET', '/orders/user/id/<id>')
+def orders_by_user(ctx, i):
+    return f'/orders/user/id/{ctx.user()}', None
+
+
+@case('order_bp', 'GET', '/orders/user/phone/<phone>')
+def orders_by_phone(ctx, i):
+    return f'/orders/user/phone/{dataset.user_phone(ctx.user())}', None
+
+
+@case('order_bp', 'POST', '/orders/create')
+def create_order(ctx, i):
+    cart_uuid = f'bench-checkout-{i}'
+    for item in ctx.order_items(2):
+        ctx.client.post('/cart/add', json={'cart_uuid': cart_uuid, 'menu_item_id': item['menu_item_id'],
+                                           'restaurant_id': item['restaurant_id']})
+    return '/orders/create', {'cart_uuid': cart_uuid, 'phone': '01000000000',
+                              'delivery_location': 'Benchmark street', 'customer_name': 'Bench'}
+
+
+@case('order_bp', 'POST', '/orders/place')
+def place_order(ctx, i):
+    return '/orders/place', {'phone': dataset.user_phone(1), 'delivery_location': 'Benchmark street',
+                             'user_id': 1, 'items': ctx.order_items(2)}
+
+
+@case('order_bp', 'POST', '/orders/confirm/<id>')
+def confirm_order(ctx, i):
+    response = ctx.client.post('/orders/place', json={
+        'phone': dataset.user_phone(1), 'delivery_location': 'Benchmark street',
+        'user_id': 1, 'items': ctx.order_items(2)
+    })
+    return f"/orders/confirm/{response.json['order_id']}", None
+
+
+# ---------- group_order_bp ----------
+
+@case('group_order_bp', 'GET', '/group_orders/summary/<id>')
+def group_order_summary(ctx, i):
+    return f'/group_orders/summary/{ctx.order(group=True)}', None
+
+
+@case('group_order_bp', 'POST', '/group_orders/create')
+def create_group_order(ctx, i):
+    members = ['Person 1', 'Person 2', 'Person 3']
+    items = ctx.order_items(6)
+    for index, item in enumerate(items):
+        item['orderedBy'] = members[index % len(members)]
+    return '/group_orders/create', {'phone': '01000000000', 'delivery_location': 'Benchmark street',
+                                    'num_people': len(members), 'members': members, 'items': items}
+
+
+@case('group_order_bp', 'POST', '/group_orders/confirm/<id>')
+def confirm_group_order(ctx, i):
+    # Orders created by the create case are not confirmed yet
+    order_id = ctx.db.execute('''
+        SELECT o.id FROM orders o
+        WHERE o.order_type = 'group'
+          AND NOT EXISTS (SELECT 1 FROM restaurant_orders ro WHERE ro.order_id = o.id)
+        ORDER BY o.id DESC LIMIT 1
+    ''').fetchone()
+    if order_id is None:
+        _, body = create_group_order(ctx, i)
+        order_id = (ctx.client.post('/group_orders/create', json=body).json['order_id'],)
+    return f'/group_orders/confirm/{order_id[0]}', None
+
+
+# ---------- partner_app_bp ----------
+
+@case('partner_app_bp', 'GET', '/partners/applications')
+def partner_applications(ctx, i):
+    return '/partners/applications?limit=50', None
+
+
+@case('partner_app_bp', 'GET', '/partners/statistics')
+def partner_statistics(ctx, i):
+    return '/partners/statistics', None
+
+
+@case('partner_app_bp', 'POST', '/partners/check-status')
+def partner_check_status(ctx, i):
+    return '/partners/check-status', {'email': dataset.restaurant_email(ctx.restaurant())}
+
+
+@case('partner_app_bp', 'POST', '/partners/login')
+def partner_login(ctx, i):
+    restaurant_id = ctx.restaurant()
+    return '/partners/login', {'email': dataset.restaurant_email(restaurant_id),
+                               'password': dataset.partner_password(restaurant_id)}
+
+
+@case('partner_app_bp', 'POST', '/partners/apply')
+def partner_apply(ctx, i):
+    return '/partners/apply', {
+        'manager_name': f'Bench Manager {i}', 'manager_phone': f'0119{i:07d}',
+        'restaurant_name': f'Bench Kitchen {i}', 'restaurant_phone': f'0129{i:07d}',
+        'restaurant_email': f'bench-apply-{i}@bench.yallaorder.test',
+        'address': 'Benchmark street', 'has_license': 'yes'
+    }
+
+
+@case('partner_app_bp', 'PUT', '/partners/applications/<id>/status')
+def partner_status(ctx, i):
+    app_id = ctx.db.execute(
+        "SELECT id FROM partner_applications WHERE status = 'pending' ORDER BY id LIMIT 1"
+    ).fetchone()
+    if app_id is None:
+        return f'/partners/applications/{ctx.restaurant()}/status', {'status': 'approved'}
+    return f'/partners/applications/{app_id[0]}/status', {'status': 'rejected'}
+
+
+@case('partner_app_bp', 'PUT', '/partners/applications/<id>/update')
+def partner_update(ctx, i):
+    restaurant_id = ctx.restaurant()
+    return f'/partners/applications/{restaurant_id}/update', {
+        'manager_name': f'Manager {restaurant_id}', 'restaurant_phone': f'012{restaurant_id:08d}',
+        'hotline': '19000', 'address': 'Benchmark street'
+    }
+
+
+@case('partner_app_bp', 'PUT', '/partners/applications/<id>/change-password')
+def partner_change_password(ctx, i):
+    # Changes the password to what it already is, so logins keep working
+    restaurant_id = ctx.restaurant()
+    password = dataset.partner_password(restaurant_id)
+    return f'/partners/applications/{restaurant_id}/change-password', {
+        'current_password': password, 'new_password': password
+    }
+
+
+# ---------- user_bp ----------
+
+@case('user_bp', 'POST', '/users/login')
+def user_login(ctx, i):
+    return '/users/login', {'phone': dataset.user_phone(ctx.user()), 'password': dataset.PASSWORD}
+
+
+@case('user_bp', 'POST', '/users/register')
+def user_register(ctx, i):
+    return '/users/register', {'first_name': 'Bench', 'last_name': f'User{i}',
+                               'phone': f'0199{i:07d}-{ctx.rng.random():.6f}', 'password': dataset.PASSWORD}
+
+
+# ---------- image_bp ----------
+
+@case('image_bp', 'GET', '/images/<key>')
+def get_image(ctx, i):
+    image = ctx.db.execute(
+        'SELECT image FROM menu_items WHERE image IS NOT NULL ORDER BY id LIMIT 1 OFFSET ?',
+        (i % max(1, ctx.scale['images']),)
+    ).fetchone()
+    return image[0], None
@@ -0,0 +1,293 @@
+"""Deterministic synthetic YallaOrder databases for benchmarking.
+
+generate(path, scale) builds a database with the full current schema (it
+runs the migrations) and fills it from a seeded random generator, so the
+same scale and seed always produce the same rows. The layout is regular
+enough for the benchmark cases to address rows without querying for them:
+
+* restaurants are the approved partner applications 1..restaurants, each
+  with menu_items_per_restaurant menu items (restaurant r owns items
+  (r - 1) * M + 1 .. r * M); pending applications follow them;
+* user u has phone user_phone(u) and password PASSWORD;
+* every group_every-th order is a group order; the others belong to users;
+* partner r logs in with restaurant_email(r) / partner_password(r).
+
+Menu images are real PNG files in the image store (about IMAGE_SIZES bytes,
+shared by several items each), so image and menu responses have realistic
+sizes.
+"""
+import base64
+import hashlib
+import os
+import random
+import sqlite3
+import struct
+import zlib
+from datetime import datetime, timedelta
+
+import migrations
+
+SCALES = {
+    'tiny': dict(restaurants=5, menu_items_per_restaurant=10, users=50, orders=500,
+                 group_every=10, pending_applications=5, carts=20, images=5),
+    'small': dict(restaurants=50, menu_items_per_restaurant=30, users=2000, orders=20000,
+                  group_every=10, pending_applications=20, carts=500, images=20),
+    'medium': dict(restaurants=200, menu_items_per_restaurant=40, users=20000, orders=500000,
+                   group_every=10, pending_applications=50, carts=5000, images=50),
+    'large': dict(restaurants=1000, menu_items_per_restaurant=50, users=200000, orders=3000000,
+                  group_every=10, pending_applications=200, carts=50000, images=100),
+}
+
+# Image sizes in bytes cycled through by the generated images (thumbnail-ish
+# to full-size phone photos)
+IMAGE_SIZES = (40_000, 120_000, 350_000, 800_000)
+
+PASSWORD = 'benchmark-password'
+STATUSES = ('pending', 'preparing', 'on_the_way', 'delivered', 'cancelled')
+# Orders are spread over the year before this fixed instant
+END = datetime(2025, 6, 30, 20, 0, 0)
+CHUNK = 10000
+
+DISHES = ('Koshari', 'Molokhia', 'Fattah', 'Hawawshi', 'Ful Medames', 'Taameya', 'Shawarma',
+          'Kofta', 'Mahshi', 'Feteer', 'Basbousa', 'Om Ali', 'Falafel Wrap', 'Grilled Chicken',
+          'Margherita Pizza', 'Beef Burger', 'Caesar Salad', 'Lentil Soup', 'Rice Pudding', 'Mango Juice')
+ADJECTIVES = ('Classic', 'Spicy', 'Family', 'Mini', 'Special', 'Crispy', 'Vegetarian', 'Double')
+AREAS = ('Maadi', 'Zamalek', 'Heliopolis', 'Dokki', 'Nasr City', 'New Cairo', 'Mohandessin', 'Giza')
+
+
+def user_phone(user_id):
+    return f'010{user_id:08d}'
+
+
+def restaurant_email(restaurant_id):
+    return f'restaurant{restaurant_id}@bench.yallaorder.test'
+
+
+def partner_password(restaurant_id):
+    return f'partner-{restaurant_id}'
+
+
+def restaurant_of(menu_item_id, scale):
+    return (menu_item_id - 1) // scale['menu_items_per_restaurant'] + 1
+
+
+def is_group_order(order_id, scale):
+    return order_id % scale['group_every'] == 0
+
+
+def password_hash(password, salt):
+    """werkzeug-compatible scrypt hash with a fixed salt (keeps the data deterministic)."""
+    digest = hashlib.scrypt(password.encode(), salt=salt.encode(), n=2 ** 15, r=8, p=1,
+                            maxmem=132 * 2 ** 15 * 8).hex()
+    return f'scrypt:32768:8:1${salt}${digest}'
+
+
+def dataset_path(directory, scale_name, seed):
+    return os.path.join(directory, f'bench-{scale_name}-{seed}.db')
+
+
+def png_bytes(size, rng):
+    """An uncompressed RGB PNG of random pixels, about size bytes long."""
+    width = 256
+    height = max(1, size // (width * 3 + 1))
+    raw = b''.join(b'\x00' + rng.randbytes(width * 3) for _ in range(height))
+
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+    return (b'\x89PNG\r\n\x1a\n'
+            + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+            + chunk(b'IDAT', zlib.compress(raw, 0))
+            + chunk(b'IEND', b''))
+
+
+def generate(path, scale, seed=1, log=print):
+    """Create the database at path (which must not exist) for a scale dict."""
+    import image_store
+
+    rng = random.Random(seed)
+    migrations.upgrade(path, log=lambda message: None)
+
+    conn = sqlite3.connect(path)
+    conn.execute('PRAGMA synchronous = OFF')
+    conn.execute('BEGIN')
+
+    restaurants = scale['restaurants']
+    per_restaurant = scale['menu_items_per_restaurant']
+    menu_item_count = restaurants * per_restaurant
+
+    log(f'  {restaurants} restaurants, {menu_item_count} menu items')
+    conn.executemany('''
+        INSERT INTO partner_applications (
+            id, manager_name, manager_phone, restaurant_name, restaurant_phone, restaurant_email,
+            address, hotline, has_license, status, applied_at, reviewed_at, temp_password
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, 'yes', ?, ?, ?, ?)
+    ''', [(
+        r, f'Manager {r}', f'011{r:08d}',
+        f'{rng.choice(ADJECTIVES)} {rng.choice(DISHES)} House {r}', f'012{r:08d}', restaurant_email(r),
+        f'{rng.randint(1, 200)} Street {r}, {rng.choice(AREAS)}', f'19{r % 1000:03d}',
+        'approved' if r <= restaurants else 'pending',
+        (END - timedelta(days=rng.randint(0, 365))).strftime('%Y-%m-%d %H:%M:%S'),
+        END.strftime('%Y-%m-%d %H:%M:%S') if r <= restaurants else None,
+        partner_password(r) if r <= restaurants else None,
+    ) for r in range(1, restaurants + scale['pending_applications'] + 1)])
+
+    # Image files shared by the menu items
+    images = []
+    for i in range(scale['images']):
+        data = png_bytes(IMAGE_SIZES[i % len(IMAGE_SIZES)], rng)
+        images.append(image_store.URL_PREFIX + image_store.store_data_url(
+            'data:image/png;base64,' + base64.b64encode(data).decode()
+        ))
+
+    prices = {}
+    menu_rows = []
+    for item_id in range(1, menu_item_count + 1):
+        price = round(rng.uniform(15, 250), 2)
+        prices[item_id] = price
+        menu_rows.append((
+            item_id, restaurant_of(item_id, scale), f'{rng.choice(ADJECTIVES)} {rng.choice(DISHES)}',
+            f'Freshly made {rng.choice(DISHES).lower()} with {rng.choice(DISHES).lower()} on the side',
+            price, images[item_id % len(images)] if images and item_id % 4 else None,
+        ))
+    conn.executemany('''
+        INSERT INTO menu_items (id, restaurant_id, name, description, price, image)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', menu_rows)
+
+    log(f"  {scale['users']} users")
+    hashed = password_hash(PASSWORD, 'benchmark')
+    for start in range(1, scale['users'] + 1, CHUNK):
+        conn.executemany('''
+            INSERT INTO users (id, first_name, last_name, phone, password, created_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', [(u, f'User{u}', f'Bench{u % 97}', user_phone(u), hashed, END.strftime('%Y-%m-%d %H:%M:%S'))
+              for u in range(start, min(start + CHUNK, scale['users'] + 1))])
+
+    log(f"  {scale['orders']} orders")
+    span = 365 * 24 * 3600
+    group_order_id = group_member_id = order_item_id = 0
+    for start in range(1, scale['orders'] + 1, CHUNK):
+        orders, order_items, restaurant_orders = [], [], []
+        group_orders, group_members, group_items = [], [], []
+        for order_id in range(start, min(start + CHUNK, scale['orders'] + 1)):
+            # Older orders first, so ids and created_at grow together
+            created_at = END - timedelta(seconds=span * (1 - order_id / scale['orders']) + rng.random())
+            group = is_group_order(order_id, scale)
+            order_restaurants = rng.sample(range(1, restaurants + 1), min(restaurants, 2 if group else 1))
+            items = []
+            for _ in range(rng.randint(3, 8) if group else rng.randint(1, 4)):
+                restaurant_id = rng.choice(order_restaurants)
+                item_id = (restaurant_id - 1) * per_restaurant + rng.randint(1, per_restaurant)
+                quantity = rng.randint(1, 3)
+                order_item_id += 1
+                items.append((order_item_id, order_id, item_id, restaurant_id, quantity,
+                              round(prices[item_id] * quantity, 2)))
+            subtotal = sum(item[5] for item in items)
+            tax = round(subtotal * 0.14, 2)
+            user_id = None if group else rng.randint(1, scale['users'])
+            phone = user_phone(user_id) if user_id else f'015{order_id:08d}'
+            orders.append((order_id, user_id, 'group' if group else 'individual', phone,
+                           f'{rng.randint(1, 200)} Street, {rng.choice(AREAS)}', 20.0, tax,
+                           round(subtotal + tax + 20.0, 2), created_at.isoformat(),
+                           'Group Order' if group else f'User{user_id}'))
+            order_items.extend(items)
+
+            # Recent orders are still in progress, the rest were delivered
+            recent = order_id > scale['orders'] - max(1, scale['orders'] // 200)
+            for restaurant_id in dict.fromkeys(item[3] for item in items):
+                status = rng.choice(STATUSES[:3]) if recent else rng.choice(('delivered',) * 9 + ('cancelled',))
+                restaurant_orders.append((order_id, restaurant_id, status))
+
+            if group:
+                group_order_id += 1
+                people = rng.randint(2, 6)
+                group_orders.append((group_order_id, order_id, people))
+                member_ids = []
+                for index in range(1, people + 1):
+                    group_member_id += 1
+                    member_ids.append(group_member_id)
+                    group_members.append((group_member_id, group_order_id, f'Person {index}', index))
+                group_items.extend((rng.choice(member_ids), item[0]) for item in items)
+
+        conn.executemany('''
+            INSERT INTO orders (id, user_id, order_type, phone, delivery_location, delivery_fee,
+                                tax, total, created_at, customer_name)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', orders)
+        conn.executemany('''
+            INSERT INTO order_items (id, order_id, menu_item_id, restaurant_id, quantity, subtotal)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', order_items)
+        conn.executemany(
+            'INSERT INTO restaurant_orders (order_id, restaurant_id, status) VALUES (?, ?, ?)',
+            restaurant_orders
+        )
+        conn.executemany('INSERT INTO group_orders (id, order_id, num_people) VALUES (?, ?, ?)', group_orders)
+        conn.executemany('''
+            INSERT INTO group_members (id, group_order_id, member_name, person_index) VALUES (?, ?, ?, ?)
+        ''', group_members)
+        conn.executemany(
+            'INSERT INTO group_order_items (group_member_id, order_item_id) VALUES (?, ?)', group_items
+        )
+
+    # Status log and counters as the migrations that introduced them backfill them
+    conn.execute('''
+        INSERT INTO order_status_events (order_id, restaurant_order_id, restaurant_id, status, created_at)
+        SELECT ro.order_id, ro.id, ro.restaurant_id, ro.status, o.created_at
+        FROM restaurant_orders ro JOIN orders o ON o.id = ro.order_id
+        ORDER BY ro.id
+    ''')
+    conn.execute('''
+        INSERT OR REPLACE INTO restaurant_order_counts (restaurant_id, status, count)
+        SELECT restaurant_id, status, COUNT(*) FROM restaurant_orders GROUP BY restaurant_id, status
+    ''')
+
+    log(f"  {scale['carts']} carts")
+    cart_rows, cart_item_rows = [], []
+    for cart_id in range(1, scale['carts'] + 1):
+        updated_at = (END - timedelta(days=rng.randint(0, 30))).strftime('%Y-%m-%d %H:%M:%S')
+        cart_rows.append((cart_id, f'bench-cart-{cart_id}', updated_at, updated_at))
+        restaurant_id = rng.randint(1, restaurants)
+        for item_id in rng.sample(range(1, per_restaurant + 1), min(per_restaurant, rng.randint(1, 4))):
+            menu_item_id = (restaurant_id - 1) * per_restaurant + item_id
+            cart_item_rows.append((cart_id, menu_item_id, restaurant_id, menu_rows[menu_item_id - 1][2],
+                                   prices[menu_item_id], rng.randint(1, 3), updated_at, updated_at))
+    conn.executemany(
+        'INSERT INTO carts (id, session_id, created_at, updated_at) VALUES (?, ?, ?, ?)', cart_rows
+    )
+    conn.executemany('''
+        INSERT INTO cart_items (cart_id, menu_item_id, restaurant_id, item_name, price, quantity,
+                                created_at, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ''', cart_item_rows)
+
+    conn.commit()
+    conn.execute('ANALYZE')
+    conn.close()
+
+
+def ensure(directory, scale_name, seed=1, log=print):
+    """Path of the dataset for scale_name, generating it on first use."""
+    path = dataset_path(directory, scale_name, seed)
+    if not os.path.exists(path):
+        os.makedirs(directory, exist_ok=True)
+        log(f'Generating {scale_name} dataset (seed {seed}) at {path}')
+        tmp_path = path + '.tmp'
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(tmp_path + suffix):
+                os.remove(tmp_path + suffix)
+        generate(tmp_path, SCALES[scale_name], seed, log)
+        os.replace(tmp_path, path)
+    return path
+
+
+def fresh_copy(source, path):
+    """Replace path with a copy of the dataset at source, for one run to modify."""
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    src, dst = sqlite3.connect(source), sqlite3.connect(path)
+    src.backup(dst)
+    src.close()
+    dst.close()
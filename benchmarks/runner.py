@@ -0,0 +1,184 @@
+"""Runs the benchmark cases against the Flask app and compares baselines.
+
+Every case is requested warmup + iterations times through the Flask test
+client, in one thread, so the numbers are the server-side cost of a request
+without network or concurrency effects.
+
+Queries are counted with sqlite3's trace callback on every connection the
+app opens, including the writer thread's, so a request's count includes
+the writes it handed to the single writer. Only top-level statements are
+counted, not the ones triggers run (see QueryCounter).
+"""
+import json
+import platform
+import random
+import sqlite3
+import statistics
+import threading
+import time
+from collections import Counter
+
+import database
+from benchmarks.cases import CASES, Context
+
+# A case counts as a regression when its p95 grows by more than this factor
+REGRESSION_FACTOR = 1.2
+# ...and by at least this much, so sub-millisecond jitter is not flagged
+REGRESSION_MIN_MS = 0.5
+
+
+class QueryCounter:
+    """Counts the top-level statements run on the traced connections.
+
+    SQLite also reports every statement a trigger runs. Before Python 3.11
+    those arrive prefixed with '-- '; since then the trace callback is
+    given the text of the statement that fired the trigger again. Both are
+    skipped, so a statement repeated verbatim back to back on the same
+    connection within one request counts once.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.count = 0
+        # Bumped by reset(), so a request's first statement never matches
+        # the previous request's last one
+        self._run = 0
+
+    def tracer(self):
+        """Trace callback for one connection."""
+        last = [None, None]  # run, statement
+
+        def trace(statement):
+            if statement.startswith('--'):
+                return
+            with self._lock:
+                if last[0] == self._run and last[1] == statement:
+                    return
+                last[:] = self._run, statement
+                self.count += 1
+
+        return trace
+
+    def reset(self):
+        with self._lock:
+            self.count = 0
+            self._run += 1
+
+
+def install_query_counter():
+    """Trace every connection the app opens from now on; returns the counter."""
+    counter = QueryCounter()
+    connect = database.connect
+
+    def traced_connect(db_name=None):
+        conn = connect(db_name)
+        conn.set_trace_callback(counter.tracer())
+        return conn
+
+    database.connect = traced_connect
+    return counter
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, round(fraction * len(sorted_values) + 0.5) - 1))
+    return sorted_values[index]
+
+
+def run_case(ctx, case, counter, iterations, warmup):
+    latencies = []
+    queries = []
+    statuses = Counter()
+    sizes = []
+    for i in range(warmup + iterations):
+        path, body = case.build(ctx, i)
+        counter.reset()
+        started = time.perf_counter()
+        response = ctx.client.open(path, method=case.method, json=body)
+        data = response.get_data()
+        elapsed = time.perf_counter() - started
+        if i >= warmup:
+            latencies.append(elapsed * 1000)
+            queries.append(counter.count)
+            statuses[response.status_code] += 1
+            sizes.append(len(data))
+
+    latencies.sort()
+    return {
+        'blueprint': case.blueprint,
+        'requests': iterations,
+        'p50_ms': round(percentile(latencies, 0.50), 3),
+        'p95_ms': round(percentile(latencies, 0.95), 3),
+        'p99_ms': round(percentile(latencies, 0.99), 3),
+        'mean_ms': round(statistics.fmean(latencies), 3),
+        'max_ms': round(latencies[-1], 3),
+        'queries_per_request': round(statistics.fmean(queries), 2),
+        'response_bytes': round(statistics.fmean(sizes)),
+        'statuses': {str(code): count for code, count in sorted(statuses.items())},
+    }
+
+
+def run(app, db_path, scale_name, scale, seed=1, iterations=200, warmup=20, only=None, log=print):
+    """Run the cases (those whose name or blueprint contains only, if given)."""
+    counter = install_query_counter()
+    # Setup lookups and writes go through a connection of their own
+    db = sqlite3.connect(db_path, timeout=30)
+    ctx = Context(app.test_client(), db, scale, random.Random(seed))
+
+    results = {}
+    try:
+        for case in CASES:
+            if only and only not in case.name and only != case.blueprint:
+                continue
+            result = run_case(ctx, case, counter, iterations, warmup)
+            results[case.name] = result
+            log(f"{case.name:<58} p50 {result['p50_ms']:>8.2f}  p95 {result['p95_ms']:>8.2f}  "
+                f"p99 {result['p99_ms']:>8.2f} ms  {result['queries_per_request']:>6.1f} q/req")
+    finally:
+        db.close()
+
+    return {
+        'scale': scale_name,
+        'seed': seed,
+        'iterations': iterations,
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'machine': platform.machine(),
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'results': results,
+    }
+
+
+def save(report, path):
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def compare(report, baseline_path, factor=REGRESSION_FACTOR, log=print):
+    """Print the change against a saved baseline; returns the regressed case names."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    if baseline.get('scale') != report['scale']:
+        log(f"Warning: baseline is for scale {baseline.get('scale')}, this run is {report['scale']}")
+
+    regressions = []
+    log(f"\n{'case':<58} {'p95 before':>10} {'p95 now':>10} {'change':>8} {'queries':>13}")
+    for name, result in report['results'].items():
+        before = baseline['results'].get(name)
+        if before is None:
+            log(f'{name:<58} (new)')
+            continue
+        ratio = result['p95_ms'] / before['p95_ms'] if before['p95_ms'] else 1.0
+        slower = ratio > factor and result['p95_ms'] - before['p95_ms'] >= REGRESSION_MIN_MS
+        # A whole extra query per request on average, not rounding noise
+        more_queries = result['queries_per_request'] - before['queries_per_request'] >= 1
+        flag = ''
+        if slower or more_queries:
+            regressions.append(name)
+            flag = '  REGRESSION'
+        log(f"{name:<58} {before['p95_ms']:>10.2f} {result['p95_ms']:>10.2f} {ratio - 1:>+8.0%} "
+            f"{before['queries_per_request']:>6.1f}->{result['queries_per_request']:<6.1f}{flag}")
+    return regressions
@@ -0,0 +1,418 @@
+"""Lunch-rush load scenario: concurrent user flows against a real server.
+
+    python -m benchmarks.scenario --scale small --users 8,16,32,64 --duration 20
+    python -m benchmarks.scenario --mix browse=50,cart=30,group=5,dashboard=15
+    python -m benchmarks.scenario --url http://127.0.0.1:5000 --scale small
+
+Each simulated user is a thread with its own HTTP connection (kept alive
+if the server allows it) that repeats one flow (see FLOWS) for the length
+of a step, pausing an exponentially distributed think time between
+requests. Users are split between the flows by the --mix weights. Steps
+run one after another with more users each time, against the same
+server, and every step reports per flow: requests per second, error
+rate, "database is locked" errors and p50/p95/p99 latency. The last
+table is the load curve, with the knee marked: the last step where
+adding users still bought throughput, if a later step showed it stopped.
+
+By default the app is started in a separate process (the threaded
+Werkzeug server) on a fresh copy of the --scale dataset, with its log in
+the data directory. With --url the flows run against a server you have
+started yourself, e.g. `uvicorn asgi:app`, which must be serving a copy
+of the same --scale/--seed dataset.
+
+The client threads share one interpreter, so on a small machine they can
+become the bottleneck before the server does; watch the client's CPU.
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import socket
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import quote, urlsplit
+
+from benchmarks import dataset
+from benchmarks.runner import percentile
+
+DEFAULT_MIX = 'browse=40,cart=30,group=5,dashboard=25'
+# Throughput must grow by at least this fraction of the relative increase
+# in users for a step to count as still scaling
+KNEE_GAIN = 0.25
+# ...and no more than this fraction of its requests may fail
+KNEE_MAX_ERRORS = 0.01
+NEXT_STATUS = {'pending': 'preparing', 'preparing': 'on_the_way', 'on_the_way': 'delivered'}
+LOCKED_MARKERS = (b'database is locked', b'database table is locked')
+
+FLOWS = {}
+
+
+def flow(name):
+    def register(fn):
+        FLOWS[name] = fn
+        return fn
+    return register
+
+
+class Session:
+    """One simulated user: an HTTP connection, its random state and its records."""
+
+    def __init__(self, number, host, port, scale, prices, think, seed):
+        self.number = number
+        self.host = host
+        self.port = port
+        self.scale = scale
+        self.prices = prices
+        self.think = think
+        self.rng = random.Random(seed * 100003 + number)
+        self.iteration = 0
+        self.connection = None
+        # (flow, started, seconds, status, locked)
+        self.records = []
+        self.flow_name = None
+
+    def request(self, method, path, body=None):
+        """Send one request and record it; returns (status, decoded json or None)."""
+        if self.think:
+            time.sleep(self.rng.expovariate(1 / self.think))
+        if self.connection is None:
+            self.connection = http.client.HTTPConnection(self.host, self.port, timeout=60)
+
+        headers = {}
+        payload = None
+        if body is not None:
+            payload = json.dumps(body)
+            headers['Content-Type'] = 'application/json'
+
+        started = time.perf_counter()
+        try:
+            self.connection.request(method, path, payload, headers)
+            response = self.connection.getresponse()
+            data = response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException):
+            self.connection.close()
+            self.connection = None
+            data = b''
+            status = 0
+        elapsed = time.perf_counter() - started
+
+        locked = status >= 500 and any(marker in data for marker in LOCKED_MARKERS)
+        self.records.append((self.flow_name, started, elapsed, status, locked))
+        if 200 <= status < 300 and data:
+            try:
+                return status, json.loads(data)
+            except ValueError:
+                pass
+        return status, None
+
+    def restaurant(self):
+        return self.rng.randint(1, self.scale['restaurants'])
+
+    def menu_item(self, restaurant_id):
+        per_restaurant = self.scale['menu_items_per_restaurant']
+        return (restaurant_id - 1) * per_restaurant + self.rng.randint(1, per_restaurant)
+
+    def order_items(self, count):
+        restaurant_id = self.restaurant()
+        items = []
+        for _ in range(count):
+            menu_item_id = self.menu_item(restaurant_id)
+            price = self.prices[menu_item_id]
+            items.append({'menu_item_id': menu_item_id, 'restaurant_id': restaurant_id,
+                          'quantity': 1, 'price': price, 'subtotal': price})
+        return items
+
+    def run(self, flow_name, deadline):
+        self.flow_name = flow_name
+        while time.perf_counter() < deadline:
+            FLOWS[flow_name](self)
+            self.iteration += 1
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+
+
+# ---------- flows ----------
+
+@flow('browse')
+def browse(s):
+    """A customer looking through restaurants and a menu."""
+    s.request('GET', '/restaurants/?limit=50')
+    restaurant_id = s.restaurant()
+    s.request('GET', f'/restaurants/{restaurant_id}')
+    s.request('GET', f'/restaurant-menu/{restaurant_id}')
+    s.request('GET', f'/restaurant-menu/item/{s.menu_item(restaurant_id)}')
+    if s.rng.random() < 0.25:
+        s.request('GET', f"/restaurant-menu/search?q={quote(s.rng.choice(dataset.DISHES)[:5])}")
+
+
+@flow('cart')
+def cart(s):
+    """A customer filling a cart, changing it, and checking out half the time."""
+    cart_uuid = f'rush-{s.number}-{s.iteration}'
+    restaurant_id = s.restaurant()
+    menu_item_ids = [s.menu_item(restaurant_id) for _ in range(s.rng.randint(2, 4))]
+    for menu_item_id in menu_item_ids:
+        s.request('POST', '/cart/add', {'cart_uuid': cart_uuid, 'menu_item_id': menu_item_id,
+                                        'restaurant_id': restaurant_id, 'quantity': 1})
+        s.request('POST', '/cart/snapshot', {'cart_uuid': cart_uuid})
+    s.request('PUT', '/cart/update', {'cart_uuid': cart_uuid, 'cart_item_id': menu_item_ids[0],
+                                      'quantity': s.rng.randint(2, 3)})
+    if len(set(menu_item_ids)) > 1 and s.rng.random() < 0.3:
+        s.request('DELETE', '/cart/remove', {'cart_uuid': cart_uuid, 'cart_item_id': menu_item_ids[-1]})
+    s.request('POST', '/cart/view', {'cart_uuid': cart_uuid})
+    if s.rng.random() < 0.5:
+        status, body = s.request('POST', '/orders/create', {
+            'cart_uuid': cart_uuid, 'phone': dataset.user_phone(s.rng.randint(1, s.scale['users'])),
+            'delivery_location': 'Lunch rush street', 'customer_name': 'Rush'
+        })
+        if body:
+            s.request('GET', f"/orders/summary/{body['order_id']}")
+
+
+@flow('group')
+def group(s):
+    """An office group ordering together."""
+    members = [f'Person {n}' for n in range(1, s.rng.randint(3, 6) + 1)]
+    items = s.order_items(len(members) * 2)
+    for index, item in enumerate(items):
+        item['orderedBy'] = members[index % len(members)]
+    status, body = s.request('POST', '/group_orders/create', {
+        'phone': '01000000000', 'delivery_location': 'Lunch rush street',
+        'num_people': len(members), 'members': members, 'items': items
+    })
+    if body:
+        s.request('GET', f"/group_orders/summary/{body['order_id']}")
+        s.request('POST', f"/group_orders/confirm/{body['order_id']}")
+
+
+@flow('dashboard')
+def dashboard(s):
+    """A restaurant dashboard polling its orders and moving some along."""
+    restaurant_id = (s.number % s.scale['restaurants']) + 1
+    s.request('GET', f'/restaurants/orders/{restaurant_id}/pending-count')
+    status, orders = s.request('GET', f'/restaurants/orders/{restaurant_id}?status=pending,preparing,on_the_way&limit=20')
+    if orders and s.rng.random() < 0.5:
+        order = s.rng.choice(orders)
+        s.request('POST', f"/restaurants/orders/update/{order['restaurant_order_id']}",
+                  {'status': NEXT_STATUS.get(order['status'], 'delivered')})
+
+
+# ---------- running ----------
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in FLOWS:
+            raise ValueError(f'unknown flow {name!r}; choose from {", ".join(FLOWS)}')
+        mix[name] = float(weight or 1)
+    return {name: weight for name, weight in mix.items() if weight > 0}
+
+
+def split_users(users, mix):
+    """Users per flow in proportion to the mix, each flow getting at least one."""
+    total = sum(mix.values())
+    shares = {name: max(1, int(users * weight / total)) for name, weight in mix.items()}
+    by_remainder = sorted(mix, key=lambda name: users * mix[name] / total - shares[name], reverse=True)
+    for name in by_remainder[:max(0, users - sum(shares.values()))]:
+        shares[name] += 1
+    return shares
+
+
+def summarize(records, seconds):
+    latencies = sorted(record[2] * 1000 for record in records)
+    errors = sum(1 for record in records if not 200 <= record[3] < 400)
+    return {
+        'requests': len(records),
+        'throughput': round(len(records) / seconds, 1) if seconds else 0.0,
+        'errors': errors,
+        'error_rate': round(errors / len(records), 4) if records else 0.0,
+        'locked': sum(1 for record in records if record[4]),
+        'p50_ms': round(percentile(latencies, 0.50), 2),
+        'p95_ms': round(percentile(latencies, 0.95), 2),
+        'p99_ms': round(percentile(latencies, 0.99), 2),
+    }
+
+
+def run_step(host, port, scale, prices, users, mix, duration, warmup, think, seed, first_number):
+    """Run users for warmup + duration seconds; returns the step's summary."""
+    shares = split_users(users, mix)
+    sessions = []
+    number = first_number
+    for flow_name, count in shares.items():
+        for _ in range(count):
+            sessions.append((flow_name, Session(number, host, port, scale, prices, think, seed)))
+            number += 1
+
+    started = time.perf_counter()
+    measure_from = started + warmup
+    deadline = measure_from + duration
+    threads = [threading.Thread(target=session.run, args=(flow_name, deadline), daemon=True)
+               for flow_name, session in sessions]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for _, session in sessions:
+        session.close()
+
+    # Only requests that started inside the measured window count
+    records = [record for _, session in sessions for record in session.records
+               if measure_from <= record[1] < deadline]
+    flows = {name: summarize([r for r in records if r[0] == name], duration) for name in shares}
+    return {'users': users, 'shares': shares, 'flows': flows, 'total': summarize(records, duration)}, number
+
+
+def find_knee(steps):
+    """Index of the last step where adding users still paid off, or None
+    if throughput was still growing at the last step (or there was one)."""
+    for i in range(1, len(steps)):
+        before, after = steps[i - 1], steps[i]
+        if after['total']['error_rate'] > KNEE_MAX_ERRORS or not before['total']['throughput']:
+            return i - 1
+        gain = after['total']['throughput'] / before['total']['throughput'] - 1
+        added = after['users'] / before['users'] - 1
+        if gain < KNEE_GAIN * added:
+            return i - 1
+    return None
+
+
+def print_step(step):
+    print(f"\n{step['users']} users ({', '.join(f'{n} {f}' for f, n in step['shares'].items())})")
+    print(f"  {'flow':<10} {'req/s':>8} {'errors':>8} {'locked':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for name, result in [*step['flows'].items(), ('total', step['total'])]:
+        print(f"  {name:<10} {result['throughput']:>8.1f} {result['error_rate']:>8.2%} {result['locked']:>7} "
+              f"{result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f} {result['p99_ms']:>8.1f}")
+
+
+def print_curve(steps, knee):
+    print(f"\n{'users':>6} {'req/s':>8} {'p99 ms':>8} {'errors':>8}")
+    peak = max(step['total']['throughput'] for step in steps) or 1
+    for i, step in enumerate(steps):
+        total = step['total']
+        bar = '#' * round(30 * total['throughput'] / peak)
+        mark = '  <- knee' if i == knee else ''
+        print(f"{step['users']:>6} {total['throughput']:>8.1f} {total['p99_ms']:>8.1f} "
+              f"{total['error_rate']:>8.2%}  {bar}{mark}")
+    if knee is None:
+        print('Throughput was still growing at the last step; try more users to find the knee.')
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(db_path, media_dir, log_path):
+    """Start the app on a free port in a child process; returns (process, port)."""
+    port = free_port()
+    env = dict(os.environ, YALLAORDER_DB=db_path, YALLAORDER_MEDIA=media_dir,
+               YALLAORDER_CART_SWEEP_SECONDS='0')
+    log = open(log_path, 'w')
+    process = subprocess.Popen(
+        [sys.executable, '-c',
+         f"from app import app; app.run(host='127.0.0.1', port={port}, threaded=True)"],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        env=env, stdout=log, stderr=subprocess.STDOUT
+    )
+    log.close()
+
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'Server exited with {process.returncode}, see {log_path}')
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            connection.request('GET', '/api')
+            if connection.getresponse().status == 200:
+                connection.close()
+                return process, port
+        except OSError:
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError(f'Server did not start within 30 seconds, see {log_path}')
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.scenario',
+                                     description='Replay a lunch rush against a local server.')
+    parser.add_argument('--scale', default='small', help='tiny, small, medium or large (default: small)')
+    parser.add_argument('--seed', type=int, default=1, help='Dataset and client seed (default: 1)')
+    parser.add_argument('--users', default='4,8,16,32,64',
+                        help='Comma-separated concurrent users per step (default: 4,8,16,32,64)')
+    parser.add_argument('--duration', type=float, default=20, help='Measured seconds per step (default: 20)')
+    parser.add_argument('--warmup', type=float, default=3, help='Unmeasured seconds per step (default: 3)')
+    parser.add_argument('--think', type=float, default=0.05,
+                        help='Mean seconds between a user\'s requests (default: 0.05)')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f'Flow weights (default: {DEFAULT_MIX})')
+    parser.add_argument('--url', help='Run against this already running server instead of starting one')
+    parser.add_argument('--data-dir', default=os.path.join('benchmarks', 'data'),
+                        help='Where generated datasets are kept (default: benchmarks/data)')
+    parser.add_argument('--output', help='Also write the results to this JSON file')
+    args = parser.parse_args()
+
+    if args.scale not in dataset.SCALES:
+        parser.error(f'unknown scale {args.scale!r}; choose from {", ".join(dataset.SCALES)}')
+    try:
+        mix = parse_mix(args.mix)
+        users = sorted({int(n) for n in args.users.split(',')})
+    except ValueError as e:
+        parser.error(str(e))
+    if not mix or users[0] < len(mix):
+        parser.error('every step needs at least one user per flow in the mix')
+
+    scale = dataset.SCALES[args.scale]
+    os.environ['YALLAORDER_MEDIA'] = os.path.join(args.data_dir, 'media')
+    source = dataset.ensure(args.data_dir, args.scale, args.seed)
+    conn = sqlite3.connect(source)
+    prices = dict(conn.execute('SELECT id, price FROM menu_items'))
+    conn.close()
+
+    process = None
+    if args.url:
+        parts = urlsplit(args.url)
+        host, port = parts.hostname, parts.port or 80
+    else:
+        run_path = os.path.join(args.data_dir, f'scenario-{args.scale}.db')
+        dataset.fresh_copy(source, run_path)
+        log_path = os.path.join(args.data_dir, 'scenario-server.log')
+        process, port = start_server(os.path.abspath(run_path), os.path.abspath(os.environ['YALLAORDER_MEDIA']),
+                                     log_path)
+        host = '127.0.0.1'
+        print(f'Server on port {port} (log: {log_path})')
+
+    steps = []
+    try:
+        number = 0
+        for count in users:
+            step, number = run_step(host, port, scale, prices, count, mix, args.duration, args.warmup,
+                                    args.think, args.seed, number)
+            steps.append(step)
+            print_step(step)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    knee = find_knee(steps)
+    print_curve(steps, knee)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'scale': args.scale, 'seed': args.seed, 'mix': mix, 'think': args.think,
+                       'duration': args.duration, 'knee_users': None if knee is None else steps[knee]['users'], 'steps': steps},
+                      f, indent=2)
+            f.write('\n')
+
+
+if __name__ == '__main__':
+    main()
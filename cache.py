@@ -0,0 +1,174 @@
+"""Small in-process caches with TTL/LRU eviction.
+
+Each worker process has its own copy. Writes invalidate the entries they
+affect in the worker that handled them; the TTL bounds how long other
+workers can keep serving the previous value.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app
+
+
+class _Entry:
+    __slots__ = ('value', 'stamp', 'fresh_until', 'stale_until', 'refreshing')
+
+    def __init__(self, value, stamp, fresh_until, stale_until):
+        self.value = value
+        self.stamp = stamp
+        self.fresh_until = fresh_until
+        self.stale_until = stale_until
+        self.refreshing = False
+
+
+class TTLCache:
+    """LRU cache whose entries expire after ttl seconds.
+
+    For stale_ttl seconds after expiry an entry is still returned while a
+    background thread reloads it (stale-while-revalidate), so readers never
+    wait on the database for a key that was recently cached.
+    """
+
+    def __init__(self, name, max_entries=1024, ttl=300, stale_ttl=60):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # Loads in flight per key, and a generation for those keys that is
+        # bumped when one of them is invalidated: a load that started before
+        # an invalidation of its key must not store its (possibly outdated)
+        # result. Other keys are unaffected.
+        self._loading = {}
+        self._generations = {}
+        # Every stored value gets a new stamp, usable as a version/validator
+        self._stamp = 0
+        self._hits = 0
+        self._stale_hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+        self._refresh_errors = 0
+
+    def get(self, key, loader):
+        """Return the cached value for key, calling loader() to fill it."""
+        return self.get_stamped(key, loader)[0]
+
+    def get_stamped(self, key, loader):
+        """Return (value, stamp) for key.
+
+        The stamp changes whenever the value is (re)loaded, so it can serve
+        as a cheap version for HTTP validators. It is None when the loaded
+        value could not be cached because of a concurrent invalidation.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or now >= entry.stale_until:
+                self._misses += 1
+                generation = self._begin_load(key)
+            else:
+                self._entries.move_to_end(key)
+                if now < entry.fresh_until:
+                    self._hits += 1
+                    return entry.value, entry.stamp
+                self._stale_hits += 1
+                refresh = not entry.refreshing
+                entry.refreshing = True
+                if refresh:
+                    generation = self._begin_load(key)
+                value, stamp = entry.value, entry.stamp
+
+        if entry is None or now >= entry.stale_until:
+            try:
+                value = loader()
+            except Exception:
+                with self._lock:
+                    self._end_load(key)
+                raise
+            stamp = self._store(key, value, generation)
+        elif refresh:
+            self._refresh_in_background(key, loader, generation)
+        return value, stamp
+
+    def _begin_load(self, key):
+        """Register a load of key (lock held); returns its generation."""
+        self._loading[key] = self._loading.get(key, 0) + 1
+        return self._generations.get(key, 0)
+
+    def _end_load(self, key):
+        """Unregister a load of key (lock held)."""
+        remaining = self._loading[key] - 1
+        if remaining:
+            self._loading[key] = remaining
+        else:
+            del self._loading[key]
+            self._generations.pop(key, None)
+
+    def _store(self, key, value, generation):
+        now = time.monotonic()
+        with self._lock:
+            current = self._generations.get(key, 0)
+            self._end_load(key)
+            if generation != current:
+                # Invalidated meanwhile; let the next reader load it again
+                entry = self._entries.get(key)
+                if entry is not None:
+                    entry.refreshing = False
+                return None
+            self._stamp += 1
+            self._entries[key] = _Entry(value, self._stamp, now + self.ttl,
+                                        now + self.ttl + self.stale_ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+            return self._stamp
+
+    def _refresh_in_background(self, key, loader, generation):
+        # Loaders use get_db(), which needs an app context of its own
+        app = current_app._get_current_object()
+
+        def refresh():
+            try:
+                with app.app_context():
+                    value = loader()
+            except Exception as e:
+                print(f"Error refreshing {self.name} cache entry {key}: {e}")
+                with self._lock:
+                    self._refresh_errors += 1
+                    self._end_load(key)
+                    entry = self._entries.get(key)
+                    if entry is not None:
+                        entry.refreshing = False
+                return
+            self._store(key, value, generation)
+
+        threading.Thread(target=refresh, name=f'{self.name}-cache-refresh', daemon=True).start()
+
+    def invalidate(self, predicate):
+        """Drop every entry whose key satisfies predicate(key)."""
+        with self._lock:
+            self._invalidations += 1
+            for key in [k for k in self._entries if predicate(k)]:
+                del self._entries[key]
+            for key in [k for k in self._loading if predicate(k)]:
+                self._generations[key] = self._generations.get(key, 0) + 1
+
+    def clear(self):
+        self.invalidate(lambda key: True)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self._hits,
+                'stale_hits': self._stale_hits,
+                'misses': self._misses,
+                'evictions': self._evictions,
+                'invalidations': self._invalidations,
+                'refresh_errors': self._refresh_errors,
+            }
@@ -0,0 +1,494 @@
+"""In-memory cart store with write-behind persistence.
+
+Carts are the chattiest traffic the app has: every add, quantity change and
+cart view used to be several queries (and, before migrations/0010, trigger
+updates). Active carts now live in memory, keyed by their session id, and
+are read and changed there without touching SQLite:
+
+* a cart is loaded from carts/cart_items the first time it is used and kept
+  while active; idle carts are dropped after CART_TTL seconds and the least
+  recently used ones once more than CART_CACHE_SIZE are held;
+* changes mark the cart dirty; a background thread writes dirty carts back
+  through the single writer (db_writer) every FLUSH_SECONDS; checkout()
+  places the order from the in-memory items, exactly what the customer sees;
+* item names and prices come from the menu (a cached price map per
+  restaurant), never from the client.
+
+Only carts that were written back are evicted, so nothing is lost on
+eviction; a crash loses at most the last FLUSH_SECONDS of cart edits.
+Like the other caches this is per worker process: requests for one cart
+must reach the same worker, which holds for the single-process app.
+
+Cart items are identified by their menu_item_id, which is unique within a
+cart and known before the row is written.
+
+Stored carts that nobody changes for ABANDONED_CART_DAYS are deleted by
+CartSweeper, a background thread (also `flask sweep-carts`).
+"""
+import atexit
+import os
+import threading
+import time
+from collections import OrderedDict
+from itertools import islice
+
+import catalog
+import database
+from database import placeholders
+from db_writer import writer
+
+CART_CACHE_SIZE = int(os.environ.get('YALLAORDER_CART_CACHE_SIZE', 10000))
+CART_TTL = float(os.environ.get('YALLAORDER_CART_TTL', 1800))
+FLUSH_SECONDS = float(os.environ.get('YALLAORDER_CART_FLUSH_SECONDS', 1.0))
+
+# Stored carts untouched for this long are deleted by the sweeper
+ABANDONED_CART_DAYS = float(os.environ.get('YALLAORDER_ABANDONED_CART_DAYS', 7))
+# How often the sweeper runs (0 disables it; `flask sweep-carts` still works)
+SWEEP_SECONDS = float(os.environ.get('YALLAORDER_CART_SWEEP_SECONDS', 3600))
+SWEEP_BATCH = int(os.environ.get('YALLAORDER_CART_SWEEP_BATCH', 200))
+# Pause between batches so other writes get the lock in between
+SWEEP_PAUSE = 0.05
+
+
+class CartItemNotFound(LookupError):
+    """The cart has no item with that id."""
+
+
+class CartEmpty(LookupError):
+    """The cart has nothing that can be ordered."""
+
+
+def now_timestamp():
+    """Current UTC time formatted like SQLite's datetime('now')."""
+    return time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime())
+
+
+def load_menu_prices(restaurant_id):
+    conn = database.get_db()
+    rows = conn.execute('''
+        SELECT mi.id, mi.name, mi.price, r.name AS restaurant_name
+        FROM menu_items mi
+        LEFT JOIN restaurants r ON r.id = mi.restaurant_id
+        WHERE mi.restaurant_id = ?
+    ''', (restaurant_id,)).fetchall()
+    return {row['id']: (row['name'], row['price'], row['restaurant_name']) for row in rows}
+
+
+def menu_prices(restaurant_id):
+    """{menu_item_id: (name, price, restaurant_name)} for a restaurant, cached
+    with the catalog and dropped by catalog.invalidate_restaurant()."""
+    return catalog.cached(catalog.restaurant_key('menu_prices', restaurant_id),
+                          lambda: load_menu_prices(restaurant_id))
+
+
+def menu_item(restaurant_id, menu_item_id):
+    """New cart item for a menu item at its current menu price, or None."""
+    found = menu_prices(restaurant_id).get(menu_item_id)
+    if found is None:
+        return None
+    name, price, restaurant_name = found
+    return {
+        'menu_item_id': menu_item_id,
+        'restaurant_id': restaurant_id,
+        'restaurant_name': restaurant_name,
+        'item_name': name,
+        'price': price,
+        'quantity': 0,
+        'created_at': now_timestamp(),
+    }
+
+
+class Cart:
+    __slots__ = ('session_id', 'items', 'version', 'flushed_version', 'updated_at', 'touched')
+
+    def __init__(self, session_id, items, version, updated_at):
+        self.session_id = session_id
+        # menu_item_id -> item dict, oldest first
+        self.items = items
+        self.version = version
+        self.flushed_version = version
+        self.updated_at = updated_at
+        self.touched = time.monotonic()
+
+    @property
+    def dirty(self):
+        return self.version != self.flushed_version
+
+
+class CartStore:
+    def __init__(self, max_entries=CART_CACHE_SIZE, ttl=CART_TTL, flush_seconds=FLUSH_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.flush_seconds = flush_seconds
+        self._carts = OrderedDict()
+        self._lock = threading.Lock()
+        # One flush at a time, so an older snapshot never overwrites a newer one
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        # Versions are unique across carts and restarts, so a version a
+        # client remembers never matches a different state of its cart
+        self._version = time.time_ns() // 1000
+        self._hits = 0
+        self._loads = 0
+        self._evictions = 0
+        self._expired = 0
+        self._flushes = 0
+        self._flushed_carts = 0
+        self._flush_errors = 0
+
+    def _next_version(self):
+        self._version += 1
+        return self._version
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._loop, name='cart-flusher', daemon=True)
+                    self._thread.start()
+
+    def _load(self, session_id):
+        """(items, updated_at) of a stored cart; no items if it has no row."""
+        rows = database.get_db().execute('''
+            SELECT c.updated_at AS cart_updated_at, ci.menu_item_id, ci.restaurant_id,
+                   r.name AS restaurant_name, ci.item_name, ci.price, ci.quantity, ci.created_at
+            FROM carts c
+            LEFT JOIN cart_items ci ON ci.cart_id = c.id
+            LEFT JOIN restaurants r ON r.id = ci.restaurant_id
+            WHERE c.session_id = ?
+            ORDER BY ci.created_at, ci.id
+        ''', (session_id,)).fetchall()
+        items = {}
+        for row in rows:
+            if row['menu_item_id'] is not None:
+                item = dict(row)
+                del item['cart_updated_at']
+                items[row['menu_item_id']] = item
+        updated_at = rows[0]['cart_updated_at'] if rows else None
+        return items, updated_at
+
+    def _get(self, session_id):
+        """The cart for session_id, loading it on a miss; call without self._lock."""
+        self._ensure_started()
+        with self._lock:
+            cart = self._carts.get(session_id)
+            if cart is not None:
+                self._carts.move_to_end(session_id)
+                cart.touched = time.monotonic()
+                self._hits += 1
+                return cart
+
+        items, updated_at = self._load(session_id)
+        with self._lock:
+            # Another request may have loaded (and changed) it meanwhile
+            cart = self._carts.get(session_id)
+            if cart is None:
+                cart = Cart(session_id, items, self._next_version(), updated_at)
+                self._carts[session_id] = cart
+                self._loads += 1
+                self._evict()
+            return cart
+
+    def _evict(self):
+        """Drop least recently used clean carts over max_entries; call with self._lock."""
+        excess = len(self._carts) - self.max_entries
+        if excess <= 0:
+            return
+        # Never the most recently used one, which the caller is about to use
+        candidates = islice(self._carts.items(), len(self._carts) - 1)
+        clean = (s for s, cart in candidates if not cart.dirty)
+        for session_id in list(islice(clean, excess)):
+            del self._carts[session_id]
+            self._evictions += 1
+        if len(self._carts) > self.max_entries:
+            # The rest are waiting to be written back
+            self._wake.set()
+
+    def snapshot(self, session_id):
+        """(version, [item, ...]) of the cart, oldest item first.
+
+        Items are copies; a cart that does not exist is empty.
+        """
+        cart = self._get(session_id)
+        with self._lock:
+            return cart.version, [dict(item) for item in cart.items.values()]
+
+    def mutate(self, session_id, change):
+        """Apply change(items) to the cart atomically and return its result.
+
+        items is a copy of the cart's {menu_item_id: item} dict for change to
+        edit in place. If change raises, the cart is left as it was. It runs
+        with the store locked, so it must only touch the dict: look anything
+        up (e.g. menu_item()) before calling mutate.
+        """
+        cart = self._get(session_id)
+        with self._lock:
+            current = self._carts.get(session_id)
+            if current is not None:
+                cart = current
+            else:
+                # Evicted since _get(); it was clean, so this copy is current
+                self._carts[session_id] = cart
+            items = {key: dict(item) for key, item in cart.items.items()}
+            result = change(items)
+            if items != cart.items:
+                cart.items = items
+                cart.version = self._next_version()
+                cart.updated_at = now_timestamp()
+            self._evict()
+            return result
+
+    def forget(self, session_id):
+        """Drop a cart from memory without writing it (e.g. after its stored cart was deleted)."""
+        with self._lock:
+            self._carts.pop(session_id, None)
+
+    def forget_deleted(self, session_ids):
+        """Drop carts whose rows were deleted, unless they have unsaved changes
+        (those are written back as new carts)."""
+        with self._lock:
+            for session_id in session_ids:
+                cart = self._carts.get(session_id)
+                if cart is not None and not cart.dirty:
+                    del self._carts[session_id]
+
+    def checkout(self, session_id, place):
+        """Turn the cart into an order and return place's result.
+
+        place(conn, items) runs on the writer with a snapshot of the cart's
+        items (oldest first) and must delete the stored cart; it may raise
+        CartEmpty, as checkout does for an empty cart, and the cart is then
+        kept. Write-backs wait meanwhile, so none can recreate the stored
+        cart after place deleted it. Edits made while place runs are kept
+        and written back as a new cart.
+        """
+        cart = self._get(session_id)
+        with self._flush_lock:
+            with self._lock:
+                # If evicted since _get() it was clean, so this copy is current
+                cart = self._carts.get(session_id, cart)
+                version = cart.version
+                items = [dict(item) for item in cart.items.values()]
+            if not items:
+                raise CartEmpty(session_id)
+
+            result = writer.run(lambda conn: place(conn, items))
+
+            with self._lock:
+                current = self._carts.get(session_id)
+                if current is not None:
+                    if current.version == version:
+                        del self._carts[session_id]
+                    else:
+                        # Its stored row is gone; dirty again so it is rewritten
+                        current.flushed_version = version
+            return result
+
+    def flush(self, session_id=None):
+        """Write back one cart (or every dirty cart) and return once committed."""
+        with self._flush_lock:
+            with self._lock:
+                if session_id is None:
+                    carts = [cart for cart in self._carts.values() if cart.dirty]
+                else:
+                    cart = self._carts.get(session_id)
+                    carts = [cart] if cart is not None and cart.dirty else []
+                versions = [cart.version for cart in carts]
+                # Items are never changed in place (mutate swaps in a new dict)
+                snapshots = [(cart.session_id, cart.updated_at, list(cart.items.values())) for cart in carts]
+            if not snapshots:
+                return 0
+
+            try:
+                writer.run(lambda conn: write_carts(conn, snapshots))
+            except Exception:
+                with self._lock:
+                    self._flush_errors += 1
+                raise
+
+            with self._lock:
+                for cart, version in zip(carts, versions):
+                    cart.flushed_version = max(cart.flushed_version, version)
+                self._flushes += 1
+                self._flushed_carts += len(carts)
+            return len(carts)
+
+    def expire(self):
+        """Drop carts idle for longer than ttl that are already written back."""
+        cutoff = time.monotonic() - self.ttl
+        with self._lock:
+            expired = [s for s, cart in self._carts.items() if cart.touched < cutoff and not cart.dirty]
+            for session_id in expired:
+                del self._carts[session_id]
+            self._expired += len(expired)
+            self._evict()
+
+    def _loop(self):
+        while True:
+            self._wake.wait(self.flush_seconds)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                # Kept dirty; retried on the next round
+                print(f"Error writing back carts: {e}")
+            self.expire()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'carts': len(self._carts),
+                'max_carts': self.max_entries,
+                'dirty': sum(1 for cart in self._carts.values() if cart.dirty),
+                'hits': self._hits,
+                'loads': self._loads,
+                'evictions': self._evictions,
+                'expired': self._expired,
+                'flushes': self._flushes,
+                'flushed_carts': self._flushed_carts,
+                'flush_errors': self._flush_errors,
+            }
+
+
+def write_carts(conn, snapshots):
+    """Write (session_id, updated_at, items) cart snapshots back."""
+    for session_id, updated_at, items in snapshots:
+        cart_id = conn.execute('''
+            INSERT INTO carts (session_id, user_id, created_at, updated_at)
+            VALUES (?, NULL, ?, ?)
+            ON CONFLICT (session_id) DO UPDATE SET updated_at = excluded.updated_at
+            RETURNING id
+        ''', (session_id, updated_at, updated_at)).fetchone()['id']
+
+        menu_item_ids = [item['menu_item_id'] for item in items]
+        conn.execute(
+            f'DELETE FROM cart_items WHERE cart_id = ? AND menu_item_id NOT IN ({placeholders(menu_item_ids)})',
+            [cart_id, *menu_item_ids]
+        )
+        conn.executemany('''
+            INSERT INTO cart_items
+                (cart_id, menu_item_id, restaurant_id, item_name, price, quantity, created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (cart_id, menu_item_id) DO UPDATE SET
+                quantity = excluded.quantity, price = excluded.price,
+                item_name = excluded.item_name, updated_at = excluded.updated_at
+            WHERE quantity IS NOT excluded.quantity OR price IS NOT excluded.price
+        ''', [(cart_id, item['menu_item_id'], item['restaurant_id'], item['item_name'],
+               item['price'], item['quantity'], item['created_at'], updated_at) for item in items])
+
+
+def delete_abandoned_carts(conn, cutoff, limit):
+    """Delete up to limit carts last updated before cutoff, oldest first.
+
+    Returns (session ids, number of items deleted). Items are deleted
+    explicitly: foreign_keys is off, so ON DELETE CASCADE never fires.
+    """
+    cart_ids = [row['id'] for row in conn.execute(
+        'SELECT id FROM carts WHERE updated_at < ? ORDER BY updated_at LIMIT ?', (cutoff, limit)
+    )]
+    if not cart_ids:
+        return [], 0
+    items = conn.execute(
+        f'DELETE FROM cart_items WHERE cart_id IN ({placeholders(cart_ids)})', cart_ids
+    ).rowcount
+    session_ids = [row['session_id'] for row in conn.execute(
+        f'DELETE FROM carts WHERE id IN ({placeholders(cart_ids)}) RETURNING session_id', cart_ids
+    ).fetchall()]
+    return session_ids, items
+
+
+class CartSweeper:
+    """Deletes stored carts nobody has changed for max_age_days.
+
+    Runs every interval seconds on a background thread, in batches of
+    batch_size carts, each its own short write through the single writer.
+    """
+
+    def __init__(self, store, max_age_days=ABANDONED_CART_DAYS, interval=SWEEP_SECONDS,
+                 batch_size=SWEEP_BATCH):
+        self.store = store
+        self.max_age_days = max_age_days
+        self.interval = interval
+        self.batch_size = batch_size
+        self._thread = None
+        self._lock = threading.Lock()
+        self._runs = 0
+        self._deleted_carts = 0
+        self._deleted_items = 0
+        self._errors = 0
+        self._last_run = None
+
+    def sweep(self, max_age_days=None):
+        """Delete every abandoned cart now; returns (carts, items) deleted."""
+        days = self.max_age_days if max_age_days is None else max_age_days
+        cutoff = time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(time.time() - days * 86400))
+        total_carts = total_items = 0
+        while True:
+            session_ids, items = writer.run(
+                lambda conn: delete_abandoned_carts(conn, cutoff, self.batch_size)
+            )
+            self.store.forget_deleted(session_ids)
+            total_carts += len(session_ids)
+            total_items += items
+            with self._lock:
+                self._deleted_carts += len(session_ids)
+                self._deleted_items += items
+            if len(session_ids) < self.batch_size:
+                break
+            time.sleep(SWEEP_PAUSE)
+
+        with self._lock:
+            self._runs += 1
+            self._last_run = now_timestamp()
+        return total_carts, total_items
+
+    def start(self):
+        if self.interval > 0 and self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name='cart-sweeper', daemon=True)
+            self._thread.start()
+
+    def _loop(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                deleted_carts, deleted_items = self.sweep()
+                if deleted_carts:
+                    print(f"Deleted {deleted_carts} abandoned carts ({deleted_items} items)")
+            except Exception as e:
+                print(f"Error sweeping abandoned carts: {e}")
+                with self._lock:
+                    self._errors += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'max_age_days': self.max_age_days,
+                'runs': self._runs,
+                'last_run': self._last_run,
+                'deleted_carts': self._deleted_carts,
+                'deleted_items': self._deleted_items,
+                'errors': self._errors,
+            }
+
+
+carts = CartStore()
+# Write back what is still pending on a normal shutdown
+atexit.register(carts.flush)
+
+sweeper = CartSweeper(carts)
+
+
+def init_app(app):
+    """Start the abandoned cart sweeper and register ``flask sweep-carts``."""
+    import click
+
+    @app.cli.command('sweep-carts')
+    @click.option('--days', type=float, default=None,
+                  help=f'Delete carts idle for longer than this (default {ABANDONED_CART_DAYS:g}).')
+    def sweep_carts_command(days):
+        """Delete abandoned carts now."""
+        deleted_carts, deleted_items = sweeper.sweep(days)
+        click.echo(f'Deleted {deleted_carts} abandoned carts ({deleted_items} items)')
+
+    sweeper.start()
@@ -0,0 +1,44 @@
+"""Cache of the restaurant catalog: approved restaurants and their menus.
+
+Browsing reads (restaurant list, restaurant details, menus) are served from
+catalog_cache. Every write that changes what those reads return calls
+invalidate_restaurant() after committing, so the next read reloads exactly
+the affected restaurant (and the restaurant list).
+
+Cached values are plain dicts/lists as read from the database; request
+specific decoration such as absolute image URLs is applied per response.
+"""
+import os
+
+from cache import TTLCache
+
+catalog_cache = TTLCache(
+    'catalog',
+    max_entries=int(os.environ.get('YALLAORDER_CATALOG_CACHE_SIZE', 2048)),
+    ttl=float(os.environ.get('YALLAORDER_CATALOG_TTL', 300)),
+    stale_ttl=float(os.environ.get('YALLAORDER_CATALOG_STALE_TTL', 60)),
+)
+
+# Keys are tuples: (kind,) for catalog-wide entries, (kind, restaurant_id)
+# for per-restaurant ones.
+RESTAURANT_LIST = ('restaurants',)
+
+
+def restaurant_key(kind, restaurant_id):
+    return (kind, restaurant_id)
+
+
+def cached(key, loader):
+    return catalog_cache.get(key, loader)
+
+
+def invalidate_restaurant(restaurant_id):
+    """Drop everything cached for a restaurant, plus the restaurant list."""
+    catalog_cache.invalidate(
+        lambda key: key == RESTAURANT_LIST or (len(key) == 2 and key[1] == restaurant_id)
+    )
+
+
+def cached_stamped(key, loader):
+    """(value, stamp) from the catalog cache; see TTLCache.get_stamped."""
+    return catalog_cache.get_stamped(key, loader)
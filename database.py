@@ -1,8 +1,266 @@
+import os
+import random
 import sqlite3
+import threading
+import time
+from contextlib import contextmanager
 
-DB_NAME = 'yallaorder.db' 
+from flask import g
 
-def get_db_connection():
-    conn = sqlite3.connect(DB_NAME)
-    conn.row_factory = sqlite3.Row 
+DB_NAME = os.environ.get('YALLAORDER_DB', 'yallaorder.db')
+
+# Upper bound on open connections per worker process. Requests beyond this
+# wait up to POOL_TIMEOUT seconds for a connection to be released.
+POOL_SIZE = int(os.environ.get('YALLAORDER_DB_POOL_SIZE', 8))
+POOL_TIMEOUT = float(os.environ.get('YALLAORDER_DB_POOL_TIMEOUT', 10))
+
+# How long a statement waits on another connection's lock before failing
+# with SQLITE_BUSY; transactions then retry up to BUSY_RETRIES times
+BUSY_TIMEOUT_MS = int(os.environ.get('YALLAORDER_BUSY_TIMEOUT_MS', 2000))
+BUSY_RETRIES = int(os.environ.get('YALLAORDER_BUSY_RETRIES', 3))
+RETRY_BASE_DELAY = 0.025
+
+# Applied once when a connection is opened, not on every checkout
+PRAGMAS = (
+    'PRAGMA journal_mode = WAL',
+    'PRAGMA synchronous = NORMAL',
+    f'PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}',
+    'PRAGMA temp_store = MEMORY',
+    'PRAGMA cache_size = -16000',
+)
+
+
+class PoolTimeout(Exception):
+    """Raised when no pooled connection becomes free in time."""
+
+
+def connect(db_name=None):
+    """Open a new SQLite connection with the app's row factory and PRAGMAs."""
+    conn = sqlite3.connect(db_name or DB_NAME, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
     return conn
+
+
+class ConnectionPool:
+    """Bounded pool of SQLite connections shared by the threads of one worker."""
+
+    def __init__(self, db_name, max_size=POOL_SIZE, timeout=POOL_TIMEOUT):
+        self.db_name = db_name
+        self.max_size = max_size
+        self.timeout = timeout
+        self._idle = []
+        self._available = threading.Condition(threading.Lock())
+        self._created = 0
+        self._in_use = 0
+        self._peak_in_use = 0
+        self._checkouts = 0
+        self._waits = 0
+        self._timeouts = 0
+        self._discarded = 0
+
+    def acquire(self):
+        """Check out a connection, opening a new one while under max_size."""
+        with self._available:
+            if not self._idle and self._created >= self.max_size:
+                self._waits += 1
+                deadline = time.monotonic() + self.timeout
+                while not self._idle and self._created >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        raise PoolTimeout(
+                            f'No database connection available after {self.timeout}s'
+                        )
+                    self._available.wait(remaining)
+
+            conn = self._idle.pop() if self._idle else None
+            if conn is None:
+                self._created += 1
+            self._in_use += 1
+            self._peak_in_use = max(self._peak_in_use, self._in_use)
+            self._checkouts += 1
+
+        if conn is None:
+            try:
+                conn = connect(self.db_name)
+            except Exception:
+                with self._available:
+                    self._created -= 1
+                    self._in_use -= 1
+                    self._available.notify()
+                raise
+        return conn
+
+    def release(self, conn):
+        """Return a connection, rolling back anything left uncommitted."""
+        broken = False
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            broken = True
+
+        with self._available:
+            self._in_use -= 1
+            if broken:
+                self._created -= 1
+                self._discarded += 1
+            else:
+                self._idle.append(conn)
+            self._available.notify()
+
+        if broken:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+
+    def close_idle(self):
+        """Close every idle connection (checked-out ones are left alone)."""
+        with self._available:
+            idle, self._idle = self._idle, []
+            self._created -= len(idle)
+        for conn in idle:
+            conn.close()
+
+    def stats(self):
+        with self._available:
+            return {
+                'max_size': self.max_size,
+                'open': self._created,
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+                'peak_in_use': self._peak_in_use,
+                'checkouts': self._checkouts,
+                'waits': self._waits,
+                'timeouts': self._timeouts,
+                'discarded': self._discarded,
+            }
+
+
+pool = ConnectionPool(DB_NAME)
+
+
+def get_db():
+    """Return the connection checked out for the current request.
+
+    The same connection is reused for the whole app context and handed back
+    to the pool by close_db, so handlers never close it themselves.
+    """
+    if 'db' not in g:
+        g.db = pool.acquire()
+    return g.db
+
+
+def close_db(exc=None):
+    conn = g.pop('db', None)
+    if conn is not None:
+        pool.release(conn)
+
+
+def get_db_connection():
+    """Standalone connection for scripts and code running outside a request.
+
+    The caller owns it and must close it.
+    """
+    return connect()
+
+
+def init_app(app):
+    app.teardown_appcontext(close_db)
+
+
+TRANSACTION_MODES = ('DEFERRED', 'IMMEDIATE', 'EXCLUSIVE')
+
+_tx_lock = threading.Lock()
+_tx_stats = {'transactions': 0, 'rollbacks': 0, 'busy_retries': 0, 'busy_failures': 0}
+
+
+def _count(key):
+    with _tx_lock:
+        _tx_stats[key] += 1
+
+
+def transaction_stats():
+    with _tx_lock:
+        return dict(_tx_stats)
+
+
+def is_busy_error(e):
+    """True for SQLITE_BUSY / SQLITE_LOCKED ("database is locked")."""
+    if not isinstance(e, sqlite3.OperationalError):
+        return False
+    code = getattr(e, 'sqlite_errorcode', None)
+    if code is not None:
+        return code & 0xff in (sqlite3.SQLITE_BUSY, sqlite3.SQLITE_LOCKED)
+    return 'locked' in str(e) or 'busy' in str(e)
+
+
+def backoff_delay(attempt):
+    """Jittered exponential delay before retry number attempt (0-based)."""
+    return random.uniform(0, RETRY_BASE_DELAY * 2 ** attempt)
+
+
+@contextmanager
+def transaction(conn=None, mode='IMMEDIATE', busy_timeout=None):
+    """Run the block in one BEGIN <mode> ... COMMIT on conn.
+
+    conn defaults to the request's connection. IMMEDIATE takes the write
+    lock up front, so a transaction that reads before it writes (checkout
+    reads the cart, then writes the order) cannot fail halfway on a lock
+    upgrade the way a deferred one can. Any exception rolls back. busy_timeout
+    (ms) overrides the connection's for the duration of the transaction.
+    """
+    if mode not in TRANSACTION_MODES:
+        raise ValueError(f'Unknown transaction mode: {mode}')
+    conn = conn if conn is not None else get_db()
+    if conn.in_transaction:
+        raise RuntimeError('A transaction is already open on this connection')
+
+    previous_timeout = None
+    if busy_timeout is not None:
+        previous_timeout = conn.execute('PRAGMA busy_timeout').fetchone()[0]
+        conn.execute(f'PRAGMA busy_timeout = {int(busy_timeout)}')
+    try:
+        conn.execute(f'BEGIN {mode}')
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            _count('rollbacks')
+            raise
+        _count('transactions')
+    finally:
+        if previous_timeout is not None:
+            conn.execute(f'PRAGMA busy_timeout = {int(previous_timeout)}')
+
+
+def run_in_transaction(fn, conn=None, mode='IMMEDIATE', busy_timeout=None, retries=BUSY_RETRIES):
+    """Return fn(conn) run inside transaction(), retrying when the database is busy.
+
+    The whole transaction is rolled back and fn called again, after a
+    jittered exponential backoff, up to `retries` times; so fn must not have
+    side effects outside the database (publish events after this returns).
+    """
+    attempt = 0
+    while True:
+        try:
+            with transaction(conn, mode, busy_timeout) as tx:
+                return fn(tx)
+        except sqlite3.OperationalError as e:
+            if not is_busy_error(e):
+                raise
+            if attempt >= retries:
+                _count('busy_failures')
+                raise
+            _count('busy_retries')
+            time.sleep(backoff_delay(attempt))
+            attempt += 1
+
+
+def placeholders(values):
+    """'?, ?, ?' for an IN (...) clause over values."""
+    return ', '.join('?' * len(values))
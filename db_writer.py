@@ -0,0 +1,238 @@
+"""Single writer thread for the app's SQLite write transactions.
+
+SQLite lets one connection write at a time. Request threads that each open
+their own write transaction queue up on the database lock, give up after
+busy_timeout and fail with "database is locked". Routing those writes
+through one thread replaces the lock contention with an in-process queue:
+
+* jobs run strictly in submission order on the writer's own connection;
+* jobs that are already waiting when the writer becomes free are run in
+  one transaction and committed together (group commit), each inside its
+  own SAVEPOINT, so a failing job is rolled back alone and only its caller
+  sees the error;
+* a caller gets its job's return value only after the COMMIT that made it
+  durable, so it can safely publish events or answer the client.
+
+A job is a function taking the writer's connection. It must not commit or
+roll back itself, and must not use get_db() or anything else tied to the
+request, since it runs on the writer thread. It should also stay short:
+every write queued behind it waits.
+
+Every write a request or background thread makes goes through the writer.
+Two are left out on purpose, as they run outside the serving process:
+migrations (applied at startup, before any request) and the
+`flask reconcile-order-counts` command, which checks and repairs the
+counters in one transaction on a connection of its own.
+
+Each worker process has its own writer; between processes SQLite's
+busy_timeout still applies. Set YALLAORDER_WRITE_QUEUE=0 to run jobs
+inline on the request's connection instead.
+"""
+import os
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+from flask import has_app_context
+
+import database
+
+ENABLED = os.environ.get('YALLAORDER_WRITE_QUEUE', '1') != '0'
+# Most jobs merged into one transaction
+MAX_BATCH = int(os.environ.get('YALLAORDER_WRITE_BATCH', 64))
+# Longest a caller waits for its job before giving up
+WRITE_TIMEOUT = float(os.environ.get('YALLAORDER_WRITE_TIMEOUT', 30))
+
+
+class WriteTimeout(Exception):
+    """A job waited longer than its timeout and was withdrawn unwritten."""
+
+
+class DatabaseWriter:
+    def __init__(self, db_name=None, max_batch=MAX_BATCH, enabled=ENABLED):
+        self.db_name = db_name
+        self.max_batch = max_batch
+        self.enabled = enabled
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._jobs = 0
+        self._failed_jobs = 0
+        self._batches = 0
+        self._failed_commits = 0
+        self._timeouts = 0
+        self._largest_batch = 0
+        self._peak_depth = 0
+        self._commit_seconds = 0.0
+        self._max_commit_seconds = 0.0
+        self._wait_seconds = 0.0
+
+    def _ensure_started(self):
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name='db-writer', daemon=True)
+                self._thread.start()
+
+    def submit(self, job):
+        """Queue job(conn) and return a Future for its result."""
+        self._ensure_started()
+        future = Future()
+        self._queue.put((job, future, time.monotonic()))
+        depth = self._queue.qsize()
+        with self._stats_lock:
+            self._peak_depth = max(self._peak_depth, depth)
+        return future
+
+    def run(self, job, timeout=WRITE_TIMEOUT):
+        """Run job(conn) in a write transaction and return its result once committed.
+
+        Exceptions raised by the job (or by the commit) are re-raised here.
+        If the job is still queued after timeout seconds it is withdrawn and
+        WriteTimeout is raised, so it can never commit after its caller has
+        given up (and a retried request cannot write it twice). A job that
+        has already started is waited for, since its batch commits shortly.
+        """
+        if not self.enabled:
+            return self._run_inline(job)
+        future = self.submit(job)
+        try:
+            return future.result(timeout)
+        except FutureTimeout:
+            if not future.cancel():
+                return future.result()
+            with self._stats_lock:
+                self._timeouts += 1
+            raise WriteTimeout(f'Write not started within {timeout} seconds; nothing was written')
+
+    def _run_inline(self, job):
+        if has_app_context():
+            return database.run_in_transaction(job)
+        # Background threads have no request connection to borrow
+        conn = database.pool.acquire()
+        try:
+            return database.run_in_transaction(job, conn)
+        finally:
+            database.pool.release(conn)
+
+    def stop(self, timeout=None):
+        """Finish the queued jobs and stop the writer thread."""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _loop(self):
+        conn = database.connect(self.db_name)
+        # Transactions are managed explicitly below
+        conn.isolation_level = None
+        try:
+            while True:
+                item = self._queue.get()
+                if item is None:
+                    break
+                batch = [item]
+                stop = False
+                while len(batch) < self.max_batch:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is None:
+                        stop = True
+                        break
+                    batch.append(item)
+                self._run_batch(conn, batch)
+                if stop:
+                    break
+        finally:
+            conn.close()
+
+    def _run_batch(self, conn, batch):
+        started = time.monotonic()
+        outcomes = []
+        try:
+            self._begin(conn)
+            for job, future, enqueued in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                conn.execute('SAVEPOINT job')
+                try:
+                    result = job(conn)
+                except Exception as e:
+                    conn.execute('ROLLBACK TO job')
+                    conn.execute('RELEASE job')
+                    outcomes.append((future, enqueued, None, e))
+                else:
+                    conn.execute('RELEASE job')
+                    outcomes.append((future, enqueued, result, None))
+            conn.execute('COMMIT')
+        except Exception as e:
+            # BEGIN or COMMIT failed: nothing in this batch was written
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            print(f"Error committing write batch of {len(batch)}: {e}")
+            with self._stats_lock:
+                self._failed_commits += 1
+            for job, future, enqueued in batch:
+                if not future.done():
+                    if not future.running():
+                        future.set_running_or_notify_cancel()
+                    future.set_exception(e)
+            return
+
+        finished = time.monotonic()
+        with self._stats_lock:
+            self._batches += 1
+            self._jobs += len(outcomes)
+            self._largest_batch = max(self._largest_batch, len(outcomes))
+            self._commit_seconds += finished - started
+            self._max_commit_seconds = max(self._max_commit_seconds, finished - started)
+            for future, enqueued, result, error in outcomes:
+                self._wait_seconds += finished - enqueued
+                if error is not None:
+                    self._failed_jobs += 1
+
+        for future, enqueued, result, error in outcomes:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    def _begin(self, conn):
+        """BEGIN IMMEDIATE, retrying while another process holds the write lock."""
+        attempt = 0
+        while True:
+            try:
+                conn.execute('BEGIN IMMEDIATE')
+                return
+            except sqlite3.OperationalError as e:
+                if not database.is_busy_error(e) or attempt >= database.BUSY_RETRIES:
+                    raise
+                time.sleep(database.backoff_delay(attempt))
+                attempt += 1
+
+    def stats(self):
+        with self._stats_lock:
+            batches = self._batches or 1
+            jobs = self._jobs or 1
+            return {
+                'enabled': self.enabled,
+                'queue_depth': self._queue.qsize(),
+                'peak_queue_depth': self._peak_depth,
+                'jobs': self._jobs,
+                'failed_jobs': self._failed_jobs,
+                'batches': self._batches,
+                'failed_commits': self._failed_commits,
+                'timeouts': self._timeouts,
+                'avg_batch_size': round(self._jobs / batches, 2),
+                'largest_batch': self._largest_batch,
+                'avg_commit_ms': round(self._commit_seconds / batches * 1000, 3),
+                'max_commit_ms': round(self._max_commit_seconds * 1000, 3),
+                'avg_wait_ms': round(self._wait_seconds / jobs * 1000, 3),
+            }
+
+
+writer = DatabaseWriter()
@@ -0,0 +1,369 @@
+"""In-process publish/subscribe hub behind the Server-Sent Events endpoints.
+
+Writers publish small JSON events on a channel (e.g. 'restaurant:3') after
+their transaction commits. Each channel keeps the last BACKLOG events so a
+client reconnecting with Last-Event-ID gets what it missed. If that is no
+longer possible (events fell out of the backlog, or the id came from another
+worker process) the client is sent a 'resync' event and should reload.
+
+Idle subscribers block on a per-channel condition variable and only wake up
+for their own channel's events or for a periodic keep-alive comment.
+
+Streams backed by a database log (subscribe_polled) use the hub only as a
+wake-up signal and read the events themselves from the log, so their ids
+survive restarts and writes made by other worker processes are picked up
+at the next keep-alive.
+
+Every stream also has an async variant (subscribe_async,
+subscribe_polled_async) for the ASGI entry point, where waiting happens on
+the event loop instead of in a thread per connection.
+"""
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import deque
+
+BACKLOG = int(os.environ.get('YALLAORDER_EVENT_BACKLOG', 100))
+MAX_SUBSCRIBERS = int(os.environ.get('YALLAORDER_MAX_SUBSCRIBERS', 500))
+HEARTBEAT_SECONDS = 15
+# Streams are closed after this long; EventSource reconnects transparently
+STREAM_SECONDS = 300
+
+# Event ids are '<process token>-<sequence>'
+PROCESS_TOKEN = os.urandom(4).hex()
+
+
+class HubFull(Exception):
+    """Raised when MAX_SUBSCRIBERS streams are already open."""
+
+
+class _Channel:
+    __slots__ = ('name', 'condition', 'events', 'last_id', 'subscribers', 'waiters')
+
+    def __init__(self, name, backlog):
+        self.name = name
+        self.condition = threading.Condition()
+        self.events = deque(maxlen=backlog)
+        self.last_id = 0
+        self.subscribers = 0
+        # (event loop, asyncio.Event) of async subscribers waiting right now
+        self.waiters = set()
+
+    def wake(self):
+        """Wake sync and async waiters; call with self.condition held."""
+        self.condition.notify_all()
+        for loop, waiter in self.waiters:
+            # Publishers run in other threads than the subscribers' loop
+            loop.call_soon_threadsafe(waiter.set)
+
+
+def format_event(event_id, event, data):
+    lines = []
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    lines.append(f'event: {event}')
+    lines.append(f'data: {json.dumps(data)}')
+    return '\n'.join(lines) + '\n\n'
+
+
+class _Subscription:
+    """Iterator over one client's stream that frees its slot exactly once.
+
+    The WSGI server calls close() when the client goes away, even if the
+    stream was never started, which a bare generator's finally would miss.
+    """
+
+    def __init__(self, hub, channel, stream):
+        self._hub = hub
+        self._channel = channel
+        self._stream = stream
+        self._closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return next(self._stream)
+        except StopIteration:
+            self.close()
+            raise
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self._stream.close()
+            self._hub._release(self._channel)
+
+
+class _AsyncSubscription:
+    """Async counterpart of _Subscription, for the ASGI streaming responses."""
+
+    def __init__(self, hub, channel, stream):
+        self._hub = hub
+        self._channel = channel
+        self._stream = stream
+        self._closed = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return await self._stream.__anext__()
+        except BaseException:
+            # Exhausted, failed or cancelled because the client went away
+            await self.aclose()
+            raise
+
+    async def aclose(self):
+        if not self._closed:
+            self._closed = True
+            await self._stream.aclose()
+            self._hub._release(self._channel)
+
+
+class EventHub:
+    def __init__(self, backlog=BACKLOG, max_subscribers=MAX_SUBSCRIBERS):
+        self.backlog = backlog
+        self.max_subscribers = max_subscribers
+        self._channels = {}
+        self._lock = threading.Lock()
+        self._subscribers = 0
+        self._published = 0
+        self._rejected = 0
+
+    def _channel(self, name):
+        with self._lock:
+            channel = self._channels.get(name)
+            if channel is None:
+                channel = self._channels[name] = _Channel(name, self.backlog)
+            return channel
+
+    def publish(self, channel_name, event, data):
+        channel = self._channel(channel_name)
+        with channel.condition:
+            channel.last_id += 1
+            channel.events.append((channel.last_id, event, data))
+            channel.wake()
+        with self._lock:
+            self._published += 1
+        return channel.last_id
+
+    def notify(self, channel_name):
+        """Wake the channel's current subscribers without storing an event.
+
+        Meant for subscribe_polled() channels, whose events live elsewhere;
+        nothing is kept for channels nobody is listening to.
+        """
+        with self._lock:
+            channel = self._channels.get(channel_name)
+        if channel is not None:
+            with channel.condition:
+                channel.last_id += 1
+                channel.wake()
+
+    def _parse_last_id(self, last_event_id):
+        """Sequence number from a Last-Event-ID issued by this process."""
+        if not last_event_id:
+            return None
+        token, _, seq = last_event_id.partition('-')
+        if token != PROCESS_TOKEN or not seq.isdigit():
+            return -1
+        return int(seq)
+
+    def subscribe(self, channel_name, last_event_id=None, stream_seconds=STREAM_SECONDS):
+        """Return an iterator of SSE-formatted strings for one client.
+
+        Raises HubFull when the subscriber limit is reached.
+        """
+        channel = self._acquire(channel_name)
+        last_seen = self._parse_last_id(last_event_id)
+        return _Subscription(self, channel, self._stream(channel, last_seen, stream_seconds))
+
+    def subscribe_polled(self, channel_name, fetch, last_id=0, stream_seconds=STREAM_SECONDS):
+        """Stream events read by fetch(after_id) -> [(id, event, data), ...].
+
+        fetch is called on connect, whenever something is published on the
+        channel and at every keep-alive. Raises HubFull like subscribe().
+        """
+        channel = self._acquire(channel_name)
+        return _Subscription(self, channel, self._polled_stream(channel, fetch, last_id, stream_seconds))
+
+    def subscribe_async(self, channel_name, last_event_id=None, stream_seconds=STREAM_SECONDS):
+        """Async iterator version of subscribe()."""
+        channel = self._acquire(channel_name)
+        last_seen = self._parse_last_id(last_event_id)
+        return _AsyncSubscription(self, channel, self._astream(channel, last_seen, stream_seconds))
+
+    def subscribe_polled_async(self, channel_name, fetch, last_id=0, stream_seconds=STREAM_SECONDS):
+        """Async iterator version of subscribe_polled(); fetch is a coroutine function."""
+        channel = self._acquire(channel_name)
+        return _AsyncSubscription(self, channel, self._apolled_stream(channel, fetch, last_id, stream_seconds))
+
+    def _acquire(self, channel_name):
+        with self._lock:
+            if self._subscribers >= self.max_subscribers:
+                self._rejected += 1
+                raise HubFull()
+            self._subscribers += 1
+            channel = self._channels.get(channel_name)
+            if channel is None:
+                channel = self._channels[channel_name] = _Channel(channel_name, self.backlog)
+            channel.subscribers += 1
+            return channel
+
+    def _release(self, channel):
+        with self._lock:
+            self._subscribers -= 1
+            channel.subscribers -= 1
+            # Channels without listeners or backlog are dropped
+            if not channel.subscribers and not channel.events:
+                self._channels.pop(channel.name, None)
+
+    def _start_position(self, channel, last_seen):
+        """(sequence to stream after, whether the client must resync)."""
+        with channel.condition:
+            oldest = channel.events[0][0] if channel.events else channel.last_id + 1
+            if last_seen is None or last_seen > channel.last_id:
+                # New client, or an id from before a restart
+                return channel.last_id, last_seen is not None
+            if last_seen == -1 or last_seen < oldest - 1:
+                return channel.last_id, True
+            return last_seen, False
+
+    def _wait(self, channel, seen, timeout):
+        """Block until the channel moves past seen or timeout; True if it did."""
+        with channel.condition:
+            if channel.last_id == seen:
+                channel.condition.wait(timeout)
+            return channel.last_id != seen
+
+    async def _await(self, channel, seen, timeout):
+        """_wait() without blocking the event loop."""
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        with channel.condition:
+            if channel.last_id != seen:
+                return True
+            channel.waiters.add(waiter)
+        try:
+            await asyncio.wait_for(waiter[1].wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            with channel.condition:
+                channel.waiters.discard(waiter)
+        return channel.last_id != seen
+
+    def _since(self, channel, last_seen):
+        with channel.condition:
+            return [e for e in channel.events if e[0] > last_seen]
+
+    def _stream(self, channel, last_seen, stream_seconds):
+        last_seen, resync = self._start_position(channel, last_seen)
+        yield 'retry: 3000\n\n'
+        if resync:
+            yield format_event(f'{PROCESS_TOKEN}-{last_seen}', 'resync', {})
+
+        deadline = time.monotonic() + stream_seconds
+        while (remaining := deadline - time.monotonic()) > 0:
+            if not self._wait(channel, last_seen, min(HEARTBEAT_SECONDS, remaining)):
+                yield ': keep-alive\n\n'
+                continue
+            for event_id, event, data in self._since(channel, last_seen):
+                last_seen = event_id
+                yield format_event(f'{PROCESS_TOKEN}-{event_id}', event, data)
+
+    async def _astream(self, channel, last_seen, stream_seconds):
+        last_seen, resync = self._start_position(channel, last_seen)
+        yield 'retry: 3000\n\n'
+        if resync:
+            yield format_event(f'{PROCESS_TOKEN}-{last_seen}', 'resync', {})
+
+        deadline = time.monotonic() + stream_seconds
+        while (remaining := deadline - time.monotonic()) > 0:
+            if not await self._await(channel, last_seen, min(HEARTBEAT_SECONDS, remaining)):
+                yield ': keep-alive\n\n'
+                continue
+            for event_id, event, data in self._since(channel, last_seen):
+                last_seen = event_id
+                yield format_event(f'{PROCESS_TOKEN}-{event_id}', event, data)
+
+    def _polled_stream(self, channel, fetch, last_id, stream_seconds):
+        yield 'retry: 3000\n\n'
+
+        deadline = time.monotonic() + stream_seconds
+        while True:
+            # Read the channel position first so a publish during fetch()
+            # still wakes the wait below
+            seen = channel.last_id
+            for event_id, event, data in fetch(last_id):
+                last_id = event_id
+                yield format_event(event_id, event, data)
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            if not self._wait(channel, seen, min(HEARTBEAT_SECONDS, remaining)):
+                yield ': keep-alive\n\n'
+
+    async def _apolled_stream(self, channel, fetch, last_id, stream_seconds):
+        yield 'retry: 3000\n\n'
+
+        deadline = time.monotonic() + stream_seconds
+        while True:
+            seen = channel.last_id
+            for event_id, event, data in await fetch(last_id):
+                last_id = event_id
+                yield format_event(event_id, event, data)
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            if not await self._await(channel, seen, min(HEARTBEAT_SECONDS, remaining)):
+                yield ': keep-alive\n\n'
+
+    def stats(self):
+        with self._lock:
+            return {
+                'subscribers': self._subscribers,
+                'max_subscribers': self.max_subscribers,
+                'channels': len(self._channels),
+                'published': self._published,
+                'rejected': self._rejected,
+            }
+
+
+hub = EventHub()
+
+
+def restaurant_channel(restaurant_id):
+    return f'restaurant:{restaurant_id}'
+
+
+def order_channel(order_id):
+    return f'order:{order_id}'
+
+
+def publish_new_order(order_id, restaurant_ids):
+    """Tell each restaurant's dashboards about a newly committed order."""
+    for restaurant_id in restaurant_ids:
+        hub.publish(restaurant_channel(restaurant_id), 'new_order', {
+            'order_id': order_id,
+            'restaurant_id': restaurant_id,
+            'status': 'pending'
+        })
+    hub.notify(order_channel(order_id))
+
+
+def publish_status_change(restaurant_id, restaurant_order_id, order_id, status):
+    hub.publish(restaurant_channel(restaurant_id), 'status_changed', {
+        'restaurant_order_id': restaurant_order_id,
+        'order_id': order_id,
+        'restaurant_id': restaurant_id,
+        'status': status
+    })
+    # Customers read the transition itself from order_status_events
+    hub.notify(order_channel(order_id))
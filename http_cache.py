@@ -0,0 +1,54 @@
+"""HTTP validators (ETag) and Cache-Control for read endpoints.
+
+Handlers compute a cheap version for what they are about to return (a
+catalog cache stamp, or a primary-key lookup for orders) before building the
+payload. If the client already holds that version, a 304 is sent and the
+payload is never built or serialized.
+"""
+import hashlib
+import os
+
+from flask import make_response, request
+
+# Versions are per process (cache stamps restart at 1), so the ETag includes
+# a token unique to this process. Another worker never matches it and simply
+# answers 200.
+PROCESS_TOKEN = os.urandom(8).hex()
+
+CATALOG_MAX_AGE = int(os.environ.get('YALLAORDER_CATALOG_MAX_AGE', 30))
+
+
+def make_etag(*parts):
+    """Strong ETag value for the given version parts and the request host.
+
+    The host is included because payloads embed absolute image URLs.
+    """
+    raw = ':'.join(str(part) for part in (PROCESS_TOKEN, request.host_url) + parts)
+    return hashlib.blake2s(raw.encode(), digest_size=12).hexdigest()
+
+
+def conditional(etag, build, max_age=0, private=False):
+    """Answer 304 if the client has etag, else build() the response.
+
+    build returns anything a view may return. etag may be None when no
+    version is known, in which case the response is built without one.
+    """
+    if etag is not None and request.if_none_match.contains_weak(etag):
+        response = make_response('', 304)
+    else:
+        response = make_response(build())
+        if response.status_code != 200:
+            return response
+
+    if etag is not None:
+        response.set_etag(etag)
+    if private:
+        response.cache_control.private = True
+    else:
+        response.cache_control.public = True
+    if max_age:
+        response.cache_control.max_age = max_age
+    else:
+        # Cacheable, but must be revalidated (cheaply, via the ETag) every time
+        response.cache_control.no_cache = True
+    return response
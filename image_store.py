@@ -0,0 +1,135 @@
+"""Content-addressed store for menu images.
+
+Images arrive from the partner menu page as base64 data URLs. They are
+decoded once, written to MEDIA_DIR under the SHA-256 of their bytes and
+served by routes/image_routes.py; menu_items.image only holds the short
+'/images/<key>' path. Identical uploads share one file, and since a key
+never changes content the files can be cached by clients indefinitely.
+
+Thumbnails for list views are generated with Pillow when it is installed;
+without it the thumbnail URL serves the original image.
+"""
+import base64
+import binascii
+import hashlib
+import os
+import re
+
+from flask import url_for
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow is optional
+    Image = None
+
+MEDIA_DIR = os.environ.get('YALLAORDER_MEDIA', os.path.join('media', 'images'))
+THUMBNAIL_SIZE = (320, 320)
+URL_PREFIX = '/images/'
+
+EXTENSIONS = {
+    'image/jpeg': 'jpg',
+    'image/jpg': 'jpg',
+    'image/png': 'png',
+    'image/gif': 'gif',
+    'image/webp': 'webp',
+}
+
+PIL_FORMATS = {'jpg': 'JPEG', 'png': 'PNG', 'gif': 'GIF', 'webp': 'WEBP'}
+
+KEY_PATTERN = re.compile(r'^[0-9a-f]{64}\.(?:jpg|png|gif|webp)$')
+
+_DATA_URL = re.compile(r'^data:(image/[\w.+-]+);base64,(.*)$', re.DOTALL)
+# Our own image URLs, absolute or relative, as sent back by the edit form
+_IMAGE_URL = re.compile(r'/images/(?:thumbs/)?([0-9a-f]{64}\.(?:jpg|png|gif|webp))$')
+
+
+def image_path(key, thumbnail=False):
+    if thumbnail:
+        return os.path.join(MEDIA_DIR, 'thumbs', key)
+    return os.path.join(MEDIA_DIR, key)
+
+
+def _write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _write_thumbnail(key):
+    if Image is None:
+        return
+    try:
+        with Image.open(image_path(key)) as img:
+            img.thumbnail(THUMBNAIL_SIZE)
+            if key.endswith('.jpg') and img.mode not in ('RGB', 'L'):
+                img = img.convert('RGB')
+            path = image_path(key, thumbnail=True)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f'{path}.{os.getpid()}.tmp'
+            img.save(tmp_path, format=PIL_FORMATS[key.rsplit('.', 1)[1]], optimize=True, quality=80)
+        os.replace(tmp_path, path)
+    except (OSError, ValueError) as e:
+        # The original is still served in place of a missing thumbnail
+        print(f"Could not create thumbnail for {key}: {e}")
+
+
+def store_data_url(data_url):
+    """Save a base64 data URL and return its key ('<sha256>.<ext>')."""
+    match = _DATA_URL.match(data_url)
+    if not match:
+        raise ValueError('Image must be a base64 data URL')
+    ext = EXTENSIONS.get(match.group(1).lower())
+    if not ext:
+        raise ValueError(f'Unsupported image type: {match.group(1)}')
+    try:
+        data = base64.b64decode(match.group(2), validate=False)
+    except (binascii.Error, ValueError):
+        raise ValueError('Image data is not valid base64')
+
+    key = f'{hashlib.sha256(data).hexdigest()}.{ext}'
+    if not os.path.exists(image_path(key)):
+        _write_atomic(image_path(key), data)
+    if not os.path.exists(image_path(key, thumbnail=True)):
+        _write_thumbnail(key)
+    return key
+
+
+def key_from_value(value):
+    """Image key referenced by a stored menu_items.image value, if any."""
+    if not value:
+        return None
+    match = _IMAGE_URL.search(value)
+    return match.group(1) if match else None
+
+
+def normalize(value):
+    """Value to store in menu_items.image for an image sent by a client.
+
+    Data URLs are moved into the store; URLs of already stored images (the
+    edit form sends the current one back) are reduced to their path; other
+    URLs are kept as they are.
+    """
+    if not value:
+        return None
+    if value.startswith('data:'):
+        return URL_PREFIX + store_data_url(value)
+    key = key_from_value(value)
+    if key:
+        return URL_PREFIX + key
+    return value
+
+
+def with_image_urls(item):
+    """Copy of a menu item dict with absolute image and thumbnail URLs."""
+    item = dict(item)
+    if 'image' not in item:
+        return item
+    key = key_from_value(item['image'])
+    if key:
+        item['image'] = url_for('images.get_image', key=key, _external=True)
+        item['thumbnail'] = url_for('images.get_thumbnail', key=key, _external=True)
+    else:
+        item['thumbnail'] = item['image']
+    return item
@@ -0,0 +1,226 @@
+"""Request metrics and component stats in Prometheus text format.
+
+init_app() wraps every Flask request: its latency and response size go
+into fixed-bucket histograms per (blueprint, route, method), its status
+code into a counter, and requests in flight are counted per blueprint.
+Routes are labelled with their URL rule ('/orders/<int:order_id>'), not
+the path, so the number of series stays bounded. Recording a request is
+a bisect and a few additions under one lock, cheap enough to leave on.
+
+GET /metrics renders those together with the stats() of the pool, cache,
+event hub, writer and cart store. Stats keys that only ever grow are
+exposed as counters (COUNTER_KEYS), the rest as gauges.
+
+Latency is measured until the response is handed to the server, so a
+Server-Sent Events stream counts the time to open it. Endpoints answered
+by the async handlers in asgi.py never reach Flask and are not recorded.
+Set YALLAORDER_METRICS=0 to turn the request hooks off.
+"""
+import os
+import threading
+import time
+from bisect import bisect_left
+
+from flask import Response, g, request
+
+ENABLED = os.environ.get('YALLAORDER_METRICS', '1') != '0'
+PREFIX = 'yallaorder'
+
+# Upper bounds of the histogram buckets (+Inf is implied)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+# stats() keys that are running totals rather than current values
+COUNTER_KEYS = {
+    'checkouts', 'waits', 'timeouts', 'discarded',
+    'hits', 'stale_hits', 'misses', 'evictions', 'invalidations', 'refresh_errors',
+    'published', 'rejected',
+    'jobs', 'failed_jobs', 'batches', 'failed_commits',
+    'transactions', 'rollbacks', 'busy_retries', 'busy_failures',
+    'loads', 'expired', 'flushes', 'flushed_carts', 'flush_errors',
+    'runs', 'deleted_carts', 'deleted_items', 'errors',
+}
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class Histogram:
+    __slots__ = ('buckets', 'counts', 'sum')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+
+class RequestMetrics:
+    """Per-route request histograms and counters, safe across threads."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (blueprint, route, method) -> [latency Histogram, size Histogram]
+        self._routes = {}
+        # (blueprint, route, method, status) -> count
+        self._statuses = {}
+        # (blueprint, route, method) -> [request bytes, requests with a body]
+        self._request_bytes = {}
+        self._in_flight = {}
+
+    def started(self, blueprint):
+        with self._lock:
+            self._in_flight[blueprint] = self._in_flight.get(blueprint, 0) + 1
+
+    def finished(self, blueprint):
+        with self._lock:
+            self._in_flight[blueprint] -= 1
+
+    def observe(self, blueprint, route, method, status, seconds, response_bytes, request_bytes):
+        key = (blueprint, route, method)
+        with self._lock:
+            histograms = self._routes.get(key)
+            if histograms is None:
+                histograms = self._routes[key] = [Histogram(LATENCY_BUCKETS), Histogram(SIZE_BUCKETS)]
+            histograms[0].observe(seconds)
+            if response_bytes is not None:
+                histograms[1].observe(response_bytes)
+            status_key = key + (status,)
+            self._statuses[status_key] = self._statuses.get(status_key, 0) + 1
+            if request_bytes:
+                totals = self._request_bytes.setdefault(key, [0, 0])
+                totals[0] += request_bytes
+                totals[1] += 1
+
+    def render(self, lines):
+        with self._lock:
+            routes = [(key, h[0].counts[:], h[0].sum, h[1].counts[:], h[1].sum)
+                      for key, h in self._routes.items()]
+            statuses = list(self._statuses.items())
+            request_bytes = [(key, totals[:]) for key, totals in self._request_bytes.items()]
+            in_flight = list(self._in_flight.items())
+
+        name = f'{PREFIX}_http_requests_total'
+        lines.append(f'# HELP {name} Requests by route and status code.')
+        lines.append(f'# TYPE {name} counter')
+        for (blueprint, route, method, status), count in sorted(statuses):
+            lines.append(f'{name}{{{route_labels(blueprint, route, method)},status="{status}"}} {count}')
+
+        name = f'{PREFIX}_http_requests_in_flight'
+        lines.append(f'# HELP {name} Requests being handled now.')
+        lines.append(f'# TYPE {name} gauge')
+        for blueprint, count in sorted(in_flight):
+            lines.append(f'{name}{{blueprint="{escape(blueprint)}"}} {count}')
+
+        routes.sort()
+        render_histograms(lines, f'{PREFIX}_http_request_duration_seconds',
+                          'Time to handle a request.', LATENCY_BUCKETS,
+                          [(key, latency, latency_sum) for key, latency, latency_sum, _, _ in routes])
+        render_histograms(lines, f'{PREFIX}_http_response_size_bytes',
+                          'Size of response bodies with a known length.', SIZE_BUCKETS,
+                          [(key, sizes, size_sum) for key, _, _, sizes, size_sum in routes if any(sizes)])
+
+        name = f'{PREFIX}_http_request_size_bytes'
+        lines.append(f'# HELP {name} Size of request bodies.')
+        lines.append(f'# TYPE {name} summary')
+        for key, (total, count) in sorted(request_bytes):
+            labels = route_labels(*key)
+            lines.append(f'{name}_sum{{{labels}}} {total}')
+            lines.append(f'{name}_count{{{labels}}} {count}')
+
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def route_labels(blueprint, route, method):
+    return f'blueprint="{escape(blueprint)}",route="{escape(route)}",method="{method}"'
+
+
+def format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(int(value))
+
+
+def render_histograms(lines, name, help_text, buckets, series):
+    lines.append(f'# HELP {name} {help_text}')
+    lines.append(f'# TYPE {name} histogram')
+    for key, counts, total in series:
+        labels = route_labels(*key)
+        cumulative = 0
+        for bound, count in zip(buckets, counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        cumulative += counts[-1]
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {cumulative}')
+        lines.append(f'{name}_sum{{{labels}}} {format_value(total)}')
+        lines.append(f'{name}_count{{{labels}}} {cumulative}')
+
+
+def render_stats(lines, component, stats):
+    """One counter or gauge per numeric key of a component's stats()."""
+    for key, value in stats.items():
+        if isinstance(value, bool):
+            value = int(value)
+        if not isinstance(value, (int, float)):
+            continue
+        if key in COUNTER_KEYS:
+            name, kind = f'{PREFIX}_{component}_{key}_total', 'counter'
+        else:
+            name, kind = f'{PREFIX}_{component}_{key}', 'gauge'
+        lines.append(f'# TYPE {name} {kind}')
+        lines.append(f'{name} {format_value(value)}')
+
+
+requests = RequestMetrics()
+
+
+def route_key():
+    rule = request.url_rule
+    return request.blueprint or 'app', rule.rule if rule is not None else '<unmatched>', request.method
+
+
+def before_request():
+    g.metrics_started = time.perf_counter()
+    g.metrics_blueprint = request.blueprint or 'app'
+    requests.started(g.metrics_blueprint)
+
+
+def after_request(response):
+    started = g.pop('metrics_started', None)
+    if started is not None:
+        requests.observe(*route_key(), response.status_code, time.perf_counter() - started,
+                         response.content_length, request.content_length)
+    return response
+
+
+def teardown_request(exc):
+    # after_request is skipped when a handler raises; count it as a 500
+    started = g.pop('metrics_started', None)
+    if started is not None:
+        requests.observe(*route_key(), 500, time.perf_counter() - started, None, request.content_length)
+    blueprint = g.pop('metrics_blueprint', None)
+    if blueprint is not None:
+        requests.finished(blueprint)
+
+
+def init_app(app, components):
+    """Record request metrics and serve GET /metrics.
+
+    components maps a name to a callable returning that component's stats
+    dict, e.g. {'db_pool': database.pool.stats}.
+    """
+    if ENABLED:
+        app.before_request(before_request)
+        app.after_request(after_request)
+        app.teardown_request(teardown_request)
+
+    @app.route('/metrics')
+    def prometheus_metrics():
+        lines = []
+        requests.render(lines)
+        for component, stats in components.items():
+            render_stats(lines, component, stats())
+        lines.append('')
+        return Response('\n'.join(lines), content_type=CONTENT_TYPE)
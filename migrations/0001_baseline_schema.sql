@@ -0,0 +1,206 @@
+-- Schema of yallaorder.db as it existed before versioned migrations.
+-- Everything is IF NOT EXISTS so this is a no-op on existing databases
+-- and bootstraps an empty one.
+
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    first_name TEXT NOT NULL,
+    last_name TEXT NOT NULL,
+    phone TEXT UNIQUE NOT NULL,
+    password TEXT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS restaurant_owners (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    business_name TEXT NOT NULL,
+    address TEXT,
+    phone TEXT UNIQUE,
+    password TEXT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS restaurants (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    owner_id INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    description TEXT,
+    image TEXT,
+    FOREIGN KEY (owner_id) REFERENCES restaurant_owners(id)
+);
+
+CREATE TABLE IF NOT EXISTS menu_items (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    restaurant_id INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    description TEXT,
+    price REAL NOT NULL,
+    image TEXT,
+    FOREIGN KEY (restaurant_id) REFERENCES restaurants(id)
+);
+
+CREATE TABLE IF NOT EXISTS orders (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER, -- null for group orders if placed by guest
+    order_type TEXT NOT NULL,  -- 'individual' or 'group'
+    phone TEXT NOT NULL,
+    delivery_location TEXT NOT NULL,
+    delivery_fee REAL DEFAULT 0,
+    tax REAL DEFAULT 0,
+    total REAL DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, customer_name TEXT, temp_phone TEXT,
+    FOREIGN KEY (user_id) REFERENCES users(id)
+);
+
+CREATE TABLE IF NOT EXISTS group_orders (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    order_id INTEGER NOT NULL,
+    num_people INTEGER NOT NULL,
+    FOREIGN KEY (order_id) REFERENCES orders(id)
+);
+
+CREATE TABLE IF NOT EXISTS group_members (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    group_order_id INTEGER NOT NULL,
+    member_name TEXT NOT NULL,
+    person_index INTEGER NOT NULL, -- e.g., “Person 2 of 5”
+    FOREIGN KEY (group_order_id) REFERENCES group_orders(id)
+);
+
+CREATE TABLE IF NOT EXISTS order_items (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    order_id INTEGER NOT NULL,
+    menu_item_id INTEGER NOT NULL,
+    restaurant_id INTEGER NOT NULL,  -- for splitting orders per restaurant
+    quantity INTEGER NOT NULL,
+    subtotal REAL NOT NULL,
+    FOREIGN KEY (order_id) REFERENCES orders(id),
+    FOREIGN KEY (menu_item_id) REFERENCES menu_items(id),
+    FOREIGN KEY (restaurant_id) REFERENCES restaurants(id)
+);
+
+CREATE TABLE IF NOT EXISTS group_order_items (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    group_member_id INTEGER NOT NULL,
+    order_item_id INTEGER NOT NULL,
+    FOREIGN KEY (group_member_id) REFERENCES group_members(id),
+    FOREIGN KEY (order_item_id) REFERENCES order_items(id)
+);
+
+CREATE TABLE IF NOT EXISTS restaurant_orders (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    order_id INTEGER NOT NULL,
+    restaurant_id INTEGER NOT NULL,
+    status TEXT DEFAULT 'pending',
+    FOREIGN KEY (order_id) REFERENCES orders(id),
+    FOREIGN KEY (restaurant_id) REFERENCES restaurants(id)
+);
+
+CREATE TRIGGER IF NOT EXISTS trg_order_items_set_subtotal
+BEFORE INSERT ON order_items
+FOR EACH ROW
+BEGIN
+    SELECT NEW.subtotal = (SELECT price FROM menu_items WHERE id = NEW.menu_item_id) * NEW.quantity;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_order_items_update_subtotal
+BEFORE UPDATE OF quantity ON order_items
+FOR EACH ROW
+BEGIN
+    SELECT NEW.subtotal = (SELECT price FROM menu_items WHERE id = NEW.menu_item_id) * NEW.quantity;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_recalculate_total_after_insert
+AFTER INSERT ON order_items
+FOR EACH ROW
+BEGIN
+    UPDATE orders
+    SET total = (SELECT IFNULL(SUM(subtotal),0) FROM order_items WHERE order_id = NEW.order_id)
+                + delivery_fee + tax
+    WHERE id = NEW.order_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_recalculate_total_after_delete
+AFTER DELETE ON order_items
+FOR EACH ROW
+BEGIN
+    UPDATE orders
+    SET total = (SELECT IFNULL(SUM(subtotal),0) FROM order_items WHERE order_id = OLD.order_id)
+                + delivery_fee + tax
+    WHERE id = OLD.order_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_recalculate_total_after_update
+AFTER UPDATE ON order_items
+FOR EACH ROW
+BEGIN
+    UPDATE orders
+    SET total = (SELECT IFNULL(SUM(subtotal),0) FROM order_items WHERE order_id = NEW.order_id)
+                + delivery_fee + tax
+    WHERE id = NEW.order_id;
+END;
+
+CREATE TABLE IF NOT EXISTS partner_applications (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    manager_name TEXT NOT NULL,
+    manager_phone TEXT NOT NULL,
+    restaurant_name TEXT NOT NULL,
+    restaurant_phone TEXT NOT NULL,
+    restaurant_email TEXT NOT NULL,
+    address TEXT NOT NULL,
+    hotline TEXT,
+    has_license TEXT NOT NULL,
+    status TEXT DEFAULT 'pending',
+    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    reviewed_at TIMESTAMP
+, temp_password TEXT);
+
+CREATE TABLE IF NOT EXISTS carts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id TEXT NOT NULL UNIQUE,      -- guest carts
+    user_id INTEGER,                      -- logged-in user carts
+    created_at TEXT NOT NULL DEFAULT (datetime('now')),
+    updated_at TEXT NOT NULL DEFAULT (datetime('now')),
+
+    FOREIGN KEY (user_id) REFERENCES users(id)
+);
+
+CREATE TABLE IF NOT EXISTS cart_items (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+
+    cart_id INTEGER NOT NULL,
+    menu_item_id INTEGER NOT NULL,
+    restaurant_id INTEGER NOT NULL,
+
+    item_name TEXT NOT NULL,
+    price REAL NOT NULL,
+    quantity INTEGER NOT NULL DEFAULT 1,
+
+    created_at TEXT NOT NULL DEFAULT (datetime('now')),
+    updated_at TEXT NOT NULL DEFAULT (datetime('now')),
+
+    FOREIGN KEY (cart_id) REFERENCES carts(id) ON DELETE CASCADE,
+    FOREIGN KEY (menu_item_id) REFERENCES menu_items(id),
+    FOREIGN KEY (restaurant_id) REFERENCES restaurants(id),
+
+    -- Prevent same item duplicated in same cart
+    UNIQUE (cart_id, menu_item_id)
+);
+
+CREATE TRIGGER IF NOT EXISTS trg_carts_updated_at
+AFTER UPDATE ON carts
+FOR EACH ROW
+BEGIN
+    UPDATE carts
+    SET updated_at = datetime('now')
+    WHERE id = OLD.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_cart_items_updated_at
+AFTER UPDATE ON cart_items
+FOR EACH ROW
+BEGIN
+    UPDATE cart_items
+    SET updated_at = datetime('now')
+    WHERE id = OLD.id;
+END;
@@ -0,0 +1,57 @@
+-- Secondary indexes for the lookups the route handlers run on every request.
+-- cart_items(cart_id) is already covered by the UNIQUE (cart_id, menu_item_id)
+-- autoindex and carts(session_id) by its UNIQUE constraint.
+
+-- order_routes / group_order_routes: items of one order
+CREATE INDEX IF NOT EXISTS idx_order_items_order
+    ON order_items (order_id);
+
+-- restaurant_routes.get_restaurant_orders: one restaurant's items per order
+CREATE INDEX IF NOT EXISTS idx_order_items_restaurant_order
+    ON order_items (restaurant_id, order_id);
+
+-- restaurant dashboards: the order feed is read newest-first (by order id)
+-- and optionally filtered by status, so SQLite walks these instead of
+-- sorting the restaurant's whole history; the first also serves the
+-- pending badge
+CREATE INDEX IF NOT EXISTS idx_restaurant_orders_restaurant_status_order
+    ON restaurant_orders (restaurant_id, status, order_id);
+
+CREATE INDEX IF NOT EXISTS idx_restaurant_orders_restaurant_order
+    ON restaurant_orders (restaurant_id, order_id);
+
+-- customer order history: status per order
+CREATE INDEX IF NOT EXISTS idx_restaurant_orders_order
+    ON restaurant_orders (order_id);
+
+-- track-orders.html: newest orders for a phone number
+CREATE INDEX IF NOT EXISTS idx_orders_phone_created
+    ON orders (phone, created_at);
+
+CREATE INDEX IF NOT EXISTS idx_orders_user_created
+    ON orders (user_id, created_at);
+
+-- menus are listed per restaurant ordered by name
+CREATE INDEX IF NOT EXISTS idx_menu_items_restaurant_name
+    ON menu_items (restaurant_id, name);
+
+-- catalog and admin listings filter partners by status
+CREATE INDEX IF NOT EXISTS idx_partner_applications_status_name
+    ON partner_applications (status, restaurant_name);
+
+CREATE INDEX IF NOT EXISTS idx_partner_applications_status_applied
+    ON partner_applications (status, applied_at);
+
+-- submit_application / login / check-status look partners up by email
+CREATE INDEX IF NOT EXISTS idx_partner_applications_email
+    ON partner_applications (restaurant_email);
+
+-- group order summaries
+CREATE INDEX IF NOT EXISTS idx_group_orders_order
+    ON group_orders (order_id);
+
+CREATE INDEX IF NOT EXISTS idx_group_members_group
+    ON group_members (group_order_id);
+
+CREATE INDEX IF NOT EXISTS idx_group_order_items_member
+    ON group_order_items (group_member_id, order_item_id);
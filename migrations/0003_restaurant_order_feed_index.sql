@@ -0,0 +1,11 @@
+-- The restaurant order feed is read newest-first (by order id) and optionally
+-- filtered by status. 0002 now creates the matching indexes directly;
+-- databases migrated before that got a two-column (restaurant_id, status)
+-- index instead, which these supersede. A no-op everywhere else.
+DROP INDEX IF EXISTS idx_restaurant_orders_restaurant_status;
+
+CREATE INDEX IF NOT EXISTS idx_restaurant_orders_restaurant_status_order
+    ON restaurant_orders (restaurant_id, status, order_id);
+
+CREATE INDEX IF NOT EXISTS idx_restaurant_orders_restaurant_order
+    ON restaurant_orders (restaurant_id, order_id);
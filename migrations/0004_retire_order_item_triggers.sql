@@ -0,0 +1,13 @@
+-- Order creation now writes the header once with its final totals and checks
+-- the items with one aggregate query (order_store.check_order_total).
+--
+-- trg_recalculate_total_after_insert re-summed every item of the order on
+-- each insert, making an N-item order O(N^2). The two subtotal triggers ran
+-- a subquery per row whose SELECT result was discarded, so they never had
+-- any effect.
+--
+-- The update/delete recalculation triggers are kept: nothing on the hot path
+-- updates or deletes order items, and they keep manual corrections consistent.
+DROP TRIGGER IF EXISTS trg_recalculate_total_after_insert;
+DROP TRIGGER IF EXISTS trg_order_items_set_subtotal;
+DROP TRIGGER IF EXISTS trg_order_items_update_subtotal;
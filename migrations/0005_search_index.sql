@@ -0,0 +1,76 @@
+-- FTS5 indexes for menu and restaurant search (restaurant_menu_routes.search_menu_items,
+-- restaurant_routes.search_restaurants). Both are external-content tables so
+-- the text is stored only once; triggers keep them in sync with every write.
+
+CREATE VIRTUAL TABLE IF NOT EXISTS menu_items_fts USING fts5(
+    name,
+    description,
+    content = 'menu_items',
+    content_rowid = 'id',
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '2 3'
+);
+
+CREATE TRIGGER IF NOT EXISTS trg_menu_items_fts_insert
+AFTER INSERT ON menu_items
+BEGIN
+    INSERT INTO menu_items_fts (rowid, name, description)
+    VALUES (NEW.id, NEW.name, NEW.description);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_menu_items_fts_delete
+AFTER DELETE ON menu_items
+BEGIN
+    INSERT INTO menu_items_fts (menu_items_fts, rowid, name, description)
+    VALUES ('delete', OLD.id, OLD.name, OLD.description);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_menu_items_fts_update
+AFTER UPDATE OF name, description ON menu_items
+BEGIN
+    INSERT INTO menu_items_fts (menu_items_fts, rowid, name, description)
+    VALUES ('delete', OLD.id, OLD.name, OLD.description);
+    INSERT INTO menu_items_fts (rowid, name, description)
+    VALUES (NEW.id, NEW.name, NEW.description);
+END;
+
+INSERT INTO menu_items_fts (menu_items_fts) VALUES ('rebuild');
+
+-- Only approved partners are searchable, so this index holds a subset of
+-- partner_applications. Never run 'rebuild' on it: that would index every row.
+CREATE VIRTUAL TABLE IF NOT EXISTS restaurants_fts USING fts5(
+    restaurant_name,
+    content = 'partner_applications',
+    content_rowid = 'id',
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '2 3'
+);
+
+CREATE TRIGGER IF NOT EXISTS trg_restaurants_fts_insert
+AFTER INSERT ON partner_applications
+WHEN NEW.status = 'approved'
+BEGIN
+    INSERT INTO restaurants_fts (rowid, restaurant_name)
+    VALUES (NEW.id, NEW.restaurant_name);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_restaurants_fts_delete
+AFTER DELETE ON partner_applications
+WHEN OLD.status = 'approved'
+BEGIN
+    INSERT INTO restaurants_fts (restaurants_fts, rowid, restaurant_name)
+    VALUES ('delete', OLD.id, OLD.restaurant_name);
+END;
+
+-- Approval, rejection and renames
+CREATE TRIGGER IF NOT EXISTS trg_restaurants_fts_update
+AFTER UPDATE OF status, restaurant_name ON partner_applications
+BEGIN
+    INSERT INTO restaurants_fts (restaurants_fts, rowid, restaurant_name)
+    SELECT 'delete', OLD.id, OLD.restaurant_name WHERE OLD.status = 'approved';
+    INSERT INTO restaurants_fts (rowid, restaurant_name)
+    SELECT NEW.id, NEW.restaurant_name WHERE NEW.status = 'approved';
+END;
+
+INSERT INTO restaurants_fts (rowid, restaurant_name)
+SELECT id, restaurant_name FROM partner_applications WHERE status = 'approved';
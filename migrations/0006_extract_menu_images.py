@@ -0,0 +1,24 @@
+"""Move base64 images stored in menu_items.image into the image store."""
+import image_store
+
+BATCH_SIZE = 50
+
+
+def upgrade(conn):
+    last_id = 0
+    while True:
+        rows = conn.execute('''
+            SELECT id, image FROM menu_items
+            WHERE id > ? AND image LIKE 'data:%'
+            ORDER BY id LIMIT ?
+        ''', (last_id, BATCH_SIZE)).fetchall()
+        if not rows:
+            break
+        updates = []
+        for row in rows:
+            try:
+                updates.append((image_store.normalize(row['image']), row['id']))
+            except ValueError as e:
+                print(f"Skipping image of menu item {row['id']}: {e}")
+        conn.executemany('UPDATE menu_items SET image = ? WHERE id = ?', updates)
+        last_id = rows[-1]['id']
@@ -0,0 +1,23 @@
+-- Append-only log of restaurant order status transitions. Customer tracking
+-- reads it by order id after the last event id it has seen, instead of
+-- re-requesting the whole order history.
+CREATE TABLE IF NOT EXISTS order_status_events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    order_id INTEGER NOT NULL,
+    restaurant_order_id INTEGER NOT NULL,
+    restaurant_id INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    FOREIGN KEY (order_id) REFERENCES orders(id),
+    FOREIGN KEY (restaurant_order_id) REFERENCES restaurant_orders(id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_order_status_events_order
+    ON order_status_events (order_id, id);
+
+-- Seed every existing restaurant order with its current status
+INSERT INTO order_status_events (order_id, restaurant_order_id, restaurant_id, status, created_at)
+SELECT ro.order_id, ro.id, ro.restaurant_id, IFNULL(ro.status, 'pending'), IFNULL(o.created_at, CURRENT_TIMESTAMP)
+FROM restaurant_orders ro
+LEFT JOIN orders o ON o.id = ro.order_id
+ORDER BY ro.id;
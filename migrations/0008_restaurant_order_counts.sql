@@ -0,0 +1,15 @@
+-- Number of restaurant orders per restaurant and status, kept up to date by
+-- the order write path (order_store.py) so the dashboard's pending badge is a
+-- primary-key lookup instead of a COUNT(*) over the restaurant's history.
+-- `flask reconcile-order-counts` checks (and repairs) them against the rows.
+CREATE TABLE IF NOT EXISTS restaurant_order_counts (
+    restaurant_id INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (restaurant_id, status)
+) WITHOUT ROWID;
+
+INSERT OR REPLACE INTO restaurant_order_counts (restaurant_id, status, count)
+SELECT restaurant_id, IFNULL(status, 'pending'), COUNT(*)
+FROM restaurant_orders
+GROUP BY restaurant_id, IFNULL(status, 'pending');
@@ -0,0 +1,11 @@
+-- Keyset pagination reads every list in a fixed order and resumes after the
+-- last row of the previous page. Each ordering ends in the row id, which
+-- every SQLite index carries implicitly, so the existing indexes serve:
+--   restaurant order feed   (restaurant_id[, status], order_id, id)  0002
+--   order history by phone  (phone, created_at, id)                  0002
+--   order history by user   (user_id, created_at, id)                0002
+--   menu lists              (restaurant_id, name, id)                0002
+--   applications by status  (status, applied_at, id)                 0002
+-- Only the unfiltered admin application list lacked one.
+CREATE INDEX IF NOT EXISTS idx_partner_applications_applied
+    ON partner_applications (applied_at);
@@ -0,0 +1,8 @@
+-- Carts are kept in memory and written back by cart_store.py, which sets
+-- updated_at itself on every row it writes.
+--
+-- The two AFTER UPDATE triggers re-updated the row they fired for just to
+-- set updated_at, doubling every cart and cart item update (and the upsert
+-- the write-behind uses).
+DROP TRIGGER IF EXISTS trg_carts_updated_at;
+DROP TRIGGER IF EXISTS trg_cart_items_updated_at;
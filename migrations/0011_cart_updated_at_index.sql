@@ -0,0 +1,4 @@
+-- The abandoned cart sweeper (cart_store.CartSweeper) deletes the carts idle
+-- longest first: WHERE updated_at < ? ORDER BY updated_at LIMIT ?. Without
+-- this index each batch scanned the whole carts table.
+CREATE INDEX IF NOT EXISTS idx_carts_updated_at ON carts (updated_at);
@@ -0,0 +1,152 @@
+"""Versioned schema migrations.
+
+Each migration is a file in this directory named ``NNNN_description.sql`` or
+``NNNN_description.py``. SQL files are run statement by statement; Python
+files must define ``upgrade(conn)``. Every migration runs in its own
+``BEGIN IMMEDIATE`` transaction together with the row that records it in
+``schema_version``, so a failed migration leaves no trace and concurrent
+workers starting at the same time apply each migration exactly once.
+
+Run pending migrations with ``python -m migrations`` or ``flask db-upgrade``.
+"""
+import importlib.util
+import os
+import re
+import sqlite3
+from datetime import datetime
+
+MIGRATIONS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+_FILENAME = re.compile(r'^(\d{4})_(\w+)\.(sql|py)$')
+
+
+def discover():
+    """Return (version, name, path) for every migration file, in order."""
+    migrations = []
+    for filename in os.listdir(MIGRATIONS_DIR):
+        match = _FILENAME.match(filename)
+        if match:
+            migrations.append((int(match.group(1)), match.group(2),
+                               os.path.join(MIGRATIONS_DIR, filename)))
+    migrations.sort()
+
+    versions = [version for version, _, _ in migrations]
+    if len(versions) != len(set(versions)):
+        raise RuntimeError('Duplicate migration version numbers in migrations/')
+    return migrations
+
+
+def split_statements(script):
+    """Split a SQL script into complete statements (trigger bodies included)."""
+    statements = []
+    buffer = ''
+    for line in script.splitlines(keepends=True):
+        buffer += line
+        if sqlite3.complete_statement(buffer):
+            statements.append(buffer.strip())
+            buffer = ''
+    return statements
+
+
+def _ensure_version_table(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TEXT NOT NULL
+        )
+    ''')
+
+
+def current_version(conn):
+    _ensure_version_table(conn)
+    row = conn.execute('SELECT MAX(version) FROM schema_version').fetchone()
+    return row[0] or 0
+
+
+def _apply(conn, path):
+    if path.endswith('.sql'):
+        with open(path, encoding='utf-8') as f:
+            for statement in split_statements(f.read()):
+                conn.execute(statement)
+    else:
+        spec = importlib.util.spec_from_file_location(
+            'migrations._' + os.path.basename(path)[:-3], path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        module.upgrade(conn)
+
+
+def upgrade(db_name=None, target=None, log=print):
+    """Apply every pending migration up to target (default: latest).
+
+    Returns the list of versions that were applied by this call.
+    """
+    # Imported here so the migrations can be run without Flask's app context
+    from database import connect
+
+    conn = connect(db_name)
+    # Transactions are managed explicitly below
+    conn.isolation_level = None
+    applied = []
+    try:
+        _ensure_version_table(conn)
+        for version, name, path in discover():
+            if target is not None and version > target:
+                break
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                # Re-checked under the write lock: another worker may have won
+                if conn.execute('SELECT 1 FROM schema_version WHERE version = ?',
+                                (version,)).fetchone():
+                    conn.execute('ROLLBACK')
+                    continue
+                _apply(conn, path)
+                conn.execute(
+                    'INSERT INTO schema_version (version, name, applied_at) VALUES (?, ?, ?)',
+                    (version, name, datetime.now().isoformat())
+                )
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+            applied.append(version)
+            if log:
+                log(f'Applied migration {version:04d}_{name}')
+    finally:
+        conn.close()
+    return applied
+
+
+def status(db_name=None):
+    """Return (current_version, [pending (version, name)])."""
+    from database import connect
+
+    conn = connect(db_name)
+    try:
+        version = current_version(conn)
+        conn.commit()
+    finally:
+        conn.close()
+    pending = [(v, name) for v, name, _ in discover() if v > version]
+    return version, pending
+
+
+def init_app(app):
+    """Register the ``flask db-upgrade`` and ``flask db-status`` commands."""
+    import click
+
+    @app.cli.command('db-upgrade')
+    @click.option('--target', type=int, default=None, help='Stop at this version.')
+    def db_upgrade_command(target):
+        """Apply pending schema migrations."""
+        if not upgrade(target=target, log=click.echo):
+            click.echo('Database schema is up to date')
+
+    @app.cli.command('db-status')
+    def db_status_command():
+        """Show the schema version and pending migrations."""
+        version, pending = status()
+        click.echo(f'Schema version: {version}')
+        for v, name in pending:
+            click.echo(f'Pending: {v:04d}_{name}')
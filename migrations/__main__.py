@@ -0,0 +1,17 @@
+import argparse
+
+from migrations import status, upgrade
+
+parser = argparse.ArgumentParser(description='YallaOrder schema migrations')
+parser.add_argument('--db', help='Database file (default: YALLAORDER_DB or yallaorder.db)')
+parser.add_argument('--target', type=int, help='Stop at this version')
+parser.add_argument('--status', action='store_true', help='Only show the current version')
+args = parser.parse_args()
+
+if args.status:
+    version, pending = status(args.db)
+    print(f'Schema version: {version}')
+    for v, name in pending:
+        print(f'Pending: {v:04d}_{name}')
+elif not upgrade(args.db, target=args.target):
+    print('Database schema is up to date')
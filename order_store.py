@@ -0,0 +1,217 @@
+"""Write path shared by the order endpoints.
+
+Orders are written set-based: the header is inserted once with its final
+totals, items and restaurant orders go in with executemany, and a single
+aggregate query checks the stored items against the header before commit.
+This replaces the per-row triggers that re-summed the whole order on every
+item insert (see migrations/0004).
+
+Every restaurant order status, including the initial 'pending', is also
+appended to order_status_events in the same transaction; customers follow
+their order through that log (see migrations/0007).
+
+The per-restaurant, per-status totals in restaurant_order_counts are adjusted
+alongside, so reading them never has to count restaurant_orders rows
+(see migrations/0008 and reconcile_order_counts below).
+"""
+from datetime import datetime
+
+TAX_RATE = 0.14
+
+
+class OrderTotalMismatch(ValueError):
+    """Stored order items do not add up to the subtotal written on the order."""
+
+
+def insert_order(cursor, order_type, phone, delivery_location, subtotal, tax, delivery_fee,
+                 customer_name=None, temp_phone=None, user_id=None, created_at=None):
+    """Insert the order header with its final totals and return its id."""
+    total = subtotal + tax + delivery_fee
+    cursor.execute('''
+        INSERT INTO orders (
+            user_id, order_type, phone, delivery_location,
+            delivery_fee, tax, total, created_at, customer_name, temp_phone
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', (
+        user_id, order_type, phone, delivery_location, delivery_fee, tax, total,
+        created_at or datetime.now().isoformat(), customer_name, temp_phone
+    ))
+    return cursor.lastrowid
+
+
+def insert_order_items(cursor, order_id, items):
+    """Bulk insert items (dicts with menu_item_id, restaurant_id, quantity, subtotal).
+
+    Returns the new order_items ids in the same order as items. AUTOINCREMENT
+    ids only ever grow, so reading them back ordered by id lines them up with
+    the insert order.
+    """
+    cursor.executemany('''
+        INSERT INTO order_items (order_id, menu_item_id, restaurant_id, quantity, subtotal)
+        VALUES (?, ?, ?, ?, ?)
+    ''', [
+        (order_id, item['menu_item_id'], item['restaurant_id'], item['quantity'], item['subtotal'])
+        for item in items
+    ])
+    cursor.execute('SELECT id FROM order_items WHERE order_id = ? ORDER BY id', (order_id,))
+    return [row['id'] for row in cursor.fetchall()]
+
+
+def create_restaurant_orders(cursor, order_id, restaurant_ids, status='pending'):
+    """One restaurant_orders row per distinct restaurant, in first-seen order."""
+    restaurant_ids = list(dict.fromkeys(restaurant_ids))
+    cursor.executemany('''
+        INSERT INTO restaurant_orders (order_id, restaurant_id, status)
+        VALUES (?, ?, ?)
+    ''', [(order_id, restaurant_id, status) for restaurant_id in restaurant_ids])
+    # Initial status event for each restaurant order that does not have one yet
+    cursor.execute('''
+        INSERT INTO order_status_events (order_id, restaurant_order_id, restaurant_id, status, created_at)
+        SELECT ro.order_id, ro.id, ro.restaurant_id, ro.status, ?
+        FROM restaurant_orders ro
+        WHERE ro.order_id = ?
+        AND NOT EXISTS (
+            SELECT 1 FROM order_status_events e
+            WHERE e.order_id = ro.order_id AND e.restaurant_order_id = ro.id
+        )
+        ORDER BY ro.id
+    ''', (datetime.now().isoformat(), order_id))
+    adjust_order_counts(cursor, [(restaurant_id, status, 1) for restaurant_id in restaurant_ids])
+    return restaurant_ids
+
+
+def adjust_order_counts(cursor, deltas):
+    """Apply (restaurant_id, status, delta) changes to restaurant_order_counts."""
+    cursor.executemany('''
+        INSERT INTO restaurant_order_counts (restaurant_id, status, count)
+        VALUES (?, ?, ?)
+        ON CONFLICT (restaurant_id, status) DO UPDATE SET count = count + excluded.count
+    ''', deltas)
+
+
+def set_restaurant_order_status(cursor, restaurant_order_id, status):
+    """Change a restaurant order's status, keeping the counts and event log in step.
+
+    Returns a dict with the row's order_id and restaurant_id and whether the
+    status changed, or None if it does not exist. Setting the status it
+    already has writes nothing, so no duplicate event is logged. The update
+    only applies if the status is still the one read first, so a concurrent
+    change can never be counted twice; in that case the row is simply read
+    again.
+    """
+    while True:
+        row = cursor.execute(
+            'SELECT order_id, restaurant_id, status FROM restaurant_orders WHERE id = ?',
+            (restaurant_order_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        if (row['status'] or 'pending') == status:
+            return {'order_id': row['order_id'], 'restaurant_id': row['restaurant_id'], 'changed': False}
+        cursor.execute(
+            'UPDATE restaurant_orders SET status = ? WHERE id = ? AND status IS ?',
+            (status, restaurant_order_id, row['status'])
+        )
+        if cursor.rowcount:
+            break
+
+    adjust_order_counts(cursor, [
+        (row['restaurant_id'], row['status'] or 'pending', -1),
+        (row['restaurant_id'], status, 1)
+    ])
+    record_status_event(cursor, row['order_id'], restaurant_order_id, row['restaurant_id'], status)
+    return {'order_id': row['order_id'], 'restaurant_id': row['restaurant_id'], 'changed': True}
+
+
+def record_status_event(cursor, order_id, restaurant_order_id, restaurant_id, status):
+    """Append a status transition to order_status_events and return its id."""
+    cursor.execute('''
+        INSERT INTO order_status_events (order_id, restaurant_order_id, restaurant_id, status, created_at)
+        VALUES (?, ?, ?, ?, ?)
+    ''', (order_id, restaurant_order_id, restaurant_id, status, datetime.now().isoformat()))
+    return cursor.lastrowid
+
+
+def check_order_total(cursor, order_id, subtotal, item_count):
+    """Verify the stored items match what the header was written with.
+
+    One aggregate query per order instead of a trigger per inserted row.
+    Raises OrderTotalMismatch so the caller's transaction is rolled back.
+    """
+    row = cursor.execute('''
+        SELECT COUNT(*) AS item_count, IFNULL(SUM(subtotal), 0) AS subtotal
+        FROM order_items WHERE order_id = ?
+    ''', (order_id,)).fetchone()
+    if row['item_count'] != item_count or abs(row['subtotal'] - subtotal) > 0.005:
+        raise OrderTotalMismatch(
+            f'Order {order_id}: stored {row["item_count"]} items totalling {row["subtotal"]}, '
+            f'expected {item_count} totalling {subtotal}'
+        )
+
+
+ORDER_COUNT_QUERY = 'SELECT count FROM restaurant_order_counts WHERE restaurant_id = ? AND status = ?'
+
+
+def get_order_count(conn, restaurant_id, status):
+    """Number of a restaurant's orders in status, from restaurant_order_counts."""
+    row = conn.execute(ORDER_COUNT_QUERY, (restaurant_id, status)).fetchone()
+    return row['count'] if row else 0
+
+
+def reconcile_order_counts(conn, repair=False):
+    """Compare restaurant_order_counts with the restaurant_orders rows.
+
+    Returns (restaurant_id, status, stored, actual) for every mismatch. With
+    repair=True the stored counts are overwritten with the actual ones; this
+    runs under BEGIN IMMEDIATE so no order can be written in between.
+    """
+    conn.execute('BEGIN IMMEDIATE' if repair else 'BEGIN')
+    try:
+        mismatches = [tuple(row) for row in conn.execute('''
+            SELECT restaurant_id, status, SUM(stored) AS stored, SUM(actual) AS actual
+            FROM (
+                SELECT restaurant_id, IFNULL(status, 'pending') AS status, 0 AS stored, COUNT(*) AS actual
+                FROM restaurant_orders
+                GROUP BY restaurant_id, IFNULL(status, 'pending')
+                UNION ALL
+                SELECT restaurant_id, status, count, 0
+                FROM restaurant_order_counts
+            )
+            GROUP BY restaurant_id, status
+            HAVING SUM(stored) != SUM(actual)
+            ORDER BY restaurant_id, status
+        ''').fetchall()]
+        if repair and mismatches:
+            conn.executemany('''
+                INSERT INTO restaurant_order_counts (restaurant_id, status, count)
+                VALUES (?, ?, ?)
+                ON CONFLICT (restaurant_id, status) DO UPDATE SET count = excluded.count
+            ''', [(restaurant_id, status, actual) for restaurant_id, status, _, actual in mismatches])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return mismatches
+
+
+def init_app(app):
+    """Register the ``flask reconcile-order-counts`` command."""
+    import click
+    from database import get_db_connection
+
+    @app.cli.command('reconcile-order-counts')
+    @click.option('--repair', is_flag=True, help='Overwrite wrong counts with the actual ones.')
+    def reconcile_order_counts_command(repair):
+        """Check restaurant_order_counts against restaurant_orders."""
+        conn = get_db_connection()
+        try:
+            mismatches = reconcile_order_counts(conn, repair=repair)
+        finally:
+            conn.close()
+        for restaurant_id, status, stored, actual in mismatches:
+            click.echo(f'Restaurant {restaurant_id} {status}: stored {stored}, actual {actual}'
+                       + (' (repaired)' if repair else ''))
+        if not mismatches:
+            click.echo('Order counts are consistent')
+        elif not repair:
+            raise SystemExit(1)
@@ -0,0 +1,86 @@
+"""Keyset (cursor) pagination for list endpoints.
+
+A page is requested with ?limit=N; when there is more, the response carries
+a `next_cursor` (in the body for object responses, and always in the
+X-Next-Cursor and Link headers) to pass back as ?cursor=... for the next
+page. The cursor encodes the sort key of the last row returned, so the next
+page starts with a `(key...) < (?, ...)` range on the ordering index instead
+of an OFFSET that re-reads every earlier row. Clients must treat it as
+opaque. Endpoints whose screens show the whole list pass default_limit=None:
+without limit or cursor they return every row, as they did before paging.
+"""
+import base64
+import binascii
+import json
+from bisect import bisect_right
+from urllib.parse import urlencode
+
+from flask import request
+
+
+class InvalidCursor(ValueError):
+    """The cursor parameter was not produced by this API."""
+
+
+def encode_cursor(values):
+    raw = json.dumps(list(values), separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b'=').decode()
+
+
+def decode_cursor(token, size):
+    """Sort key values from a cursor; size is the number of key columns."""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        values = json.loads(raw)
+    except (binascii.Error, ValueError):
+        raise InvalidCursor('Invalid cursor')
+    if (not isinstance(values, list) or len(values) != size
+            or not all(isinstance(v, (str, int, float)) for v in values)):
+        raise InvalidCursor('Invalid cursor')
+    return values
+
+
+def page_args(default_limit, max_limit, key_size):
+    """(limit, after) from the request's limit and cursor parameters.
+
+    after is None for the first page. limit is None (no limit) when the
+    request has no limit and default_limit is None. Raises InvalidCursor.
+    """
+    limit = request.args.get('limit', default_limit, type=int)
+    if limit is not None:
+        limit = max(1, min(limit, max_limit))
+    cursor = request.args.get('cursor')
+    after = decode_cursor(cursor, key_size) if cursor else None
+    return limit, after
+
+
+def fetch_limit(limit):
+    """SQL LIMIT for a page: one extra row to detect a next page (-1: all rows)."""
+    return -1 if limit is None else limit + 1
+
+
+def split_page(rows, limit, key):
+    """(page, next_cursor) from rows fetched with LIMIT fetch_limit(limit)."""
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        return rows, encode_cursor(key(rows[-1]))
+    return rows, None
+
+
+def paginate_sorted(items, key, limit, after):
+    """Page of an in-memory list already sorted ascending by key (e.g. a cached one)."""
+    start = 0
+    if after is not None:
+        start = bisect_right(items, tuple(after), key=lambda item: tuple(key(item)))
+    end = None if limit is None else start + limit + 1
+    return split_page(items[start:end], limit, key)
+
+
+def with_next_link(response, next_cursor):
+    """Advertise the next page on a response (no-op on the last page)."""
+    if next_cursor:
+        args = [(name, value) for name, value in request.args.items(multi=True) if name != 'cursor']
+        url = f"{request.base_url}?{urlencode(args + [('cursor', next_cursor)])}"
+        response.headers['X-Next-Cursor'] = next_cursor
+        response.headers['Link'] = f'<{url}>; rel="next"'
+    return response
@@ -1,15 +1,45 @@
 from flask import Blueprint, request, jsonify
-import sqlite3
-from datetime import datetime
+from cart_store import carts, menu_item, CartItemNotFound
 
 cart_bp = Blueprint('cart', __name__)
 
-DATABASE = 'yallaorder.db'
+# Carts are read and changed in memory and written back in the background;
+# see cart_store.py. A cart item's id is its menu_item_id.
 
-def get_db():
-    conn = sqlite3.connect(DATABASE)
-    conn.row_factory = sqlite3.Row
-    return conn
+
+def cart_item_json(item):
+    return {
+        'id': item['menu_item_id'],
+        'menu_item_id': item['menu_item_id'],
+        'restaurant_id': item['restaurant_id'],
+        'restaurant_name': item['restaurant_name'],
+        'item_name': item['item_name'],
+        'price': item['price'],
+        'quantity': item['quantity'],
+        'subtotal': item['price'] * item['quantity'],
+        'created_at': item['created_at']
+    }
+
+
+def parse_id(value):
+    """value as an integer id, or None if it is not one."""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def cart_totals(items):
+    subtotal = sum(item['price'] * item['quantity'] for item in items)
+    tax = subtotal * 0.14  # 14% tax
+    delivery_fee = 25.0 if len(items) > 0 else 0.0
+    total = subtotal + tax + delivery_fee
+    return {
+        'subtotal': round(subtotal, 2),
+        'tax': round(tax, 2),
+        'delivery_fee': round(delivery_fee, 2),
+        'total': round(total, 2)
+    }
 
 # ========== CART ENDPOINTS ==========
 
@@ -21,63 +51,37 @@ def add_to_cart():
         cart_uuid = data.get('cart_uuid')
         menu_item_id = data.get('menu_item_id')
         restaurant_id = data.get('restaurant_id')
-        item_name = data.get('item_name')
-        price = data.get('price')
         quantity = data.get('quantity', 1)
 
-        if not all([cart_uuid, menu_item_id, restaurant_id, item_name, price]):
+        if not all([cart_uuid, menu_item_id, restaurant_id]):
             return jsonify({'success': False, 'error': 'Missing required fields'}), 400
 
-        conn = get_db()
-        cursor = conn.cursor()
-
-        # Get or create cart
-        cursor.execute('SELECT id FROM carts WHERE session_id = ?', (cart_uuid,))
-        cart = cursor.fetchone()
-        
-        if not cart:
-            cursor.execute(
-                'INSERT INTO carts (session_id, user_id, created_at, updated_at) VALUES (?, NULL, datetime("now"), datetime("now"))',
-                (cart_uuid,)
-            )
-            cart_id = cursor.lastrowid
-        else:
-            cart_id = cart['id']
-            # Update cart timestamp
-            cursor.execute('UPDATE carts SET updated_at = datetime("now") WHERE id = ?', (cart_id,))
-
-        # Check if item already exists in cart
-        cursor.execute(
-            'SELECT id, quantity FROM cart_items WHERE cart_id = ? AND menu_item_id = ?',
-            (cart_id, menu_item_id)
-        )
-        existing_item = cursor.fetchone()
-
-        if existing_item:
-            # Update quantity
-            new_quantity = existing_item['quantity'] + quantity
-            cursor.execute(
-                'UPDATE cart_items SET quantity = ?, updated_at = datetime("now") WHERE id = ?',
-                (new_quantity, existing_item['id'])
-            )
-            item_id = existing_item['id']
-        else:
-            # Insert new item
-            cursor.execute(
-                '''INSERT INTO cart_items 
-                   (cart_id, menu_item_id, restaurant_id, item_name, price, quantity, created_at, updated_at)
-                   VALUES (?, ?, ?, ?, ?, ?, datetime("now"), datetime("now"))''',
-                (cart_id, menu_item_id, restaurant_id, item_name, price, quantity)
-            )
-            item_id = cursor.lastrowid
-
-        conn.commit()
-        conn.close()
+        try:
+            quantity = int(quantity)
+        except (TypeError, ValueError):
+            return jsonify({'success': False, 'error': 'Quantity must be a whole number'}), 400
+
+        if quantity < 1:
+            return jsonify({'success': False, 'error': 'Quantity must be at least 1'}), 400
+
+        restaurant_id, menu_item_id = parse_id(restaurant_id), parse_id(menu_item_id)
+        if restaurant_id is None or menu_item_id is None:
+            return jsonify({'success': False, 'error': 'Invalid restaurant_id or menu_item_id'}), 400
+
+        # Name and price come from the menu; the client's are ignored
+        item = menu_item(restaurant_id, menu_item_id)
+        if item is None:
+            return jsonify({'success': False, 'error': 'Menu item not found'}), 404
+
+        def add(items):
+            items.setdefault(item['menu_item_id'], item)['quantity'] += quantity
+
+        carts.mutate(cart_uuid, add)
 
         return jsonify({
             'success': True,
             'message': 'Item added to cart',
-            'cart_item_id': item_id
+            'cart_item_id': item['menu_item_id']
         })
 
     except Exception as e:
@@ -90,61 +94,14 @@ def view_cart():
     try:
         data = request.json
         cart_uuid = data.get('cart_uuid')
-        user_id = data.get('user_id')  # Optional for logged-in users
 
         if not cart_uuid:
             return jsonify({'success': False, 'error': 'cart_uuid required'}), 400
 
-        conn = get_db()
-        cursor = conn.cursor()
-
-        # Get cart
-        if user_id:
-            cursor.execute('SELECT id FROM carts WHERE user_id = ? OR session_id = ?', (user_id, cart_uuid))
-        else:
-            cursor.execute('SELECT id FROM carts WHERE session_id = ?', (cart_uuid,))
-        
-        cart = cursor.fetchone()
-
-        if not cart:
-            return jsonify({'success': True, 'items': [], 'total_items': 0})
-
-        cart_id = cart['id']
-
-        # Get all cart items
-        cursor.execute(
-            '''SELECT 
-                ci.id,
-                ci.menu_item_id,
-                ci.restaurant_id,
-                ci.item_name,
-                ci.price,
-                ci.quantity,
-                ci.created_at,
-                r.name as restaurant_name
-               FROM cart_items ci
-               LEFT JOIN restaurants r ON ci.restaurant_id = r.id
-               WHERE ci.cart_id = ?
-               ORDER BY ci.created_at DESC''',
-            (cart_id,)
-        )
-        
-        items = cursor.fetchall()
-        conn.close()
+        version, items = carts.snapshot(cart_uuid)
 
-        cart_items = []
-        for item in items:
-            cart_items.append({
-                'id': item['id'],
-                'menu_item_id': item['menu_item_id'],
-                'restaurant_id': item['restaurant_id'],
-                'restaurant_name': item['restaurant_name'],
-                'item_name': item['item_name'],
-                'price': item['price'],
-                'quantity': item['quantity'],
-                'subtotal': item['price'] * item['quantity'],
-                'created_at': item['created_at']
-            })
+        # Most recently added first
+        cart_items = [cart_item_json(item) for item in reversed(items)]
 
         return jsonify({
             'success': True,
@@ -168,28 +125,28 @@ def update_cart_item():
         if not all([cart_uuid, cart_item_id, quantity]):
             return jsonify({'success': False, 'error': 'Missing required fields'}), 400
 
+        try:
+            quantity = int(quantity)
+        except (TypeError, ValueError):
+            return jsonify({'success': False, 'error': 'Quantity must be a whole number'}), 400
+
         if quantity < 1:
             return jsonify({'success': False, 'error': 'Quantity must be at least 1'}), 400
 
-        conn = get_db()
-        cursor = conn.cursor()
+        cart_item_id = parse_id(cart_item_id)
+        if cart_item_id is None:
+            return jsonify({'success': False, 'error': 'Invalid cart_item_id'}), 400
 
-        # Verify cart ownership and update
-        cursor.execute(
-            '''UPDATE cart_items 
-               SET quantity = ?, updated_at = datetime("now")
-               WHERE id = ? 
-               AND cart_id IN (SELECT id FROM carts WHERE session_id = ?)''',
-            (quantity, cart_item_id, cart_uuid)
-        )
+        def update(items):
+            if cart_item_id not in items:
+                raise CartItemNotFound(cart_item_id)
+            items[cart_item_id]['quantity'] = quantity
 
-        if cursor.rowcount == 0:
-            conn.close()
+        try:
+            carts.mutate(cart_uuid, update)
+        except CartItemNotFound:
             return jsonify({'success': False, 'error': 'Cart item not found'}), 404
 
-        conn.commit()
-        conn.close()
-
         return jsonify({
             'success': True,
             'message': 'Cart item updated'
@@ -210,24 +167,19 @@ def remove_cart_item():
         if not all([cart_uuid, cart_item_id]):
             return jsonify({'success': False, 'error': 'Missing required fields'}), 400
 
-        conn = get_db()
-        cursor = conn.cursor()
+        cart_item_id = parse_id(cart_item_id)
+        if cart_item_id is None:
+            return jsonify({'success': False, 'error': 'Invalid cart_item_id'}), 400
 
-        # Verify cart ownership and delete
-        cursor.execute(
-            '''DELETE FROM cart_items 
-               WHERE id = ? 
-               AND cart_id IN (SELECT id FROM carts WHERE session_id = ?)''',
-            (cart_item_id, cart_uuid)
-        )
+        def remove(items):
+            if items.pop(cart_item_id, None) is None:
+                raise CartItemNotFound(cart_item_id)
 
-        if cursor.rowcount == 0:
-            conn.close()
+        try:
+            carts.mutate(cart_uuid, remove)
+        except CartItemNotFound:
             return jsonify({'success': False, 'error': 'Cart item not found'}), 404
 
-        conn.commit()
-        conn.close()
-
         return jsonify({
             'success': True,
             'message': 'Item removed from cart'
@@ -247,26 +199,15 @@ def clear_cart():
         if not cart_uuid:
             return jsonify({'success': False, 'error': 'cart_uuid required'}), 400
 
-        conn = get_db()
-        cursor = conn.cursor()
+        def clear(items):
+            count = len(items)
+            items.clear()
+            return count
 
-        # Get cart ID
-        cursor.execute('SELECT id FROM carts WHERE session_id = ?', (cart_uuid,))
-        cart = cursor.fetchone()
-
-        if not cart:
-            conn.close()
+        deleted_count = carts.mutate(cart_uuid, clear)
+        if deleted_count == 0:
             return jsonify({'success': True, 'message': 'Cart already empty'})
 
-        cart_id = cart['id']
-
-        # Delete all items
-        cursor.execute('DELETE FROM cart_items WHERE cart_id = ?', (cart_id,))
-        deleted_count = cursor.rowcount
-
-        conn.commit()
-        conn.close()
-
         return jsonify({
             'success': True,
             'message': f'Removed {deleted_count} items from cart'
@@ -286,23 +227,11 @@ def get_cart_count():
         if not cart_uuid:
             return jsonify({'success': False, 'error': 'cart_uuid required'}), 400
 
-        conn = get_db()
-        cursor = conn.cursor()
-
-        cursor.execute(
-            '''SELECT COUNT(*) as count
-               FROM cart_items ci
-               JOIN carts c ON ci.cart_id = c.id
-               WHERE c.session_id = ?''',
-            (cart_uuid,)
-        )
-        
-        result = cursor.fetchone()
-        conn.close()
+        version, items = carts.snapshot(cart_uuid)
 
         return jsonify({
             'success': True,
-            'count': result['count']
+            'count': len(items)
         })
 
     except Exception as e:
@@ -319,47 +248,7 @@ def get_cart_summary():
         if not cart_uuid:
             return jsonify({'success': False, 'error': 'cart_uuid required'}), 400
 
-        conn = get_db()
-        cursor = conn.cursor()
-
-        # Get cart
-        cursor.execute('SELECT id FROM carts WHERE session_id = ?', (cart_uuid,))
-        cart = cursor.fetchone()
-
-        if not cart:
-            return jsonify({
-                'success': True,
-                'items': [],
-                'subtotal': 0,
-                'tax': 0,
-                'delivery_fee': 0,
-                'total': 0
-            })
-
-        cart_id = cart['id']
-
-        # Get all items with subtotals
-        cursor.execute(
-            '''SELECT 
-                ci.item_name,
-                ci.price,
-                ci.quantity,
-                (ci.price * ci.quantity) as subtotal,
-                r.name as restaurant_name
-               FROM cart_items ci
-               LEFT JOIN restaurants r ON ci.restaurant_id = r.id
-               WHERE ci.cart_id = ?''',
-            (cart_id,)
-        )
-        
-        items = cursor.fetchall()
-        conn.close()
-
-        # Calculate totals
-        subtotal = sum(item['subtotal'] for item in items)
-        tax = subtotal * 0.14  # 14% tax
-        delivery_fee = 25.0 if len(items) > 0 else 0.0
-        total = subtotal + tax + delivery_fee
+        version, items = carts.snapshot(cart_uuid)
 
         cart_items = []
         for item in items:
@@ -368,17 +257,164 @@ def get_cart_summary():
                 'restaurant_name': item['restaurant_name'],
                 'price': item['price'],
                 'quantity': item['quantity'],
-                'subtotal': item['subtotal']
+                'subtotal': item['price'] * item['quantity']
             })
 
         return jsonify({
             'success': True,
             'items': cart_items,
-            'subtotal': round(subtotal, 2),
-            'tax': round(tax, 2),
-            'delivery_fee': round(delivery_fee, 2),
-            'total': round(total, 2)
+            **cart_totals(items)
         })
 
     except Exception as e:
-        return jsonify({'success': False, 'error': str(e)}), 500
\ No newline at end of file
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+def restaurant_groups(items):
+    """Cart items grouped by restaurant, in the order restaurants were added."""
+    groups = {}
+    for item in items:
+        group = groups.get(item['restaurant_id'])
+        if group is None:
+            group = groups[item['restaurant_id']] = {
+                'restaurant_id': item['restaurant_id'],
+                'restaurant_name': item['restaurant_name'],
+                'item_ids': [],
+                'subtotal': 0
+            }
+        group['item_ids'].append(item['menu_item_id'])
+        group['subtotal'] += item['price'] * item['quantity']
+    for group in groups.values():
+        group['subtotal'] = round(group['subtotal'], 2)
+    return list(groups.values())
+
+
+@cart_bp.route('/snapshot', methods=['POST'])
+def cart_snapshot():
+    """Everything the cart pages show, in one call.
+
+    Returns the items (as /view), the counts, the items grouped by restaurant
+    and the totals (as /summary), plus the cart's version. A client that
+    sends back the version it already has gets {"unchanged": true} only.
+    """
+    try:
+        data = request.json
+        cart_uuid = data.get('cart_uuid')
+
+        if not cart_uuid:
+            return jsonify({'success': False, 'error': 'cart_uuid required'}), 400
+
+        version, items = carts.snapshot(cart_uuid)
+        if data.get('version') == version:
+            return jsonify({'success': True, 'unchanged': True, 'version': version})
+
+        cart_items = [cart_item_json(item) for item in reversed(items)]
+
+        return jsonify({
+            'success': True,
+            'unchanged': False,
+            'version': version,
+            'items': cart_items,
+            'total_items': len(cart_items),
+            'total_quantity': sum(item['quantity'] for item in items),
+            'restaurants': restaurant_groups(items),
+            **cart_totals(items)
+        })
+
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+BATCH_MAX_OPERATIONS = 100
+
+
+class BatchError(ValueError):
+    def __init__(self, index, message, status=400):
+        super().__init__(f'Operation {index}: {message}')
+        self.status = status
+
+
+def batch_operation(index, operation):
+    """Validate one /batch operation; 'add' gets its menu item looked up."""
+    if not isinstance(operation, dict):
+        raise BatchError(index, 'must be an object')
+    op = operation.get('op')
+    quantity = operation.get('quantity', 1 if op == 'add' else None)
+
+    if op == 'add':
+        if not operation.get('menu_item_id') or not operation.get('restaurant_id'):
+            raise BatchError(index, 'menu_item_id and restaurant_id required')
+        restaurant_id = parse_id(operation['restaurant_id'])
+        menu_item_id = parse_id(operation['menu_item_id'])
+        if restaurant_id is None or menu_item_id is None:
+            raise BatchError(index, 'Invalid restaurant_id or menu_item_id')
+        item = menu_item(restaurant_id, menu_item_id)
+        if item is None:
+            raise BatchError(index, 'Menu item not found', 404)
+        return op, item['menu_item_id'], quantity, item
+    if op in ('update', 'remove'):
+        if not operation.get('cart_item_id'):
+            raise BatchError(index, 'cart_item_id required')
+        cart_item_id = parse_id(operation['cart_item_id'])
+        if cart_item_id is None:
+            raise BatchError(index, 'Invalid cart_item_id')
+        return op, cart_item_id, quantity, None
+    raise BatchError(index, "op must be 'add', 'update' or 'remove'")
+
+
+@cart_bp.route('/batch', methods=['POST'])
+def batch_update_cart():
+    """Apply several add/update/remove operations at once, all or nothing.
+
+    Body: {"cart_uuid": ..., "operations": [{"op": "add", "menu_item_id",
+    "restaurant_id", "quantity"}, {"op": "update", "cart_item_id",
+    "quantity"}, {"op": "remove", "cart_item_id"}, ...]}, applied in order.
+    Returns the resulting cart with its totals.
+    """
+    try:
+        data = request.json
+        cart_uuid = data.get('cart_uuid')
+        operations = data.get('operations')
+
+        if not cart_uuid or not isinstance(operations, list):
+            return jsonify({'success': False, 'error': 'cart_uuid and operations required'}), 400
+        if len(operations) > BATCH_MAX_OPERATIONS:
+            return jsonify({
+                'success': False,
+                'error': f'At most {BATCH_MAX_OPERATIONS} operations per batch'
+            }), 400
+
+        try:
+            batch = [batch_operation(index, operation) for index, operation in enumerate(operations)]
+            for index, (op, item_id, quantity, item) in enumerate(batch):
+                if op != 'remove' and (not isinstance(quantity, int) or quantity < 1):
+                    raise BatchError(index, 'Quantity must be at least 1')
+
+            def apply(items):
+                for index, (op, item_id, quantity, item) in enumerate(batch):
+                    if op == 'add':
+                        items.setdefault(item_id, dict(item))['quantity'] += quantity
+                    elif item_id not in items:
+                        raise BatchError(index, 'Cart item not found', 404)
+                    elif op == 'update':
+                        items[item_id]['quantity'] = quantity
+                    else:
+                        del items[item_id]
+                return list(items.values())
+
+            # Raising inside apply leaves the cart untouched
+            items = carts.mutate(cart_uuid, apply)
+        except BatchError as e:
+            return jsonify({'success': False, 'error': str(e)}), e.status
+
+        cart_items = [cart_item_json(item) for item in reversed(items)]
+
+        return jsonify({
+            'success': True,
+            'items': cart_items,
+            'total_items': len(cart_items),
+            **cart_totals(items)
+        })
+
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
@@ -1,7 +1,12 @@
 # ================== routes/group_order_routes.py ==================
 from flask import Blueprint, request, jsonify
-from database import get_db_connection
-from datetime import datetime
+from database import get_db
+from http_cache import conditional, make_etag
+from order_store import (
+    TAX_RATE, insert_order, insert_order_items, create_restaurant_orders, check_order_total
+)
+from events import publish_new_order
+from db_writer import writer
 
 group_order_bp = Blueprint('group_orders', __name__)
 
@@ -10,91 +15,65 @@ group_order_bp = Blueprint('group_orders', __name__)
 def create_group_order():
     try:
         data = request.json
-        conn = get_db_connection()
-        cursor = conn.cursor()
 
-        # Calculate totals
-        subtotal = sum(item['subtotal'] for item in data['items'])
-        tax = data.get('tax', subtotal * 0.14)
-        delivery_fee = data.get('delivery_fee', 20)
-        total = subtotal + tax + delivery_fee
+        def write(conn):
+            cursor = conn.cursor()
 
-        # Create main order
-        cursor.execute('''
-            INSERT INTO orders (
-                user_id, order_type, phone, delivery_location, 
-                delivery_fee, tax, total, created_at, customer_name, temp_phone
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            None,  # user_id (null for group orders)
-            'group',
-            data['phone'],
-            data['delivery_location'],
-            delivery_fee,
-            tax,
-            total,
-            datetime.now().isoformat(),
-            data.get('customer_name', 'Group Order'),
-            data.get('temp_phone')
-        ))
-        order_id = cursor.lastrowid
-
-        # Create group order entry
-        cursor.execute('''
-            INSERT INTO group_orders (order_id, num_people) 
-            VALUES (?, ?)
-        ''', (order_id, data['num_people']))
-        group_order_id = cursor.lastrowid
-
-        # Create group members
-        member_ids = {}
-        for i, member_name in enumerate(data['members'], start=1):
+            # Calculate totals once
+            subtotal = sum(item['subtotal'] for item in data['items'])
+            tax = data.get('tax', subtotal * TAX_RATE)
+            delivery_fee = data.get('delivery_fee', 20)
+
+            # Create main order (user_id is null for group orders)
+            order_id = insert_order(
+                cursor, 'group', data['phone'], data['delivery_location'], subtotal, tax, delivery_fee,
+                customer_name=data.get('customer_name', 'Group Order'),
+                temp_phone=data.get('temp_phone')
+            )
+
+            # Create group order entry
             cursor.execute('''
+                INSERT INTO group_orders (order_id, num_people) 
+                VALUES (?, ?)
+            ''', (order_id, data['num_people']))
+            group_order_id = cursor.lastrowid
+
+            # Create group members
+            cursor.executemany('''
                 INSERT INTO group_members (group_order_id, member_name, person_index) 
                 VALUES (?, ?, ?)
-            ''', (group_order_id, member_name, i))
-            member_ids[member_name] = cursor.lastrowid
-
-        # Add order items
-        for item in data['items']:
-            cursor.execute('''
-                INSERT INTO order_items (
-                    order_id, menu_item_id, restaurant_id, quantity, subtotal
-                ) VALUES (?, ?, ?, ?, ?)
-            ''', (
-                order_id,
-                item['menu_item_id'],
-                item['restaurant_id'],
-                item['quantity'],
-                item['subtotal']
-            ))
-            order_item_id = cursor.lastrowid
-
-            # Link to group member if available
-            if 'orderedBy' in item:
-                member_id = member_ids.get(item['orderedBy'])
+            ''', [(group_order_id, member_name, i) for i, member_name in enumerate(data['members'], start=1)])
+            cursor.execute(
+                'SELECT id, member_name FROM group_members WHERE group_order_id = ? ORDER BY id',
+                (group_order_id,)
+            )
+            member_ids = {}
+            for member in cursor.fetchall():
+                member_ids[member['member_name']] = member['id']
+
+            # Add order items and link them to the group member who ordered them
+            order_item_ids = insert_order_items(cursor, order_id, data['items'])
+            links = []
+            for item, order_item_id in zip(data['items'], order_item_ids):
+                member_id = member_ids.get(item.get('orderedBy'))
                 if member_id:
-                    cursor.execute('''
-                        INSERT INTO group_order_items (group_member_id, order_item_id) 
-                        VALUES (?, ?)
-                    ''', (member_id, order_item_id))
+                    links.append((member_id, order_item_id))
+            cursor.executemany('''
+                INSERT INTO group_order_items (group_member_id, order_item_id) 
+                VALUES (?, ?)
+            ''', links)
 
-        # Create restaurant orders for each unique restaurant
-        cursor.execute('''
-            SELECT DISTINCT restaurant_id 
-            FROM order_items 
-            WHERE order_id = ?
-        ''', (order_id,))
-        restaurants = cursor.fetchall()
-        
-        for restaurant in restaurants:
-            cursor.execute('''
-                INSERT INTO restaurant_orders (order_id, restaurant_id, status) 
-                VALUES (?, ?, ?)
-            ''', (order_id, restaurant['restaurant_id'], 'pending'))
+            # Create restaurant orders for each unique restaurant
+            restaurant_ids = create_restaurant_orders(cursor, order_id, [item['restaurant_id'] for item in data['items']])
+            check_order_total(cursor, order_id, subtotal, len(data['items']))
 
-        conn.commit()
-        conn.close()
+            return order_id, restaurant_ids
+
+        # Runs on the writer thread and returns once committed
+        order_id, restaurant_ids = writer.run(write)
+
+        # Push to the restaurant dashboards only once the order is committed
+        publish_new_order(order_id, restaurant_ids)
 
         return jsonify({
             'success': True,
@@ -115,8 +94,14 @@ def create_group_order():
 # Group order summary
 @group_order_bp.route('/summary/<int:order_id>', methods=['GET'])
 def group_order_summary(order_id):
+    """Group order with each member's items and share of the bill
+
+    Members and their items come from a single join grouped in memory, so the
+    number of queries does not depend on group size. Tax is shared in
+    proportion to each member's subtotal; the delivery fee is split evenly.
+    """
     try:
-        conn = get_db_connection()
+        conn = get_db()
         cursor = conn.cursor()
         
         # Get order
@@ -124,38 +109,98 @@ def group_order_summary(order_id):
         order = cursor.fetchone()
         
         if not order:
-            conn.close()
             return jsonify({'message': 'Group order not found'}), 404
         
         # Get group order
         cursor.execute('SELECT * FROM group_orders WHERE order_id = ?', (order_id,))
         group = cursor.fetchone()
-        
-        # Get members
-        cursor.execute('SELECT * FROM group_members WHERE group_order_id = ?', (group['id'],))
-        members = cursor.fetchall()
 
-        # Get items for each member
-        member_items = {}
-        for member in members:
-            cursor.execute('''
-                SELECT oi.*, mi.name as item_name, mi.price
-                FROM order_items oi
-                JOIN menu_items mi ON oi.menu_item_id = mi.id
-                JOIN group_order_items goi ON oi.id = goi.order_item_id
-                WHERE goi.group_member_id = ?
-            ''', (member['id'],))
-            items = cursor.fetchall()
-            member_items[member['member_name']] = [dict(item) for item in items]
-
-        conn.close()
-        
-        return jsonify({
-            'order': dict(order),
-            'group': dict(group),
-            'members': [dict(m) for m in members],
-            'member_items': member_items
-        }), 200
+        if not group:
+            return jsonify({'message': 'Group order not found'}), 404
+
+        # Members with their items (members without items yield one NULL row)
+        cursor.execute('''
+            SELECT
+                gm.id AS member_id,
+                gm.group_order_id,
+                gm.member_name,
+                gm.person_index,
+                oi.id,
+                oi.order_id,
+                oi.menu_item_id,
+                oi.restaurant_id,
+                oi.quantity,
+                oi.subtotal,
+                mi.name AS item_name,
+                mi.price
+            FROM group_members gm
+            LEFT JOIN group_order_items goi ON goi.group_member_id = gm.id
+            LEFT JOIN order_items oi ON oi.id = goi.order_item_id
+            LEFT JOIN menu_items mi ON mi.id = oi.menu_item_id
+            WHERE gm.group_order_id = ?
+            ORDER BY gm.person_index, gm.id, oi.id
+        ''', (group['id'],))
+        rows = cursor.fetchall()
+
+        def build():
+            members = []
+            member_items = {}
+            member_subtotals = {}
+            for row in rows:
+                name = row['member_name']
+                if row['member_id'] not in member_subtotals:
+                    members.append({
+                        'id': row['member_id'],
+                        'group_order_id': row['group_order_id'],
+                        'member_name': name,
+                        'person_index': row['person_index']
+                    })
+                    member_items.setdefault(name, [])
+                    member_subtotals[row['member_id']] = 0
+                if row['id'] is None or row['item_name'] is None:
+                    continue
+                member_items[name].append({
+                    'id': row['id'],
+                    'order_id': row['order_id'],
+                    'menu_item_id': row['menu_item_id'],
+                    'restaurant_id': row['restaurant_id'],
+                    'quantity': row['quantity'],
+                    'subtotal': row['subtotal'],
+                    'item_name': row['item_name'],
+                    'price': row['price']
+                })
+                member_subtotals[row['member_id']] += row['subtotal']
+
+            # Each member's share of the bill. Tax is proportional to the
+            # order's whole items subtotal, so items without a member keep
+            # their part and the shares never add up to more than the tax
+            tax = order['tax'] or 0
+            delivery_fee = order['delivery_fee'] or 0
+            items_subtotal = (order['total'] or 0) - tax - delivery_fee
+            delivery_share = delivery_fee / len(members) if members else 0
+            member_totals = {}
+            for member in members:
+                subtotal = member_subtotals[member['id']]
+                tax_share = tax * subtotal / items_subtotal if items_subtotal > 0 else tax / len(members)
+                member_totals[member['member_name']] = {
+                    'subtotal': round(subtotal, 2),
+                    'tax': round(tax_share, 2),
+                    'delivery_fee': round(delivery_share, 2),
+                    'total': round(subtotal + tax_share + delivery_share, 2)
+                }
+
+            return jsonify({
+                'order': dict(order),
+                'group': dict(group),
+                'members': members,
+                'member_items': member_items,
+                'member_totals': member_totals
+            }), 200
+
+        # Item names and prices are read live from the menu, so the rows are
+        # part of the version
+        return conditional(make_etag('group_summary', *order, *group, *map(tuple, rows)),
+                           build, private=True)
 
     except Exception as e:
         print(f"Error getting group order summary: {e}")
@@ -166,26 +211,20 @@ def group_order_summary(order_id):
 @group_order_bp.route('/confirm/<int:order_id>', methods=['POST'])
 def confirm_group_order(order_id):
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Get distinct restaurants from order items
-        cursor.execute('''
-            SELECT DISTINCT restaurant_id 
-            FROM order_items 
-            WHERE order_id = ?
-        ''', (order_id,))
-        restaurants = cursor.fetchall()
-        
-        # Create restaurant orders for each restaurant
-        for restaurant in restaurants:
+        def write(conn):
+            cursor = conn.cursor()
+            # Get distinct restaurants from order items
             cursor.execute('''
-                INSERT INTO restaurant_orders (order_id, restaurant_id, status) 
-                VALUES (?, ?, ?)
-            ''', (order_id, restaurant['restaurant_id'], 'pending'))
-        
-        conn.commit()
-        conn.close()
+                SELECT DISTINCT restaurant_id 
+                FROM order_items 
+                WHERE order_id = ?
+            ''', (order_id,))
+            restaurants = cursor.fetchall()
+            # Create restaurant orders for each restaurant
+            return create_restaurant_orders(cursor, order_id, [r['restaurant_id'] for r in restaurants])
+
+        restaurant_ids = writer.run(write)
+        publish_new_order(order_id, restaurant_ids)
         
         return jsonify({
             'success': True,
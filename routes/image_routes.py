@@ -0,0 +1,40 @@
+# ================== routes/image_routes.py ==================
+import os
+
+from flask import Blueprint, abort, send_file
+import image_store
+
+image_bp = Blueprint('images', __name__)
+
+# Keys are content hashes, so a URL always refers to the same bytes
+ONE_YEAR = 365 * 24 * 3600
+
+
+def _send_image(path):
+    response = send_file(path, max_age=ONE_YEAR, conditional=True)
+    response.headers['Cache-Control'] = f'public, max-age={ONE_YEAR}, immutable'
+    return response
+
+
+# Full size image
+@image_bp.route('/<key>', methods=['GET'])
+def get_image(key):
+    if not image_store.KEY_PATTERN.match(key):
+        abort(404)
+    path = image_store.image_path(key)
+    if not os.path.isfile(path):
+        abort(404)
+    return _send_image(os.path.abspath(path))
+
+
+# Thumbnail for list views (falls back to the original)
+@image_bp.route('/thumbs/<key>', methods=['GET'])
+def get_thumbnail(key):
+    if not image_store.KEY_PATTERN.match(key):
+        abort(404)
+    path = image_store.image_path(key, thumbnail=True)
+    if not os.path.isfile(path):
+        path = image_store.image_path(key)
+        if not os.path.isfile(path):
+            abort(404)
+    return _send_image(os.path.abspath(path))
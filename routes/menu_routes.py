@@ -1,6 +1,11 @@
 # ================== routes/menu_routes.py ==================
 from flask import Blueprint, request, jsonify
-from database import get_db_connection
+from database import get_db
+from db_writer import writer
+import image_store
+import catalog
+from http_cache import conditional, make_etag, CATALOG_MAX_AGE
+from pagination import InvalidCursor, page_args, paginate_sorted, with_next_link
 
 menu_bp = Blueprint('menu', __name__)
 
@@ -8,81 +13,105 @@ menu_bp = Blueprint('menu', __name__)
 @menu_bp.route('/add', methods=['POST'])
 def add_menu_item():
     data = request.json
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute('''
-        INSERT INTO menu_items (restaurant_id, name, description, price, image)
-        VALUES (?, ?, ?, ?, ?)
-    ''', (data['restaurant_id'], data['name'], data.get('description'), data['price'], data.get('image')))
-    
-    menu_item_id = cursor.lastrowid
-    conn.commit()
-    conn.close()
+    try:
+        image = image_store.normalize(data.get('image'))
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    def write(conn):
+        return conn.execute('''
+            INSERT INTO menu_items (restaurant_id, name, description, price, image)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (data['restaurant_id'], data['name'], data.get('description'), data['price'], image)).lastrowid
+
+    menu_item_id = writer.run(write)
+    catalog.invalidate_restaurant(int(data['restaurant_id']))
     return jsonify({'message': 'Menu item added successfully', 'menu_item_id': menu_item_id})
 
 # Edit menu item
 @menu_bp.route('/edit/<int:menu_item_id>', methods=['PUT'])
 def edit_menu_item(menu_item_id):
     data = request.json
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    # Check if menu item exists
-    cursor.execute('SELECT * FROM menu_items WHERE id = ?', (menu_item_id,))
-    if not cursor.fetchone():
-        conn.close()
+    try:
+        image = image_store.normalize(data.get('image'))
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    def write(conn):
+        # Update menu item, returning its restaurant (None if it does not exist)
+        row = conn.execute('''
+            UPDATE menu_items 
+            SET name = ?, description = ?, price = ?, image = ?
+            WHERE id = ?
+            RETURNING restaurant_id
+        ''', (data['name'], data.get('description'), data['price'], image, menu_item_id)).fetchone()
+        return row['restaurant_id'] if row else None
+
+    restaurant_id = writer.run(write)
+    if restaurant_id is None:
         return jsonify({'message': 'Menu item not found'}), 404
-    
-    # Update menu item
-    cursor.execute('''
-        UPDATE menu_items 
-        SET name = ?, description = ?, price = ?, image = ?
-        WHERE id = ?
-    ''', (data['name'], data.get('description'), data['price'], data.get('image'), menu_item_id))
-    
-    conn.commit()
-    conn.close()
+    catalog.invalidate_restaurant(restaurant_id)
     return jsonify({'message': 'Menu item updated successfully'})
 
 # Delete menu item
 @menu_bp.route('/delete/<int:menu_item_id>', methods=['DELETE'])
 def delete_menu_item(menu_item_id):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    # Check if menu item exists
-    cursor.execute('SELECT * FROM menu_items WHERE id = ?', (menu_item_id,))
-    if not cursor.fetchone():
-        conn.close()
+    def write(conn):
+        row = conn.execute(
+            'DELETE FROM menu_items WHERE id = ? RETURNING restaurant_id', (menu_item_id,)
+        ).fetchone()
+        return row['restaurant_id'] if row else None
+
+    restaurant_id = writer.run(write)
+    if restaurant_id is None:
         return jsonify({'message': 'Menu item not found'}), 404
-    
-    # Delete menu item
-    cursor.execute('DELETE FROM menu_items WHERE id = ?', (menu_item_id,))
-    
-    conn.commit()
-    conn.close()
+    catalog.invalidate_restaurant(restaurant_id)
     return jsonify({'message': 'Menu item deleted successfully'})
 
 # List menu items for a restaurant
+MENU_PAGE_MAX_LIMIT = 500
+
+def load_menu_list(restaurant_id):
+    conn = get_db()
+    cursor = conn.cursor()
+    cursor.execute('SELECT * FROM menu_items WHERE restaurant_id = ? ORDER BY name, id', (restaurant_id,))
+    return [dict(i) for i in cursor.fetchall()]
+
+def menu_sort_key(item):
+    return (item['name'], item['id'])
+
 @menu_bp.route('/list/<int:restaurant_id>', methods=['GET'])
 def list_menu(restaurant_id):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM menu_items WHERE restaurant_id = ?', (restaurant_id,))
-    items = cursor.fetchall()
-    conn.close()
-    return jsonify([dict(i) for i in items])
+    """Menu items by name; the next page is in the X-Next-Cursor/Link headers
+
+    Query params:
+        limit: items per page (max 500; without limit or cursor, all)
+        cursor: X-Next-Cursor of the previous page
+    """
+    try:
+        limit, after = page_args(None, MENU_PAGE_MAX_LIMIT, 2)
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
+
+    items, stamp = catalog.cached_stamped(
+        catalog.restaurant_key('menu_list', restaurant_id),
+        lambda: load_menu_list(restaurant_id)
+    )
+    page, next_cursor = paginate_sorted(items, menu_sort_key, limit, after)
+    etag = make_etag('menu_list', restaurant_id, stamp, limit, request.args.get('cursor')) if stamp else None
+    return conditional(
+        etag,
+        lambda: with_next_link(jsonify([image_store.with_image_urls(i) for i in page]), next_cursor),
+        max_age=CATALOG_MAX_AGE
+    )
 
 # Get single menu item details
 @menu_bp.route('/item/<int:menu_item_id>', methods=['GET'])
 def get_menu_item(menu_item_id):
-    conn = get_db_connection()
+    conn = get_db()
     cursor = conn.cursor()
     cursor.execute('SELECT * FROM menu_items WHERE id = ?', (menu_item_id,))
     item = cursor.fetchone()
-    conn.close()
     
     if item:
-        return jsonify(dict(item))
+        return jsonify(image_store.with_image_urls(item))
     else:
         return jsonify({'message': 'Menu item not found'}), 404
\ No newline at end of file
@@ -1,7 +1,15 @@
 # ================== routes/order_routes.py ==================
-from flask import Blueprint, request, jsonify
-from database import get_db_connection
-from datetime import datetime
+from flask import Blueprint, request, jsonify, Response
+import database
+from database import get_db, placeholders
+from http_cache import conditional, make_etag
+from order_store import (
+    TAX_RATE, insert_order, insert_order_items, create_restaurant_orders, check_order_total
+)
+from events import hub, HubFull, order_channel, publish_new_order
+from pagination import InvalidCursor, fetch_limit, page_args, split_page, with_next_link
+from db_writer import writer
+from cart_store import carts, CartEmpty
 
 order_bp = Blueprint('orders', __name__)
 
@@ -26,82 +34,64 @@ def create_order():
         delivery_location = data['delivery_location']
         order_type = data.get('order_type', 'individual')
         
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Get cart
-        cursor.execute("SELECT id FROM carts WHERE session_id = ?", (cart_uuid,))
-        cart = cursor.fetchone()
-        
-        if not cart:
-            conn.close()
-            return jsonify({'success': False, 'error': 'Cart not found'}), 404
-        
-        cart_id = cart['id']
-        
-        # Get cart items
-        cursor.execute("""
-            SELECT ci.*, mi.price as current_price
-            FROM cart_items ci
-            JOIN menu_items mi ON ci.menu_item_id = mi.id
-            WHERE ci.cart_id = ?
-        """, (cart_id,))
-        cart_items = cursor.fetchall()
+        def write(conn, items):
+            cursor = conn.cursor()
+            
+            # Items whose menu item has since been deleted are left out
+            menu_item_ids = [item['menu_item_id'] for item in items]
+            cursor.execute(
+                f"SELECT id FROM menu_items WHERE id IN ({placeholders(menu_item_ids)})", menu_item_ids
+            )
+            on_menu = {row['id'] for row in cursor.fetchall()}
+            cart_items = [item for item in items if item['menu_item_id'] in on_menu]
+            
+            if not cart_items:
+                raise CartEmpty(cart_uuid)
+            
+            # Calculate totals once
+            order_items = [{
+                'menu_item_id': item['menu_item_id'],
+                'restaurant_id': item['restaurant_id'],
+                'quantity': item['quantity'],
+                'subtotal': item['price'] * item['quantity']
+            } for item in cart_items]
+            subtotal = sum(item['subtotal'] for item in order_items)
+            tax = subtotal * TAX_RATE
+            delivery_fee = 20.0
+            
+            # Create order header, items and restaurant orders in bulk
+            order_id = insert_order(
+                cursor, order_type, phone, delivery_location, subtotal, tax, delivery_fee,
+                customer_name=customer_name, temp_phone=temp_phone
+            )
+            insert_order_items(cursor, order_id, order_items)
+            restaurant_ids = create_restaurant_orders(cursor, order_id, [item['restaurant_id'] for item in order_items])
+            check_order_total(cursor, order_id, subtotal, len(order_items))
+            
+            # Clear the stored cart, if it was ever written back
+            cursor.execute(
+                "DELETE FROM cart_items WHERE cart_id IN (SELECT id FROM carts WHERE session_id = ?)",
+                (cart_uuid,)
+            )
+            cursor.execute("DELETE FROM carts WHERE session_id = ?", (cart_uuid,))
+            
+            return {
+                'order_id': order_id,
+                'total': subtotal + tax + delivery_fee,
+                'restaurant_ids': restaurant_ids
+            }
         
-        if not cart_items:
-            conn.close()
+        # Orders exactly the in-memory cart; runs on the writer thread and
+        # returns once committed
+        try:
+            result = carts.checkout(cart_uuid, write)
+        except CartEmpty:
             return jsonify({'success': False, 'error': 'Cart is empty'}), 400
+        order_id = result['order_id']
+        total = result['total']
         
-        # Calculate totals
-        subtotal = sum(item['price'] * item['quantity'] for item in cart_items)
-        tax = subtotal * 0.14  # 14% tax
-        delivery_fee = 20.0
-        total = subtotal + tax + delivery_fee
-        
-        # Create order
-        cursor.execute("""
-       INSERT INTO orders (
-           user_id, order_type, phone, delivery_location, 
-           delivery_fee, tax, total, created_at, customer_name, temp_phone
-       ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-   """, (None, order_type, phone, delivery_location, delivery_fee, tax, total, 
-         datetime.now().isoformat(), customer_name, temp_phone))
-        
-        order_id = cursor.lastrowid
-        
-        # Add order items
-        for item in cart_items:
-            cursor.execute("""
-                INSERT INTO order_items (
-                    order_id, menu_item_id, restaurant_id, 
-                    quantity, subtotal
-                ) VALUES (?, ?, ?, ?, ?)
-            """, (
-                order_id,
-                item['menu_item_id'],
-                item['restaurant_id'],
-                item['quantity'],
-                item['price'] * item['quantity']
-            ))
-        
-        # Create restaurant orders 
-        cursor.execute("""
-            SELECT DISTINCT restaurant_id FROM cart_items WHERE cart_id = ?
-        """, (cart_id,))
-        restaurants = cursor.fetchall()
-        
-        for restaurant in restaurants:
-            cursor.execute("""
-                INSERT INTO restaurant_orders (order_id, restaurant_id, status)
-                VALUES (?, ?, 'pending')
-            """, (order_id, restaurant['restaurant_id']))
-        
-        # Clear the cart
-        cursor.execute("DELETE FROM cart_items WHERE cart_id = ?", (cart_id,))
-        cursor.execute("DELETE FROM carts WHERE id = ?", (cart_id,))
-        
-        conn.commit()
-        conn.close()
+        # Push to the restaurant dashboards only once the order is committed
+        publish_new_order(order_id, result['restaurant_ids'])
         
         return jsonify({
             'success': True,
@@ -126,7 +116,7 @@ def create_order():
 @order_bp.route('/<int:order_id>', methods=['GET'])
 def get_order(order_id):
     try:
-        conn = get_db_connection()
+        conn = get_db()
         cursor = conn.cursor()
         
         # Get order details
@@ -134,7 +124,6 @@ def get_order(order_id):
         order = cursor.fetchone()
         
         if not order:
-            conn.close()
             return jsonify({'success': False, 'error': 'Order not found'}), 404
         
         # Get order items with menu item details
@@ -148,29 +137,32 @@ def get_order(order_id):
             WHERE oi.order_id = ?
         """, (order_id,))
         items = cursor.fetchall()
-        
-        conn.close()
-        
-        # Convert to dict
-        order_dict = dict(order)
-        items_list = [dict(item) for item in items]
-        
-        return jsonify({
-            'success': True,
-            'order': {
-                'id': order_dict['id'],
-                'customer_name': order_dict['customer_name'],
-                'phone': order_dict['phone'],
-                'temp_phone': None,  
-                'delivery_location': order_dict['delivery_location'],
-                'order_type': order_dict['order_type'],
-                'delivery_fee': order_dict['delivery_fee'],
-                'tax': order_dict['tax'],
-                'total': order_dict['total'],
-                'created_at': order_dict['created_at'],
-                'items': items_list
-            }
-        }), 200
+
+        def build():
+            # Convert to dict
+            order_dict = dict(order)
+            items_list = [dict(item) for item in items]
+            
+            return jsonify({
+                'success': True,
+                'order': {
+                    'id': order_dict['id'],
+                    'customer_name': order_dict['customer_name'],
+                    'phone': order_dict['phone'],
+                    'temp_phone': None,  
+                    'delivery_location': order_dict['delivery_location'],
+                    'order_type': order_dict['order_type'],
+                    'delivery_fee': order_dict['delivery_fee'],
+                    'tax': order_dict['tax'],
+                    'total': order_dict['total'],
+                    'created_at': order_dict['created_at'],
+                    'items': items_list
+                }
+            }), 200
+        
+        # The items carry live menu names and prices, so they are part of the
+        # version; a 304 still skips building and sending the payload
+        return conditional(make_etag('order', *order, *map(tuple, items)), build, private=True)
         
     except Exception as e:
         print(f"Error fetching order: {e}")
@@ -186,127 +178,173 @@ def get_order(order_id):
 @order_bp.route('/place', methods=['POST'])
 def place_order():
     data = request.json
-    conn = get_db_connection()
-    cursor = conn.cursor()
 
-    cursor.execute('''
-        INSERT INTO orders (user_id, order_type, phone, delivery_location, delivery_fee, tax, total)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-    ''', (
-        data.get('user_id'), 'individual', data['phone'], data['delivery_location'],
-        data.get('delivery_fee', 0), data.get('tax', 0), data.get('total', 0)
-    ))
-    order_id = cursor.lastrowid
-
-    for item in data['items']:
-        cursor.execute('''
-            INSERT INTO order_items (order_id, menu_item_id, restaurant_id, quantity, subtotal)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (order_id, item['menu_item_id'], item['restaurant_id'], item['quantity'], item['subtotal']))
-
-    conn.commit()
-    conn.close()
+    def write(conn):
+        cursor = conn.cursor()
+        # The total is derived from the items, as the old per-row trigger did
+        subtotal = sum(item['subtotal'] for item in data['items'])
+        order_id = insert_order(
+            cursor, 'individual', data['phone'], data['delivery_location'], subtotal,
+            data.get('tax', 0), data.get('delivery_fee', 0), user_id=data.get('user_id')
+        )
+        insert_order_items(cursor, order_id, data['items'])
+        check_order_total(cursor, order_id, subtotal, len(data['items']))
+        return order_id
+
+    order_id = writer.run(write)
     return jsonify({'message': 'Order placed', 'order_id': order_id})
 
 
 # Individual order summary
 @order_bp.route('/summary/<int:order_id>', methods=['GET'])
 def order_summary(order_id):
-    conn = get_db_connection()
+    conn = get_db()
     cursor = conn.cursor()
     cursor.execute('SELECT * FROM orders WHERE id = ?', (order_id,))
     order = cursor.fetchone()
     if not order:
-        conn.close()
         return jsonify({'message': 'Order not found'}), 404
+
     cursor.execute('SELECT * FROM order_items WHERE order_id = ?', (order_id,))
     items = cursor.fetchall()
-    conn.close()
-    return jsonify({'order': dict(order), 'items': [dict(i) for i in items]})
+
+    def build():
+        return jsonify({'order': dict(order), 'items': [dict(i) for i in items]})
+
+    return conditional(make_etag('order_summary', *order, *map(tuple, items)), build, private=True)
 
 
 # Confirm order and create restaurant orders 
 @order_bp.route('/confirm/<int:order_id>', methods=['POST'])
 def confirm_order(order_id):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    # Get distinct restaurants from order items
-    cursor.execute('SELECT DISTINCT restaurant_id FROM order_items WHERE order_id = ?', (order_id,))
-    restaurants = cursor.fetchall()
-    
-    # Create restaurant orders for each restaurant
-    for r in restaurants:
-        cursor.execute('''
-            INSERT INTO restaurant_orders (order_id, restaurant_id, status)
-            VALUES (?, ?, ?)
-        ''', (order_id, r['restaurant_id'], 'pending'))
-    
-    conn.commit()
-    conn.close()
+    def write(conn):
+        cursor = conn.cursor()
+        # Get distinct restaurants from order items
+        cursor.execute('SELECT DISTINCT restaurant_id FROM order_items WHERE order_id = ?', (order_id,))
+        restaurants = cursor.fetchall()
+        # Create restaurant orders for each restaurant
+        return create_restaurant_orders(cursor, order_id, [r['restaurant_id'] for r in restaurants])
+
+    restaurant_ids = writer.run(write)
+    publish_new_order(order_id, restaurant_ids)
     return jsonify({'message': 'Order confirmed and sent to restaurants'})
 
 
-# List all orders for a user by user_id
+HISTORY_MAX_LIMIT = 200
+
+
+def order_sort_key(order):
+    return (order['created_at'], order['id'])
+
+
+# List a user's orders by user_id, newest first
 @order_bp.route('/user/id/<int:user_id>', methods=['GET'])
 def user_orders(user_id):
-    conn = get_db_connection()
+    """Query params: limit (max 200; without limit or cursor, all) and cursor (X-Next-Cursor)"""
+    try:
+        limit, after = page_args(None, HISTORY_MAX_LIMIT, 2)
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
+
+    conn = get_db()
     cursor = conn.cursor()
-    cursor.execute('SELECT * FROM orders WHERE user_id = ?', (user_id,))
-    orders = cursor.fetchall()
-    conn.close()
-    return jsonify([dict(o) for o in orders])
+    keyset_clause = 'AND (created_at, id) < (?, ?)' if after else ''
+    cursor.execute(f"""
+        SELECT * FROM orders WHERE user_id = ? {keyset_clause}
+        ORDER BY created_at DESC, id DESC LIMIT ?
+    """, (user_id, *(after or ()), fetch_limit(limit)))
+    orders, next_cursor = split_page(cursor.fetchall(), limit, order_sort_key)
+    return with_next_link(jsonify([dict(o) for o in orders]), next_cursor)
+
+
+# Progression of a restaurant order; used to combine per-restaurant statuses
+STATUS_FLOW = ['pending', 'preparing', 'on_the_way', 'delivered']
+
+
+def combined_status(statuses):
+    """Overall status of an order from its per-restaurant statuses.
+
+    The order is only as far along as its slowest restaurant. Cancelled
+    restaurant orders are ignored unless every one of them was cancelled.
+    """
+    if not statuses:
+        return 'pending'
+    active = [s for s in statuses if s != 'cancelled']
+    if not active:
+        return 'cancelled'
+    return min(active, key=lambda s: STATUS_FLOW.index(s) if s in STATUS_FLOW else 0)
 
 
 # Get user orders by phone number
 @order_bp.route('/user/phone/<string:phone>', methods=['GET'])
 def get_user_orders_by_phone(phone):
-    """Get all orders for a user by phone number"""
+    """Get the most recent orders for a user by phone number
+
+    Items and per-restaurant statuses for all returned orders are loaded with
+    one batched query each, so the query count does not grow with history.
+    The next page, if any, is advertised in the X-Next-Cursor/Link headers.
+
+    Query params:
+        limit: number of orders to return (max 200; without limit or cursor, all)
+        cursor: X-Next-Cursor of the previous page
+    """
     try:
-        conn = get_db_connection()
+        limit, after = page_args(None, HISTORY_MAX_LIMIT, 2)
+
+        conn = get_db()
         cursor = conn.cursor()
         
-        print(f"DEBUG: Searching for orders with phone: {phone}")  
-        
-        # Get all orders for this phone number
-        cursor.execute("""
-            SELECT * FROM orders WHERE phone = ? ORDER BY created_at DESC
-        """, (phone,))
-        
-        orders = cursor.fetchall()
-        
-        print(f"DEBUG: Found {len(orders)} orders")  
+        keyset_clause = 'AND (created_at, id) < (?, ?)' if after else ''
+        cursor.execute(f"""
+            SELECT * FROM orders WHERE phone = ? {keyset_clause}
+            ORDER BY created_at DESC, id DESC LIMIT ?
+        """, (phone, *(after or ()), fetch_limit(limit)))
+        orders, next_cursor = split_page(cursor.fetchall(), limit, order_sort_key)
         
         if not orders:
-            conn.close()
             return jsonify([]), 200
+
+        order_ids = [order['id'] for order in orders]
+        in_clause = placeholders(order_ids)
+
+        # Items of all orders
+        cursor.execute(f"""
+            SELECT 
+                oi.order_id,
+                oi.id,
+                oi.quantity,
+                oi.subtotal,
+                mi.name as item_name,
+                mi.price
+            FROM order_items oi
+            JOIN menu_items mi ON oi.menu_item_id = mi.id
+            WHERE oi.order_id IN ({in_clause})
+            ORDER BY oi.id
+        """, order_ids)
+        items_by_order = {}
+        for item in cursor.fetchall():
+            item = dict(item)
+            items_by_order.setdefault(item.pop('order_id'), []).append(item)
+
+        # Status of every restaurant taking part in each order
+        cursor.execute(f"""
+            SELECT order_id, id, restaurant_id, status
+            FROM restaurant_orders
+            WHERE order_id IN ({in_clause})
+            ORDER BY id
+        """, order_ids)
+        statuses_by_order = {}
+        for row in cursor.fetchall():
+            statuses_by_order.setdefault(row['order_id'], []).append({
+                'restaurant_order_id': row['id'],
+                'restaurant_id': row['restaurant_id'],
+                'status': row['status']
+            })
         
         orders_list = []
         for order in orders:
             order_dict = dict(order)
-            
-            # Get order items
-            cursor.execute("""
-                SELECT 
-                    oi.id,
-                    oi.quantity,
-                    oi.subtotal,
-                    mi.name as item_name,
-                    mi.price
-                FROM order_items oi
-                JOIN menu_items mi ON oi.menu_item_id = mi.id
-                WHERE oi.order_id = ?
-            """, (order_dict['id'],))
-            
-            items = cursor.fetchall()
-            
-            # Get status from restaurant_orders
-            cursor.execute("""
-                SELECT status FROM restaurant_orders WHERE order_id = ? LIMIT 1
-            """, (order_dict['id'],))
-            
-            status_row = cursor.fetchone()
-            status = status_row['status'] if status_row else 'pending'
+            restaurant_statuses = statuses_by_order.get(order_dict['id'], [])
             
             orders_list.append({
                 'id': order_dict['id'],
@@ -319,18 +357,121 @@ def get_user_orders_by_phone(phone):
                 'tax': order_dict['tax'],
                 'total': order_dict['total'],
                 'created_at': order_dict['created_at'],
-                'status': status,
-                'items': [dict(item) for item in items]
+                'status': combined_status([r['status'] for r in restaurant_statuses]),
+                'restaurant_statuses': restaurant_statuses,
+                'items': items_by_order.get(order_dict['id'], [])
             })
         
-        conn.close()
-        
-        print(f"DEBUG: Returning {len(orders_list)} orders")  # Debug log
-        
-        return jsonify(orders_list), 200
+        return with_next_link(jsonify(orders_list), next_cursor), 200
         
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         print(f"Error getting user orders: {str(e)}")
         import traceback
         traceback.print_exc()
-        return jsonify({'error': str(e)}), 500
\ No newline at end of file
+        return jsonify({'error': str(e)}), 500
+
+
+# Status tracking for customers, read from the order_status_events log
+STATUS_EVENTS_LIMIT = 100
+
+
+STATUS_EVENTS_QUERY = """
+    SELECT id, order_id, restaurant_order_id, restaurant_id, status, created_at
+    FROM order_status_events
+    WHERE order_id = ? AND id > ?
+    ORDER BY id
+    LIMIT ?
+"""
+
+RESTAURANT_STATUSES_QUERY = 'SELECT status FROM restaurant_orders WHERE order_id = ?'
+
+
+def with_order_status(events, statuses):
+    """Attach the order's combined status to each of its events."""
+    order_status = combined_status(statuses)
+    for event in events:
+        event['order_status'] = order_status
+    return events
+
+
+def load_status_events(conn, order_id, after_id=0, limit=STATUS_EVENTS_LIMIT):
+    """Status events of an order after after_id, oldest first.
+
+    Each event also carries the order's combined status as of the newest
+    restaurant order statuses, so clients need not recompute it.
+    """
+    events = [dict(row) for row in conn.execute(STATUS_EVENTS_QUERY, (order_id, after_id, limit)).fetchall()]
+    if events:
+        statuses = [row['status'] for row in conn.execute(RESTAURANT_STATUSES_QUERY, (order_id,)).fetchall()]
+        with_order_status(events, statuses)
+    return events
+
+
+def event_id_param(value):
+    return int(value) if value and value.isdigit() else 0
+
+
+@order_bp.route('/<int:order_id>/events', methods=['GET'])
+def get_order_status_events(order_id):
+    """Status transitions of an order's restaurants
+
+    Query params:
+        after: only return events with a larger id (default 0)
+    """
+    try:
+        conn = get_db()
+        if conn.execute('SELECT 1 FROM orders WHERE id = ?', (order_id,)).fetchone() is None:
+            return jsonify({'error': 'Order not found'}), 404
+
+        after_id = event_id_param(request.args.get('after'))
+        events = load_status_events(conn, order_id, after_id)
+
+        return jsonify({
+            'order_id': order_id,
+            'events': events,
+            'last_event_id': events[-1]['id'] if events else after_id
+        }), 200
+
+    except Exception as e:
+        print(f"Error getting order status events: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+
+@order_bp.route('/<int:order_id>/events/stream', methods=['GET'])
+def stream_order_status_events(order_id):
+    """Server-Sent Events stream of an order's status transitions
+
+    Event ids are order_status_events ids, so a client resuming with
+    Last-Event-ID (or ?after=) receives exactly the transitions it missed.
+    """
+    try:
+        conn = get_db()
+        if conn.execute('SELECT 1 FROM orders WHERE id = ?', (order_id,)).fetchone() is None:
+            return jsonify({'error': 'Order not found'}), 404
+    except Exception as e:
+        print(f"Error opening order status stream: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+    after_id = event_id_param(request.headers.get('Last-Event-ID') or request.args.get('after'))
+
+    def fetch(after):
+        # Runs after the request has ended, so it borrows its own connection
+        conn = database.pool.acquire()
+        try:
+            return [(event['id'], 'status', event) for event in load_status_events(conn, order_id, after)]
+        finally:
+            database.pool.release(conn)
+
+    try:
+        stream = hub.subscribe_polled(order_channel(order_id), fetch, after_id)
+    except HubFull:
+        response = jsonify({'error': 'Too many open streams, poll instead'})
+        response.headers['Retry-After'] = '30'
+        return response, 503
+
+    return Response(stream, mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
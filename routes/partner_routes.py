@@ -1,8 +1,12 @@
 from flask import Blueprint, request, jsonify
-from database import get_db_connection
-from datetime import datetime
+from database import get_db
+from datetime import datetime, timedelta, timezone
 import secrets
 import string
+import catalog
+from cache import TTLCache
+from pagination import InvalidCursor, fetch_limit, page_args, split_page, with_next_link
+from db_writer import writer
 
 partner_app_bp = Blueprint('partner_applications', __name__)
 
@@ -24,40 +28,38 @@ def submit_application():
             if field not in data or not data[field]:
                 return jsonify({'error': f'Missing required field: {field}'}), 400
         
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Check if email already exists
-        existing = cursor.execute(
-            'SELECT id FROM partner_applications WHERE restaurant_email = ?',
-            (data['restaurant_email'],)
-        ).fetchone()
-        
-        if existing:
-            conn.close()
+        def write(conn):
+            # Check if email already exists (on the writer, so two
+            # submissions of one email cannot both pass it)
+            existing = conn.execute(
+                'SELECT id FROM partner_applications WHERE restaurant_email = ?',
+                (data['restaurant_email'],)
+            ).fetchone()
+            if existing:
+                return None
+            
+            # Insert new application
+            return conn.execute('''
+                INSERT INTO partner_applications 
+                (manager_name, manager_phone, restaurant_name, restaurant_phone, 
+                 restaurant_email, address, hotline, has_license, status, applied_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, 'pending', ?)
+            ''', (
+                data['manager_name'],
+                data['manager_phone'],
+                data['restaurant_name'],
+                data['restaurant_phone'],
+                data['restaurant_email'],
+                data['address'],
+                data.get('hotline', 'N/A'),
+                data['has_license'],
+                datetime.now().isoformat()
+            )).lastrowid
+        
+        application_id = writer.run(write)
+        if application_id is None:
             return jsonify({'error': 'An application with this email already exists'}), 409
-        
-        # Insert new application
-        cursor.execute('''
-            INSERT INTO partner_applications 
-            (manager_name, manager_phone, restaurant_name, restaurant_phone, 
-             restaurant_email, address, hotline, has_license, status, applied_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, 'pending', ?)
-        ''', (
-            data['manager_name'],
-            data['manager_phone'],
-            data['restaurant_name'],
-            data['restaurant_phone'],
-            data['restaurant_email'],
-            data['address'],
-            data.get('hotline', 'N/A'),
-            data['has_license'],
-            datetime.now().isoformat()
-        ))
-        
-        conn.commit()
-        application_id = cursor.lastrowid
-        conn.close()
+        statistics_cache.clear()
         
         return jsonify({
             'message': 'Application submitted successfully',
@@ -78,7 +80,7 @@ def check_application_status():
         if 'email' not in data:
             return jsonify({'error': 'Email is required'}), 400
         
-        conn = get_db_connection()
+        conn = get_db()
         cursor = conn.cursor()
         
         application = cursor.execute(
@@ -86,8 +88,6 @@ def check_application_status():
             (data['email'],)
         ).fetchone()
         
-        conn.close()
-        
         if not application:
             return jsonify({'error': 'No application found with this email'}), 404
         
@@ -116,7 +116,7 @@ def partner_login():
         if 'email' not in data or 'password' not in data:
             return jsonify({'error': 'Email and password are required'}), 400
         
-        conn = get_db_connection()
+        conn = get_db()
         cursor = conn.cursor()
         
         # Get application with approved status
@@ -125,8 +125,6 @@ def partner_login():
             (data['email'],)
         ).fetchone()
         
-        conn.close()
-        
         if not application:
             return jsonify({'error': 'Invalid credentials'}), 401
         
@@ -165,33 +163,61 @@ def partner_login():
 
 
 # Get all applications (Admin)
+APPLICATIONS_MAX_LIMIT = 500
+
 @partner_app_bp.route('/applications', methods=['GET'])
 def get_applications():
+    """Applications, newest first, one page at a time
+
+    Query params:
+        status: optional status filter
+        limit: applications per page (max 500; without limit or cursor, all)
+        cursor: next_cursor of the previous page
+    """
     try:
         status_filter = request.args.get('status')
+        limit, after = page_args(None, APPLICATIONS_MAX_LIMIT, 2)
         
-        conn = get_db_connection()
+        conn = get_db()
         cursor = conn.cursor()
         
+        conditions = []
+        params = []
         if status_filter:
-            applications = cursor.execute(
-                'SELECT * FROM partner_applications WHERE status = ? ORDER BY applied_at DESC',
-                (status_filter,)
-            ).fetchall()
-        else:
-            applications = cursor.execute(
-                'SELECT * FROM partner_applications ORDER BY applied_at DESC'
-            ).fetchall()
-        
-        conn.close()
+            conditions.append('status = ?')
+            params.append(status_filter)
+        if after:
+            conditions.append('(applied_at, id) < (?, ?)')
+            params.extend(after)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        
+        applications = cursor.execute(
+            f'SELECT * FROM partner_applications {where} ORDER BY applied_at DESC, id DESC LIMIT ?',
+            (*params, fetch_limit(limit))
+        ).fetchall()
+        applications, next_cursor = split_page(
+            applications, limit, lambda app: (app['applied_at'], app['id'])
+        )
         
         apps_list = [dict(app) for app in applications]
-        
-        return jsonify({
+
+        # Like /restaurants/, total counts every matching application, not the page
+        total = len(apps_list)
+        if limit is not None or after:
+            status_where = 'WHERE status = ?' if status_filter else ''
+            total = cursor.execute(
+                f'SELECT COUNT(*) FROM partner_applications {status_where}',
+                (status_filter,) if status_filter else ()
+            ).fetchone()[0]
+        
+        return with_next_link(jsonify({
             'applications': apps_list,
-            'total': len(apps_list)
-        }), 200
+            'total': total,
+            'next_cursor': next_cursor
+        }), next_cursor), 200
         
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         print(f"Error in get_applications: {str(e)}")
         return jsonify({'error': str(e)}), 500
@@ -211,48 +237,30 @@ def update_application_status(app_id):
         if new_status not in ['pending', 'approved', 'rejected']:
             return jsonify({'error': 'Invalid status'}), 400
         
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Check if application exists
-        existing = cursor.execute(
-            'SELECT * FROM partner_applications WHERE id = ?',
-            (app_id,)
-        ).fetchone()
-        
-        if not existing:
-            conn.close()
-            return jsonify({'error': 'Application not found'}), 404
-        
         # Generate temp password if approving
         temp_password = None
         reviewed_at = datetime.now().isoformat()
         
         if new_status == 'approved':
             temp_password = generate_temp_password()
-            print(f"Generated password for app {app_id}: {temp_password}")
-            
-            cursor.execute('''
+        
+        def write(conn):
+            # Rejected and pending applications lose their password;
+            # None if the application does not exist
+            return conn.execute('''
                 UPDATE partner_applications 
                 SET status = ?, reviewed_at = ?, temp_password = ?
                 WHERE id = ?
-            ''', (new_status, reviewed_at, temp_password, app_id))
-        else:
-            cursor.execute('''
-                UPDATE partner_applications 
-                SET status = ?, reviewed_at = ?, temp_password = NULL
-                WHERE id = ?
-            ''', (new_status, reviewed_at, app_id))
+                RETURNING *
+            ''', (new_status, reviewed_at, temp_password, app_id)).fetchone()
         
-        conn.commit()
-        
-        # Verify the update
-        updated = cursor.execute(
-            'SELECT * FROM partner_applications WHERE id = ?',
-            (app_id,)
-        ).fetchone()
-        
-        conn.close()
+        updated = writer.run(write)
+        if updated is None:
+            return jsonify({'error': 'Application not found'}), 404
+        if temp_password:
+            print(f"Generated password for app {app_id}: {temp_password}")
+        catalog.invalidate_restaurant(app_id)
+        statistics_cache.clear()
         
         response = {
             'message': f'Application {new_status} successfully',
@@ -272,63 +280,89 @@ def update_application_status(app_id):
 
 
 # Get statistics
+STATISTICS_DAYS = 30
+STATISTICS_KEY = ('statistics',)
+
+statistics_cache = TTLCache('partner_statistics', max_entries=1, ttl=60, stale_ttl=30)
+
+
+def load_statistics():
+    """All partner statistics from a single grouped scan.
+
+    Rows are grouped by status and, for the last STATISTICS_DAYS days, by
+    the day the application was made (older ones fall into a NULL day).
+    applied_at is written in the server's local time, so the query converts
+    it to a UTC day before bucketing.
+    """
+    today = datetime.now(timezone.utc).date()
+    since = today - timedelta(days=STATISTICS_DAYS - 1)
+
+    rows = get_db().execute('''
+        SELECT 
+            IFNULL(status, 'pending') AS status,
+            CASE WHEN date(applied_at, 'utc') >= ? THEN date(applied_at, 'utc') END AS day,
+            COUNT(*) AS count
+        FROM partner_applications
+        GROUP BY 1, 2
+    ''', (since.isoformat(),)).fetchall()
+
+    stats = {'total': 0, 'pending': 0, 'approved': 0, 'rejected': 0}
+    by_day = {(since + timedelta(days=i)).isoformat(): 0 for i in range(STATISTICS_DAYS)}
+    for row in rows:
+        stats['total'] += row['count']
+        stats[row['status']] = stats.get(row['status'], 0) + row['count']
+        if row['day'] in by_day:
+            by_day[row['day']] += row['count']
+
+    last_7_days = [(today - timedelta(days=i)).isoformat() for i in range(7)]
+    stats['applications'] = {
+        'last_7_days': sum(by_day[day] for day in last_7_days),
+        'last_30_days': sum(by_day.values()),
+        'by_day': [{'date': day, 'count': count} for day, count in by_day.items()]
+    }
+    return stats
+
+
 @partner_app_bp.route('/statistics', methods=['GET'])
 def get_statistics():
+    """Application counts per status plus daily application counts
+
+    Served from statistics_cache; submitting an application or changing its
+    status invalidates it.
+    """
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        total = cursor.execute('SELECT COUNT(*) as count FROM partner_applications').fetchone()['count']
-        pending = cursor.execute('SELECT COUNT(*) as count FROM partner_applications WHERE status = "pending"').fetchone()['count']
-        approved = cursor.execute('SELECT COUNT(*) as count FROM partner_applications WHERE status = "approved"').fetchone()['count']
-        rejected = cursor.execute('SELECT COUNT(*) as count FROM partner_applications WHERE status = "rejected"').fetchone()['count']
-        
-        conn.close()
-        
-        return jsonify({
-            'total': total,
-            'pending': pending,
-            'approved': approved,
-            'rejected': rejected
-        }), 200
+        stats = statistics_cache.get(STATISTICS_KEY, load_statistics)
+        return jsonify(stats), 200
         
     except Exception as e:
         print(f"Error in get_statistics: {str(e)}")
         return jsonify({'error': str(e)}), 500
-    # Update partner application details
+
+
+# Update partner application details
 @partner_app_bp.route('/applications/<int:app_id>/update', methods=['PUT'])
 def update_partner_info(app_id):
     try:
         data = request.get_json()
         
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Check if application exists
-        existing = cursor.execute(
-            'SELECT * FROM partner_applications WHERE id = ?',
-            (app_id,)
-        ).fetchone()
-        
-        if not existing:
-            conn.close()
+        def write(conn):
+            # Update the information; None if the application does not exist
+            return conn.execute('''
+                UPDATE partner_applications 
+                SET manager_name = ?, restaurant_phone = ?, hotline = ?, address = ?
+                WHERE id = ?
+                RETURNING id
+            ''', (
+                data['manager_name'],
+                data['restaurant_phone'],
+                data.get('hotline', 'N/A'),
+                data['address'],
+                app_id
+            )).fetchone()
+        
+        if writer.run(write) is None:
             return jsonify({'error': 'Application not found'}), 404
-        
-        # Update the information
-        cursor.execute('''
-            UPDATE partner_applications 
-            SET manager_name = ?, restaurant_phone = ?, hotline = ?, address = ?
-            WHERE id = ?
-        ''', (
-            data['manager_name'],
-            data['restaurant_phone'],
-            data.get('hotline', 'N/A'),
-            data['address'],
-            app_id
-        ))
-        
-        conn.commit()
-        conn.close()
+        catalog.invalidate_restaurant(app_id)
         
         return jsonify({'message': 'Information updated successfully'}), 200
         
@@ -346,35 +380,33 @@ def change_partner_password(app_id):
         if 'current_password' not in data or 'new_password' not in data:
             return jsonify({'error': 'Current and new passwords are required'}), 400
         
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Get application
-        application = cursor.execute(
-            'SELECT * FROM partner_applications WHERE id = ?',
-            (app_id,)
-        ).fetchone()
-        
-        if not application:
-            conn.close()
-            return jsonify({'error': 'Application not found'}), 404
-        
-        app_dict = dict(application)
-        
-        # Verify current password
-        if str(app_dict.get('temp_password', '')).strip() != str(data['current_password']).strip():
-            conn.close()
-            return jsonify({'error': 'Current password is incorrect'}), 401
-        
-        # Update to new password
-        cursor.execute('''
-            UPDATE partner_applications 
-            SET temp_password = ?
-            WHERE id = ?
-        ''', (data['new_password'], app_id))
+        def write(conn):
+            # Get application
+            application = conn.execute(
+                'SELECT * FROM partner_applications WHERE id = ?',
+                (app_id,)
+            ).fetchone()
+            
+            if not application:
+                return {'error': 'Application not found', 'status': 404}
+            
+            app_dict = dict(application)
+            
+            # Verify current password
+            if str(app_dict.get('temp_password', '')).strip() != str(data['current_password']).strip():
+                return {'error': 'Current password is incorrect', 'status': 401}
+            
+            # Update to new password
+            conn.execute('''
+                UPDATE partner_applications 
+                SET temp_password = ?
+                WHERE id = ?
+            ''', (data['new_password'], app_id))
+            return {}
         
-        conn.commit()
-        conn.close()
+        result = writer.run(write)
+        if 'error' in result:
+            return jsonify({'error': result['error']}), result['status']
         
         return jsonify({'message': 'Password changed successfully'}), 200
         
@@ -1,5 +1,9 @@
 from flask import Blueprint, request, jsonify
-from database import get_db_connection
+from database import get_db
+import image_store
+from search import match_query, clamp_limit
+import catalog
+from http_cache import conditional, make_etag, CATALOG_MAX_AGE
 
 restaurant_menu_bp = Blueprint(
     'restaurant_menu',
@@ -7,47 +11,63 @@ restaurant_menu_bp = Blueprint(
     url_prefix='/restaurant-menu'
 )
 
+def load_restaurant_menu(restaurant_id):
+    """Approved restaurant with its menu, or None if not found/approved."""
+    conn = get_db()
+    cursor = conn.cursor()
+
+    # Check if restaurant exists and is approved
+    restaurant = cursor.execute('''
+        SELECT id, restaurant_name, restaurant_phone, address
+        FROM partner_applications
+        WHERE id = ? AND status = 'approved'
+    ''', (restaurant_id,)).fetchone()
+
+    if not restaurant:
+        return None
+
+    # Get menu items
+    menu_items = cursor.execute('''
+        SELECT
+            id,
+            restaurant_id,
+            name,
+            description,
+            price,
+            image
+        FROM menu_items
+        WHERE restaurant_id = ?
+        ORDER BY name ASC
+    ''', (restaurant_id,)).fetchall()
+
+    return {
+        'restaurant': dict(restaurant),
+        'menu_items': [dict(item) for item in menu_items]
+    }
+
+
 # Get all menu items for a specific restaurant
 @restaurant_menu_bp.route('/<int:restaurant_id>', methods=['GET'])
 def get_restaurant_menu(restaurant_id):
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-
-        # Check if restaurant exists and is approved
-        restaurant = cursor.execute('''
-            SELECT id, restaurant_name, restaurant_phone, address
-            FROM partner_applications
-            WHERE id = ? AND status = 'approved'
-        ''', (restaurant_id,)).fetchone()
+        menu, stamp = catalog.cached_stamped(
+            catalog.restaurant_key('restaurant_menu', restaurant_id),
+            lambda: load_restaurant_menu(restaurant_id)
+        )
 
-        if not restaurant:
-            conn.close()
+        if not menu:
             return jsonify({'error': 'Restaurant not found or not approved'}), 404
 
-        # Get menu items
-        menu_items = cursor.execute('''
-            SELECT
-                id,
-                restaurant_id,
-                name,
-                description,
-                price,
-                image
-            FROM menu_items
-            WHERE restaurant_id = ?
-            ORDER BY name ASC
-        ''', (restaurant_id,)).fetchall()
-
-        conn.close()
+        def build():
+            menu_list = [image_store.with_image_urls(item) for item in menu['menu_items']]
+            return jsonify({
+                'restaurant': menu['restaurant'],
+                'menu_items': menu_list,
+                'total_items': len(menu_list)
+            }), 200
 
-        menu_list = [dict(item) for item in menu_items]
-
-        return jsonify({
-            'restaurant': dict(restaurant),
-            'menu_items': menu_list,
-            'total_items': len(menu_list)
-        }), 200
+        etag = make_etag('restaurant_menu', restaurant_id, stamp) if stamp else None
+        return conditional(etag, build, max_age=CATALOG_MAX_AGE)
 
     except Exception as e:
         print(f"Error in get_restaurant_menu: {str(e)}")
@@ -58,7 +78,7 @@ def get_restaurant_menu(restaurant_id):
 @restaurant_menu_bp.route('/item/<int:item_id>', methods=['GET'])
 def get_menu_item(item_id):
     try:
-        conn = get_db_connection()
+        conn = get_db()
         cursor = conn.cursor()
 
         item = cursor.execute('''
@@ -75,12 +95,11 @@ def get_menu_item(item_id):
             WHERE m.id = ? AND p.status = 'approved'
         ''', (item_id,)).fetchone()
 
-        conn.close()
 
         if not item:
             return jsonify({'error': 'Menu item not found'}), 404
 
-        return jsonify({'menu_item': dict(item)}), 200
+        return jsonify({'menu_item': image_store.with_image_urls(item)}), 200
 
     except Exception as e:
         print(f"Error in get_menu_item: {str(e)}")
@@ -90,34 +109,48 @@ def get_menu_item(item_id):
 # Search menu items
 @restaurant_menu_bp.route('/search', methods=['GET'])
 def search_menu_items():
+    """Full-text search over menu item names and descriptions
+
+    Words are prefix-matched and results ranked by bm25, with name matches
+    weighted above description matches.
+
+    Query params:
+        q: search text (required)
+        limit: number of results (default 20, max 100)
+    """
     try:
         query = request.args.get('q', '').strip()
 
         if not query:
             return jsonify({'error': 'Search query is required'}), 400
 
-        conn = get_db_connection()
-        cursor = conn.cursor()
-
-        items = cursor.execute('''
-            SELECT
-                m.id,
-                m.restaurant_id,
-                m.name,
-                m.description,
-                m.price,
-                m.image,
-                p.restaurant_name
-            FROM menu_items m
-            JOIN partner_applications p ON m.restaurant_id = p.id
-            WHERE p.status = 'approved'
-            AND (m.name LIKE ? OR m.description LIKE ?)
-            ORDER BY m.name ASC
-        ''', (f'%{query}%', f'%{query}%')).fetchall()
-
-        conn.close()
-
-        items_list = [dict(item) for item in items]
+        match = match_query(query)
+        limit = clamp_limit(request.args.get('limit', type=int))
+        items_list = []
+
+        if match:
+            conn = get_db()
+            cursor = conn.cursor()
+
+            items = cursor.execute('''
+                SELECT
+                    m.id,
+                    m.restaurant_id,
+                    m.name,
+                    m.description,
+                    m.price,
+                    m.image,
+                    p.restaurant_name
+                FROM menu_items_fts f
+                JOIN menu_items m ON m.id = f.rowid
+                JOIN partner_applications p ON m.restaurant_id = p.id
+                WHERE menu_items_fts MATCH ?
+                AND p.status = 'approved'
+                ORDER BY bm25(menu_items_fts, 10.0, 1.0), m.name ASC
+                LIMIT ?
+            ''', (match, limit)).fetchall()
+
+            items_list = [image_store.with_image_urls(item) for item in items]
 
         return jsonify({
             'menu_items': items_list,
@@ -1,39 +1,82 @@
-from flask import Blueprint, request, jsonify, current_app
-from database import get_db_connection
+from flask import Blueprint, request, jsonify, current_app, Response
+from database import get_db, placeholders
+from search import match_query, clamp_limit
+import catalog
+from http_cache import conditional, make_etag, CATALOG_MAX_AGE
+from events import hub, HubFull, restaurant_channel, publish_status_change
+from order_store import set_restaurant_order_status, get_order_count
+from db_writer import writer
+from pagination import InvalidCursor, page_args, split_page, paginate_sorted, with_next_link
 
 restaurant_bp = Blueprint('restaurants', __name__)
 
+def load_approved_restaurants():
+    conn = get_db()
+    restaurants = conn.execute('''
+        SELECT 
+            id,
+            restaurant_name,
+            restaurant_email,
+            restaurant_phone,
+            address,
+            hotline,
+            manager_name
+        FROM partner_applications 
+        WHERE status = 'approved'
+        ORDER BY restaurant_name ASC, id ASC
+    ''').fetchall()
+    return [dict(restaurant) for restaurant in restaurants]
+
+
+RESTAURANT_PAGE_MAX_LIMIT = 500
+
+
+def restaurant_sort_key(restaurant):
+    return (restaurant['restaurant_name'], restaurant['id'])
+
+
+def load_approved_restaurant(restaurant_id):
+    conn = get_db()
+    restaurant = conn.execute('''
+        SELECT 
+            id,
+            restaurant_name,
+            restaurant_email,
+            restaurant_phone,
+            address,
+            hotline,
+            manager_name
+        FROM partner_applications 
+        WHERE id = ? AND status = 'approved'
+    ''', (restaurant_id,)).fetchone()
+    return dict(restaurant) if restaurant else None
+
+
 # Get all approved restaurants for customers
 @restaurant_bp.route('/', methods=['GET'])
 def get_restaurants():
+    """Approved restaurants by name, one page at a time
+
+    Query params:
+        limit: restaurants per page (max 500; without limit or cursor, all)
+        cursor: next_cursor of the previous page
+    """
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Get only approved restaurants
-        restaurants = cursor.execute('''
-            SELECT 
-                id,
-                restaurant_name,
-                restaurant_email,
-                restaurant_phone,
-                address,
-                hotline,
-                manager_name
-            FROM partner_applications 
-            WHERE status = 'approved'
-            ORDER BY restaurant_name ASC
-        ''').fetchall()
-        
-        conn.close()
+        limit, after = page_args(None, RESTAURANT_PAGE_MAX_LIMIT, 2)
         
-        restaurants_list = [dict(restaurant) for restaurant in restaurants]
+        # Served from the catalog cache; invalidated on partner approval/update
+        restaurants_list, stamp = catalog.cached_stamped(catalog.RESTAURANT_LIST, load_approved_restaurants)
+        page, next_cursor = paginate_sorted(restaurants_list, restaurant_sort_key, limit, after)
+        etag = make_etag('restaurants', stamp, limit, request.args.get('cursor')) if stamp else None
         
-        return jsonify({
-            'restaurants': restaurants_list,
-            'total': len(restaurants_list)
-        }), 200
+        return conditional(etag, lambda: with_next_link(jsonify({
+            'restaurants': page,
+            'total': len(restaurants_list),
+            'next_cursor': next_cursor
+        }), next_cursor), max_age=CATALOG_MAX_AGE)
         
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         print(f"Error in get_restaurants: {str(e)}")
         return jsonify({'error': str(e)}), 500
@@ -43,30 +86,18 @@ def get_restaurants():
 @restaurant_bp.route('/<int:restaurant_id>', methods=['GET'])
 def get_restaurant(restaurant_id):
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        restaurant = cursor.execute('''
-            SELECT 
-                id,
-                restaurant_name,
-                restaurant_email,
-                restaurant_phone,
-                address,
-                hotline,
-                manager_name
-            FROM partner_applications 
-            WHERE id = ? AND status = 'approved'
-        ''', (restaurant_id,)).fetchone()
-        
-        conn.close()
+        restaurant, stamp = catalog.cached_stamped(
+            catalog.restaurant_key('restaurant', restaurant_id),
+            lambda: load_approved_restaurant(restaurant_id)
+        )
         
         if not restaurant:
             return jsonify({'error': 'Restaurant not found'}), 404
         
-        return jsonify({
-            'restaurant': dict(restaurant)
-        }), 200
+        etag = make_etag('restaurant', restaurant_id, stamp) if stamp else None
+        return conditional(etag, lambda: (jsonify({
+            'restaurant': restaurant
+        }), 200), max_age=CATALOG_MAX_AGE)
         
     except Exception as e:
         print(f"Error in get_restaurant: {str(e)}")
@@ -76,33 +107,44 @@ def get_restaurant(restaurant_id):
 # Search restaurants by name
 @restaurant_bp.route('/search', methods=['GET'])
 def search_restaurants():
+    """Full-text search over approved restaurant names
+
+    Query params:
+        q: search text (required), words are prefix-matched
+        limit: number of results (default 20, max 100)
+    """
     try:
         query = request.args.get('q', '').strip()
         
         if not query:
             return jsonify({'error': 'Search query is required'}), 400
         
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        restaurants = cursor.execute('''
-            SELECT 
-                id,
-                restaurant_name,
-                restaurant_email,
-                restaurant_phone,
-                address,
-                hotline,
-                manager_name
-            FROM partner_applications 
-            WHERE status = 'approved' 
-            AND restaurant_name LIKE ?
-            ORDER BY restaurant_name ASC
-        ''', (f'%{query}%',)).fetchall()
+        match = match_query(query)
+        limit = clamp_limit(request.args.get('limit', type=int))
+        restaurants_list = []
         
-        conn.close()
-        
-        restaurants_list = [dict(restaurant) for restaurant in restaurants]
+        if match:
+            conn = get_db()
+            cursor = conn.cursor()
+            
+            restaurants = cursor.execute('''
+                SELECT 
+                    p.id,
+                    p.restaurant_name,
+                    p.restaurant_email,
+                    p.restaurant_phone,
+                    p.address,
+                    p.hotline,
+                    p.manager_name
+                FROM restaurants_fts f
+                JOIN partner_applications p ON p.id = f.rowid
+                WHERE restaurants_fts MATCH ?
+                AND p.status = 'approved'
+                ORDER BY bm25(restaurants_fts), p.restaurant_name ASC
+                LIMIT ?
+            ''', (match, limit)).fetchall()
+            
+            restaurants_list = [dict(restaurant) for restaurant in restaurants]
         
         return jsonify({
             'restaurants': restaurants_list,
@@ -115,75 +157,127 @@ def search_restaurants():
         return jsonify({'error': str(e)}), 500
     
 # Get all orders for a specific restaurant
+ORDER_FEED_DEFAULT_LIMIT = 100
+ORDER_FEED_MAX_LIMIT = 500
+
+def fetch_restaurant_orders(cursor, restaurant_id, statuses=None, limit=ORDER_FEED_DEFAULT_LIMIT, after=None):
+    """One page of restaurant orders, newest first, with their items.
+
+    Orders are read newest-first by (order id, restaurant order id) - ids are
+    assigned in creation order - so the (restaurant_id, status, order_id) and
+    (restaurant_id, order_id) indexes bound the scan to `limit` rows, starting
+    right after the `after` key of the previous page. Their items are then
+    fetched with one batched IN lookup and grouped per order.
+
+    Returns (orders, next_cursor).
+    """
+    params = [restaurant_id]
+    status_clause = ''
+    if statuses:
+        status_clause = f'AND ro.status IN ({placeholders(statuses)})'
+        params.extend(statuses)
+    keyset_clause = ''
+    if after:
+        keyset_clause = 'AND (ro.order_id, ro.id) < (?, ?)'
+        params.extend(after)
+    params.append(limit + 1)
+
+    cursor.execute(f"""
+        SELECT 
+            ro.id as restaurant_order_id,
+            ro.order_id,
+            ro.status,
+            o.phone,
+            o.delivery_location,
+            o.delivery_fee,
+            o.tax,
+            o.total,
+            o.created_at,
+            o.customer_name,
+            o.temp_phone
+        FROM restaurant_orders ro
+        JOIN orders o ON ro.order_id = o.id
+        WHERE ro.restaurant_id = ? {status_clause} {keyset_clause}
+        ORDER BY ro.order_id DESC, ro.id DESC
+        LIMIT ?
+    """, params)
+    restaurant_orders, next_cursor = split_page(
+        cursor.fetchall(), limit, lambda ro: (ro['order_id'], ro['restaurant_order_id'])
+    )
+
+    if not restaurant_orders:
+        return [], None
+
+    # Items for all listed orders of this restaurant in one query
+    order_ids = [ro['order_id'] for ro in restaurant_orders]
+    cursor.execute(f"""
+        SELECT 
+            oi.order_id,
+            oi.id,
+            oi.quantity,
+            oi.subtotal,
+            mi.name,
+            mi.price
+        FROM order_items oi
+        JOIN menu_items mi ON oi.menu_item_id = mi.id
+        WHERE oi.restaurant_id = ? AND oi.order_id IN ({placeholders(order_ids)})
+        ORDER BY oi.id
+    """, [restaurant_id, *order_ids])
+
+    items_by_order = {}
+    for item in cursor.fetchall():
+        items_by_order.setdefault(item['order_id'], []).append({
+            'id': item['id'],
+            'quantity': item['quantity'],
+            'subtotal': item['subtotal'],
+            'name': item['name'],
+            'price': item['price']
+        })
+
+    orders_list = []
+    for ro in restaurant_orders:
+        items = items_by_order.get(ro['order_id'], [])
+        orders_list.append({
+            'restaurant_order_id': ro['restaurant_order_id'],
+            'id': ro['order_id'],
+            'status': ro['status'],
+            'phone': ro['phone'],
+            'customer_name': ro['customer_name'],
+            'temp_phone': ro['temp_phone'],
+            'delivery_location': ro['delivery_location'],
+            'delivery_fee': ro['delivery_fee'],
+            'tax': ro['tax'],
+            'total': ro['total'],
+            # Subtotal of this restaurant's items only
+            'subtotal': sum(item['subtotal'] for item in items),
+            'created_at': ro['created_at'],
+            'items': items
+        })
+    return orders_list, next_cursor
+
+
 @restaurant_bp.route('/orders/<int:restaurant_id>', methods=['GET'])
 def get_restaurant_orders(restaurant_id):
-    """Get all orders for a specific restaurant"""
+    """Get the most recent orders for a specific restaurant
+
+    The next page, if any, is advertised in the X-Next-Cursor/Link headers.
+
+    Query params:
+        status: optional comma-separated list of statuses to include
+        limit: number of orders to return (default 100, max 500)
+        cursor: X-Next-Cursor of the previous page
+    """
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Get all restaurant orders
-        cursor.execute("""
-            SELECT 
-                ro.id as restaurant_order_id,
-                ro.order_id,
-                ro.status,
-                o.phone,
-                o.delivery_location,
-                o.delivery_fee,
-                o.tax,
-                o.total,
-                o.created_at,
-                o.customer_name,
-                o.temp_phone
-            FROM restaurant_orders ro
-            JOIN orders o ON ro.order_id = o.id
-            WHERE ro.restaurant_id = ?
-            ORDER BY o.created_at DESC
-        """, (restaurant_id,))
-        
-        restaurant_orders = cursor.fetchall()
-        
-        orders_list = []
-        for ro in restaurant_orders:
-            # Get order items for this specific restaurant
-            cursor.execute("""
-                SELECT 
-                    oi.id,
-                    oi.quantity,
-                    oi.subtotal,
-                    mi.name,
-                    mi.price
-                FROM order_items oi
-                JOIN menu_items mi ON oi.menu_item_id = mi.id
-                WHERE oi.order_id = ? AND oi.restaurant_id = ?
-            """, (ro['order_id'], restaurant_id))
-            
-            items = cursor.fetchall()
-            
-            # Calculate subtotal for this restaurant's items
-            subtotal = sum(item['subtotal'] for item in items)
-            
-            orders_list.append({
-                'restaurant_order_id': ro['restaurant_order_id'],
-                'id': ro['order_id'],
-                'status': ro['status'],
-                'phone': ro['phone'],
-                'customer_name': ro['customer_name'],
-                'temp_phone': ro['temp_phone'],
-                'delivery_location': ro['delivery_location'],
-                'delivery_fee': ro['delivery_fee'],
-                'tax': ro['tax'],
-                'total': ro['total'],
-                'subtotal': subtotal,
-                'created_at': ro['created_at'],
-                'items': [dict(item) for item in items]
-            })
-        
-        conn.close()
-        
-        return jsonify(orders_list), 200
+        statuses = [s.strip().lower() for s in request.args.get('status', '').split(',') if s.strip()]
+        limit, after = page_args(ORDER_FEED_DEFAULT_LIMIT, ORDER_FEED_MAX_LIMIT, 2)
+
+        conn = get_db()
+        orders_list, next_cursor = fetch_restaurant_orders(conn.cursor(), restaurant_id, statuses, limit, after)
+
+        return with_next_link(jsonify(orders_list), next_cursor), 200
         
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         print(f"Error getting restaurant orders: {str(e)}")
         import traceback
@@ -191,6 +285,28 @@ def get_restaurant_orders(restaurant_id):
         return jsonify({'error': str(e)}), 500
 
 
+# Live order notifications for the restaurant dashboard
+@restaurant_bp.route('/orders/<int:restaurant_id>/stream', methods=['GET'])
+def stream_restaurant_orders(restaurant_id):
+    """Server-Sent Events stream of new_order and status_changed events
+
+    Reconnecting clients send Last-Event-ID and receive the events they
+    missed, or a 'resync' event when those are no longer available.
+    """
+    try:
+        stream = hub.subscribe(restaurant_channel(restaurant_id),
+                               request.headers.get('Last-Event-ID'))
+    except HubFull:
+        response = jsonify({'error': 'Too many open streams, poll instead'})
+        response.headers['Retry-After'] = '30'
+        return response, 503
+
+    return Response(stream, mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+
 # ============================================
 # UPDATE ORDER STATUS - FIXED FOR "on_the_way"
 # ============================================
@@ -216,22 +332,19 @@ def update_order_status(restaurant_order_id):
                 'valid_statuses': valid_statuses
             }), 400
         
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        # Update the restaurant order status (with its counters and event
+        # log) on the writer thread; returns once committed
+        updated = writer.run(
+            lambda conn: set_restaurant_order_status(conn.cursor(), restaurant_order_id, new_status_lower)
+        )
         
-        # Update the restaurant order status
-        cursor.execute("""
-            UPDATE restaurant_orders 
-            SET status = ?
-            WHERE id = ?
-        """, (new_status_lower, restaurant_order_id))
-        
-        if cursor.rowcount == 0:
-            conn.close()
+        if updated is None:
             return jsonify({'error': 'Restaurant order not found'}), 404
         
-        conn.commit()
-        conn.close()
+        # Nothing to tell the dashboards if the status did not change
+        if updated['changed']:
+            publish_status_change(updated['restaurant_id'], restaurant_order_id,
+                                  updated['order_id'], new_status_lower)
         
         return jsonify({
             'success': True,
@@ -251,20 +364,11 @@ def update_order_status(restaurant_order_id):
 def get_pending_orders_count(restaurant_id):
     """Get count of pending orders for notification badge"""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            SELECT COUNT(*) as count
-            FROM restaurant_orders
-            WHERE restaurant_id = ? AND status = 'pending'
-        """, (restaurant_id,))
-        
-        result = cursor.fetchone()
-        conn.close()
+        # Maintained on every order write, so this is a primary-key lookup
+        count = get_order_count(get_db(), restaurant_id, 'pending')
         
         return jsonify({
-            'count': result['count']
+            'count': count
         }), 200
         
     except Exception as e:
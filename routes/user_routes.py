@@ -1,7 +1,8 @@
 # ================== routes/user_routes.py ==================
 from flask import Blueprint, request, jsonify
 from werkzeug.security import generate_password_hash, check_password_hash
-from database import get_db_connection
+from database import get_db
+from db_writer import writer
 
 user_bp = Blueprint('users', __name__)
 
@@ -9,37 +10,33 @@ user_bp = Blueprint('users', __name__)
 @user_bp.route('/register', methods=['POST'])
 def register_user():
     data = request.json
-    conn = get_db_connection()
-    cursor = conn.cursor()
     
-    # Check if phone already exists
-    cursor.execute('SELECT * FROM users WHERE phone = ?', (data['phone'],))
-    if cursor.fetchone():
-        conn.close()
-        return jsonify({'message': 'Phone already exists'}), 400
-    
-    # Hash the password
+    # Hash the password (slow on purpose, so not on the writer thread)
     hashed_password = generate_password_hash(data['password'])
     
-    cursor.execute('''
-        INSERT INTO users (first_name, last_name, phone, password)
-        VALUES (?, ?, ?, ?)
-    ''', (data['first_name'], data['last_name'], data['phone'], hashed_password))
+    def write(conn):
+        # Check if phone already exists
+        if conn.execute('SELECT 1 FROM users WHERE phone = ?', (data['phone'],)).fetchone():
+            return False
+        conn.execute('''
+            INSERT INTO users (first_name, last_name, phone, password)
+            VALUES (?, ?, ?, ?)
+        ''', (data['first_name'], data['last_name'], data['phone'], hashed_password))
+        return True
     
-    conn.commit()
-    conn.close()
+    if not writer.run(write):
+        return jsonify({'message': 'Phone already exists'}), 400
     return jsonify({'message': 'User registered successfully'})
 
 # Login
 @user_bp.route('/login', methods=['POST'])
 def login_user():
     data = request.json
-    conn = get_db_connection()
+    conn = get_db()
     cursor = conn.cursor()
     
     cursor.execute('SELECT * FROM users WHERE phone = ?', (data['phone'],))
     user = cursor.fetchone()
-    conn.close()
     
     if user and check_password_hash(user['password'], data['password']):
         return jsonify({
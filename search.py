@@ -0,0 +1,26 @@
+"""Helpers for querying the FTS5 search indexes (see migrations/0005)."""
+import re
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+_TOKEN = re.compile(r'\w+', re.UNICODE)
+
+
+def match_query(text):
+    """Turn free text typed by a user into an FTS5 MATCH expression.
+
+    Every word becomes a quoted prefix term ("piz"* "marg"*), so typing
+    part of a word matches and FTS5 operators in the input are inert.
+    Returns None when the text contains no searchable words.
+    """
+    tokens = _TOKEN.findall(text)
+    if not tokens:
+        return None
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+def clamp_limit(limit):
+    if limit is None:
+        return DEFAULT_LIMIT
+    return max(1, min(limit, MAX_LIMIT))
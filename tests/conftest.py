@@ -0,0 +1,91 @@
+import os
+import sqlite3
+import sys
+import tempfile
+import uuid
+
+import pytest
+
+# The app's modules read their configuration on import, so point them at a
+# scratch database before any test imports them
+DATA_DIR = tempfile.mkdtemp(prefix='yallaorder-tests-')
+os.environ['YALLAORDER_DB'] = os.path.join(DATA_DIR, 'test.db')
+os.environ['YALLAORDER_MEDIA'] = os.path.join(DATA_DIR, 'media')
+os.environ['YALLAORDER_CART_SWEEP_SECONDS'] = '0'
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope='session')
+def db_path():
+    """The migrated scratch database the app modules use."""
+    import migrations
+    migrations.upgrade(os.environ['YALLAORDER_DB'], log=None)
+    return os.environ['YALLAORDER_DB']
+
+
+@pytest.fixture(scope='session')
+def app(db_path):
+    """A bare Flask app with the database hooks, without the blueprints."""
+    from flask import Flask
+    import database
+
+    app = Flask('yallaorder-tests')
+    database.init_app(app)
+    return app
+
+
+@pytest.fixture(scope='session')
+def client(db_path):
+    """Test client of the full app, on the scratch database."""
+    from app import app as yallaorder
+    return yallaorder.test_client()
+
+
+@pytest.fixture
+def make_restaurant(db_path):
+    """make_restaurant(name, items) -> (restaurant_id, [menu_item_id, ...]).
+
+    Adds an approved partner (restaurants are partner_applications rows)
+    with a menu of (name, price) items, straight into the database.
+    """
+    def make(name='Koshary Corner', items=(('Koshary', 45.0), ('Rice pudding', 20.0))):
+        conn = sqlite3.connect(db_path)
+        with conn:
+            restaurant_id = conn.execute('''
+                INSERT INTO partner_applications
+                    (manager_name, manager_phone, restaurant_name, restaurant_phone,
+                     restaurant_email, address, has_license, status)
+                VALUES ('Manager', '0100', ?, '0200', ?, 'Cairo', 'yes', 'approved')
+            ''', (name, f'{uuid.uuid4()}@example.com')).lastrowid
+            item_ids = [conn.execute(
+                'INSERT INTO menu_items (restaurant_id, name, price) VALUES (?, ?, ?)',
+                (restaurant_id, item_name, price)
+            ).lastrowid for item_name, price in items]
+        conn.close()
+        return restaurant_id, item_ids
+
+    return make
+
+
+@pytest.fixture
+def place_order(client):
+    """place_order([(restaurant_id, menu_item_id, quantity, price), ...]) -> order id.
+
+    Places an individual order and confirms it, which creates its
+    restaurant orders.
+    """
+    def place(lines, phone='01000000000'):
+        response = client.post('/orders/place', json={
+            'phone': phone,
+            'delivery_location': 'Zamalek',
+            'items': [{'restaurant_id': restaurant_id, 'menu_item_id': menu_item_id,
+                       'quantity': quantity, 'subtotal': quantity * price}
+                      for restaurant_id, menu_item_id, quantity, price in lines]
+        })
+        assert response.status_code == 200
+        order_id = response.get_json()['order_id']
+        assert client.post(f'/orders/confirm/{order_id}').status_code == 200
+        return order_id
+
+    return place
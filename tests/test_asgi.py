@@ -0,0 +1,35 @@
+import pytest
+
+pytest.importorskip('starlette')
+pytest.importorskip('aiosqlite')
+pytest.importorskip('a2wsgi')
+pytest.importorskip('httpx')
+
+from starlette.testclient import TestClient
+
+
+@pytest.fixture
+def asgi_client(db_path):
+    import asgi
+    with TestClient(asgi.app) as client:
+        yield client
+
+
+def test_pending_count_is_answered_by_the_async_handler(asgi_client, make_restaurant, place_order):
+    restaurant_id, (koshary, _) = make_restaurant()
+    place_order([(restaurant_id, koshary, 1, 45.0)])
+
+    response = asgi_client.get(f'/restaurants/orders/{restaurant_id}/pending-count')
+    assert response.json() == {'count': 1}
+    assert response.headers['Access-Control-Allow-Origin'] == '*'
+
+
+def test_unknown_order_stream_is_404(asgi_client):
+    assert asgi_client.get('/orders/999999/events/stream').status_code == 404
+
+
+def test_other_routes_are_served_by_the_flask_app(asgi_client, make_restaurant):
+    restaurant_id, _ = make_restaurant()
+    response = asgi_client.get(f'/menu/list/{restaurant_id}')
+    assert response.status_code == 200
+    assert {item['name'] for item in response.json()} == {'Koshary', 'Rice pudding'}
@@ -0,0 +1,74 @@
+import sqlite3
+
+from benchmarks.runner import QueryCounter
+from benchmarks.scenario import find_knee, print_curve
+
+
+def traced_connection(counter):
+    conn = sqlite3.connect(':memory:', isolation_level=None)
+    conn.executescript('''
+        CREATE TABLE items (name TEXT);
+        CREATE TABLE log (name TEXT);
+        CREATE TRIGGER items_log AFTER INSERT ON items
+        BEGIN
+            INSERT INTO log VALUES (NEW.name);
+            INSERT INTO log VALUES (NEW.name || '!');
+        END;
+    ''')
+    conn.set_trace_callback(counter.tracer())
+    return conn
+
+
+def test_trigger_statements_are_not_counted():
+    counter = QueryCounter()
+    conn = traced_connection(counter)
+    conn.execute("INSERT INTO items VALUES ('koshary')")
+    conn.execute('SELECT COUNT(*) FROM log').fetchone()
+    assert counter.count == 2
+    conn.close()
+
+
+def test_repeated_statements_count_again_after_reset():
+    counter = QueryCounter()
+    conn = traced_connection(counter)
+    conn.execute('SELECT 1')
+    counter.reset()
+    assert counter.count == 0
+    conn.execute('SELECT 1')
+    conn.execute('SELECT 2')
+    assert counter.count == 2
+    conn.close()
+
+
+def test_connections_are_traced_separately():
+    counter = QueryCounter()
+    first, second = traced_connection(counter), traced_connection(counter)
+    first.execute('SELECT 1')
+    second.execute('SELECT 1')
+    assert counter.count == 2
+    first.close()
+    second.close()
+
+
+def step(users, throughput, error_rate=0.0):
+    return {'users': users, 'total': {'throughput': throughput, 'error_rate': error_rate, 'p99_ms': 10.0}}
+
+
+def test_knee_is_the_last_step_that_paid_off():
+    steps = [step(10, 100), step(20, 190), step(40, 210), step(80, 215)]
+    assert find_knee(steps) == 1
+
+
+def test_errors_end_the_curve():
+    steps = [step(10, 100), step(20, 200), step(40, 400, error_rate=0.05)]
+    assert find_knee(steps) == 1
+
+
+def test_no_knee_while_throughput_still_grows(capsys):
+    steps = [step(10, 100), step(20, 195), step(40, 380)]
+    assert find_knee(steps) is None
+    assert find_knee(steps[:1]) is None
+
+    print_curve(steps, None)
+    out = capsys.readouterr().out
+    assert '<- knee' not in out and 'still growing' in out
@@ -0,0 +1,126 @@
+import time
+
+import pytest
+
+import catalog
+from cache import TTLCache
+
+
+class Loader:
+    """Loader returning value-1, value-2, ... and counting its calls."""
+
+    def __init__(self, prefix='value'):
+        self.prefix = prefix
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return f'{self.prefix}-{self.calls}'
+
+
+def wait_for(condition, timeout=2):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'timed out'
+        time.sleep(0.01)
+
+
+def test_hits_are_served_without_loading():
+    cache = TTLCache('test')
+    load = Loader()
+    assert cache.get_stamped('a', load) == ('value-1', 1)
+    assert cache.get_stamped('a', load) == ('value-1', 1)
+    assert load.calls == 1
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 1
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TTLCache('test', max_entries=2)
+    for key in 'abc':
+        cache.get(key, Loader(key))
+    assert cache.stats()['evictions'] == 1
+    load = Loader('a')
+    cache.get('a', load)
+    assert load.calls == 1
+
+
+def test_stale_entry_is_served_while_it_reloads(app):
+    cache = TTLCache('test', ttl=0, stale_ttl=60)
+    load = Loader()
+    with app.app_context():
+        cache.get('a', load)
+        assert cache.get('a', load) == 'value-1'
+        wait_for(lambda: load.calls == 2 and cache.stats()['entries'] == 1
+                 and cache._entries['a'].value == 'value-2')
+    assert cache.stats()['stale_hits'] == 1
+
+
+def test_expired_entry_is_reloaded_in_the_request():
+    cache = TTLCache('test', ttl=0, stale_ttl=0)
+    load = Loader()
+    cache.get('a', load)
+    assert cache.get('a', load) == 'value-2'
+
+
+def test_load_invalidated_meanwhile_is_not_stored():
+    cache = TTLCache('test')
+    other = Loader('other')
+    cache.get('other', other)
+
+    def load():
+        # A write commits and invalidates the key while it is being read
+        cache.invalidate(lambda key: key == 'a')
+        return 'outdated'
+
+    assert cache.get_stamped('a', load) == ('outdated', None)
+    assert cache.get('a', Loader()) == 'value-1'
+    assert cache.get('other', other) == 'other-1'
+    assert other.calls == 1
+
+
+def test_load_invalidation_of_another_key_is_stored():
+    cache = TTLCache('test')
+
+    def load():
+        cache.invalidate(lambda key: key == 'b')
+        return 'fresh'
+
+    value, stamp = cache.get_stamped('a', load)
+    assert value == 'fresh' and stamp is not None
+    assert cache.get('a', Loader()) == 'fresh'
+
+
+def test_failed_load_is_not_cached():
+    cache = TTLCache('test')
+
+    def fail():
+        raise RuntimeError('database is locked')
+
+    with pytest.raises(RuntimeError):
+        cache.get('a', fail)
+    assert cache.get('a', Loader()) == 'value-1'
+
+
+def test_invalidate_restaurant_drops_its_entries_and_the_list(monkeypatch):
+    cache = TTLCache('catalog')
+    monkeypatch.setattr(catalog, 'catalog_cache', cache)
+    keys = [catalog.RESTAURANT_LIST, catalog.restaurant_key('restaurant', 1),
+            catalog.restaurant_key('restaurant_menu', 1), catalog.restaurant_key('restaurant', 2)]
+    for key in keys:
+        catalog.cached(key, Loader())
+
+    catalog.invalidate_restaurant(1)
+    assert set(cache._entries) == {catalog.restaurant_key('restaurant', 2)}
+
+
+def test_menu_edit_is_visible_in_the_next_menu_read(client, make_restaurant):
+    restaurant_id, (koshary, _) = make_restaurant()
+    first = client.get(f'/restaurant-menu/{restaurant_id}')
+    assert {item['name'] for item in first.get_json()['menu_items']} == {'Koshary', 'Rice pudding'}
+
+    response = client.put(f'/menu/edit/{koshary}', json={'name': 'Koshary XL', 'price': 60.0})
+    assert response.status_code == 200
+
+    second = client.get(f'/restaurant-menu/{restaurant_id}')
+    assert {item['name'] for item in second.get_json()['menu_items']} == {'Koshary XL', 'Rice pudding'}
+    assert second.headers['ETag'] != first.headers['ETag']
@@ -0,0 +1,172 @@
+import uuid
+
+import pytest
+
+
+@pytest.fixture
+def cart_uuid():
+    return f'test-{uuid.uuid4()}'
+
+
+def add(client, cart_uuid, restaurant_id, menu_item_id, quantity=1, **extra):
+    return client.post('/cart/add', json={
+        'cart_uuid': cart_uuid, 'restaurant_id': restaurant_id,
+        'menu_item_id': menu_item_id, 'quantity': quantity, **extra
+    })
+
+
+def view(client, cart_uuid):
+    return client.post('/cart/view', json={'cart_uuid': cart_uuid}).get_json()['items']
+
+
+def create_order(client, cart_uuid):
+    return client.post('/orders/create', json={
+        'cart_uuid': cart_uuid, 'phone': '01012121212', 'delivery_location': 'Heliopolis'
+    })
+
+
+def test_cart_uses_menu_prices(client, make_restaurant, cart_uuid):
+    restaurant_id, (koshary, _) = make_restaurant()
+    assert add(client, cart_uuid, restaurant_id, koshary, 2, price=1).status_code == 200
+    assert add(client, cart_uuid, restaurant_id, koshary, '1').status_code == 200
+
+    [item] = view(client, cart_uuid)
+    assert (item['id'], item['price'], item['quantity'], item['subtotal']) == (koshary, 45.0, 3, 135.0)
+
+
+@pytest.mark.parametrize('quantity', ['two', None, 0])
+def test_bad_quantities_are_rejected(client, make_restaurant, cart_uuid, quantity):
+    restaurant_id, (koshary, _) = make_restaurant()
+    assert add(client, cart_uuid, restaurant_id, koshary, quantity).status_code == 400
+    assert view(client, cart_uuid) == []
+
+
+def test_order_is_created_from_the_cart(client, make_restaurant, cart_uuid):
+    restaurant_id, (koshary, pudding) = make_restaurant()
+    add(client, cart_uuid, restaurant_id, koshary, 2)
+    add(client, cart_uuid, restaurant_id, pudding)
+
+    response = create_order(client, cart_uuid)
+    assert response.status_code == 201
+    body = response.get_json()
+    assert body['total'] == round(110.0 * 1.14 + 20.0, 2)
+
+    items = client.get(f"/orders/summary/{body['order_id']}").get_json()['items']
+    assert sorted((item['menu_item_id'], item['quantity']) for item in items) == [(koshary, 2), (pudding, 1)]
+    assert view(client, cart_uuid) == []
+    assert create_order(client, cart_uuid).status_code == 400
+
+
+def test_items_no_longer_on_the_menu_are_left_out(client, make_restaurant, cart_uuid):
+    restaurant_id, (koshary, pudding) = make_restaurant()
+    add(client, cart_uuid, restaurant_id, koshary)
+    add(client, cart_uuid, restaurant_id, pudding)
+    client.delete(f'/menu/delete/{pudding}')
+
+    order_id = create_order(client, cart_uuid).get_json()['order_id']
+    items = client.get(f'/orders/summary/{order_id}').get_json()['items']
+    assert [item['menu_item_id'] for item in items] == [koshary]
+
+
+def batch(client, cart_uuid, *operations):
+    return client.post('/cart/batch', json={'cart_uuid': cart_uuid, 'operations': list(operations)})
+
+
+def test_batch_applies_every_operation_in_order(client, make_restaurant, cart_uuid):
+    restaurant_id, (koshary, pudding) = make_restaurant()
+    add(client, cart_uuid, restaurant_id, pudding)
+
+    response = batch(client, cart_uuid,
+                     {'op': 'add', 'restaurant_id': restaurant_id, 'menu_item_id': koshary, 'quantity': 2},
+                     {'op': 'update', 'cart_item_id': koshary, 'quantity': 3},
+                     {'op': 'remove', 'cart_item_id': pudding})
+    assert response.status_code == 200
+    body = response.get_json()
+    assert [(item['id'], item['quantity']) for item in body['items']] == [(koshary, 3)]
+    assert body['subtotal'] == 135.0
+
+
+@pytest.mark.parametrize('operation, status', [
+    ({'op': 'update', 'cart_item_id': 999999, 'quantity': 1}, 404),
+    ({'op': 'remove', 'cart_item_id': 'abc'}, 400),
+    ({'op': 'add', 'restaurant_id': 'x', 'menu_item_id': 1}, 400),
+    ({'op': 'rename'}, 400),
+    ('add', 400),
+])
+def test_batch_is_all_or_nothing(client, make_restaurant, cart_uuid, operation, status):
+    restaurant_id, (koshary, pudding) = make_restaurant()
+    add(client, cart_uuid, restaurant_id, koshary)
+
+    response = batch(client, cart_uuid,
+                     {'op': 'add', 'restaurant_id': restaurant_id, 'menu_item_id': pudding},
+                     operation)
+    assert response.status_code == status
+    assert response.get_json()['error'].startswith('Operation 1:')
+    assert [item['id'] for item in view(client, cart_uuid)] == [koshary]
+
+
+def test_batch_checks_quantities_before_applying(client, make_restaurant, cart_uuid):
+    restaurant_id, (koshary, pudding) = make_restaurant()
+    add(client, cart_uuid, restaurant_id, koshary)
+
+    response = batch(client, cart_uuid,
+                     {'op': 'update', 'cart_item_id': koshary, 'quantity': 5},
+                     {'op': 'add', 'restaurant_id': restaurant_id, 'menu_item_id': pudding, 'quantity': '2'})
+    assert response.status_code == 400
+    assert view(client, cart_uuid)[0]['quantity'] == 1
+
+
+def test_batch_size_is_limited(client, cart_uuid):
+    response = batch(client, cart_uuid, *[{'op': 'remove', 'cart_item_id': 1}] * 101)
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize('path, method, body', [
+    ('/cart/add', 'post', {'restaurant_id': 'one', 'menu_item_id': '2'}),
+    ('/cart/add', 'post', {'restaurant_id': 1, 'menu_item_id': [2]}),
+    ('/cart/update', 'put', {'cart_item_id': 'abc', 'quantity': 1}),
+    ('/cart/remove', 'delete', {'cart_item_id': '1x'}),
+])
+def test_non_numeric_ids_are_bad_requests(client, cart_uuid, path, method, body):
+    response = getattr(client, method)(path, json={'cart_uuid': cart_uuid, **body})
+    assert response.status_code == 400
+    assert 'Invalid' in response.get_json()['error']
+
+
+def snapshot(client, cart_uuid, version=None):
+    body = {'cart_uuid': cart_uuid}
+    if version is not None:
+        body['version'] = version
+    return client.post('/cart/snapshot', json=body).get_json()
+
+
+def test_snapshot_has_everything_the_cart_pages_show(client, make_restaurant, cart_uuid):
+    restaurant_id, (koshary, pudding) = make_restaurant()
+    other_id, (falafel,) = make_restaurant('Falafel Stand', [('Falafel', 10.0)])
+    add(client, cart_uuid, restaurant_id, koshary, 2)
+    add(client, cart_uuid, other_id, falafel)
+    add(client, cart_uuid, restaurant_id, pudding)
+
+    body = snapshot(client, cart_uuid)
+    assert body['unchanged'] is False
+    assert body['items'] == view(client, cart_uuid)
+    assert (body['total_items'], body['total_quantity']) == (3, 4)
+    assert [(g['restaurant_id'], g['item_ids'], g['subtotal']) for g in body['restaurants']] == [
+        (restaurant_id, [koshary, pudding], 110.0), (other_id, [falafel], 10.0)
+    ]
+    summary = client.post('/cart/summary', json={'cart_uuid': cart_uuid}).get_json()
+    assert {key: body[key] for key in ('subtotal', 'tax', 'delivery_fee', 'total')} == {
+        key: summary[key] for key in ('subtotal', 'tax', 'delivery_fee', 'total')
+    }
+
+
+def test_snapshot_of_an_unchanged_cart_is_short(client, make_restaurant, cart_uuid):
+    restaurant_id, (koshary, _) = make_restaurant()
+    add(client, cart_uuid, restaurant_id, koshary)
+    version = snapshot(client, cart_uuid)['version']
+
+    assert snapshot(client, cart_uuid, version) == {'success': True, 'unchanged': True, 'version': version}
+    add(client, cart_uuid, restaurant_id, koshary)
+    body = snapshot(client, cart_uuid, version)
+    assert body['unchanged'] is False and body['version'] != version
+    assert body['items'][0]['quantity'] == 2
@@ -0,0 +1,187 @@
+import sqlite3
+import uuid
+
+import pytest
+
+import cart_store
+from cart_store import CartEmpty, CartStore, CartSweeper, menu_item
+
+
+@pytest.fixture
+def menu(make_restaurant):
+    """(restaurant_id, [menu_item_id, ...]) of a restaurant with two items."""
+    return make_restaurant()
+
+
+@pytest.fixture
+def ctx(app):
+    with app.app_context():
+        yield
+
+
+@pytest.fixture
+def store(ctx):
+    # The background flusher stays out of the way; tests flush explicitly
+    return CartStore(flush_seconds=3600)
+
+
+@pytest.fixture
+def session_id():
+    return f'test-{uuid.uuid4()}'
+
+
+def add(store, session_id, restaurant_id, menu_item_id, quantity=1):
+    item = menu_item(restaurant_id, menu_item_id)
+
+    def change(items):
+        items.setdefault(menu_item_id, item)['quantity'] += quantity
+
+    store.mutate(session_id, change)
+
+
+def stored_quantities(db_path, session_id):
+    conn = sqlite3.connect(db_path)
+    try:
+        return dict(conn.execute('''
+            SELECT ci.menu_item_id, ci.quantity FROM cart_items ci
+            JOIN carts c ON c.id = ci.cart_id WHERE c.session_id = ?
+        ''', (session_id,)).fetchall())
+    finally:
+        conn.close()
+
+
+def test_flush_writes_dirty_carts_once(store, menu, db_path, session_id):
+    restaurant_id, (koshary, pudding) = menu
+    add(store, session_id, restaurant_id, koshary, 2)
+    add(store, session_id, restaurant_id, pudding)
+    assert store.stats()['dirty'] == 1
+    assert stored_quantities(db_path, session_id) == {}
+
+    assert store.flush(session_id) == 1
+    assert stored_quantities(db_path, session_id) == {koshary: 2, pudding: 1}
+    assert store.stats()['dirty'] == 0
+    assert store.flush(session_id) == 0
+
+
+def test_flush_removes_deleted_items(store, menu, db_path, session_id):
+    restaurant_id, (koshary, pudding) = menu
+    add(store, session_id, restaurant_id, koshary)
+    add(store, session_id, restaurant_id, pudding)
+    store.flush(session_id)
+
+    store.mutate(session_id, lambda items: items.pop(pudding))
+    store.flush(session_id)
+    assert stored_quantities(db_path, session_id) == {koshary: 1}
+
+
+def test_forget_drops_without_writing(store, menu, db_path, session_id):
+    restaurant_id, (koshary, _) = menu
+    add(store, session_id, restaurant_id, koshary)
+    store.forget(session_id)
+
+    assert store.stats()['carts'] == 0
+    assert store.flush() == 0
+    assert stored_quantities(db_path, session_id) == {}
+    assert store.snapshot(session_id)[1] == []
+
+
+def test_expire_keeps_unsaved_carts(ctx, menu, session_id):
+    store = CartStore(ttl=0, flush_seconds=3600)
+    restaurant_id, (koshary, _) = menu
+    add(store, session_id, restaurant_id, koshary, 3)
+
+    store.expire()
+    assert store.stats()['carts'] == 1
+
+    store.flush()
+    store.expire()
+    stats = store.stats()
+    assert stats['carts'] == 0
+    assert stats['expired'] == 1
+
+    # Loaded back from the database on next use
+    _, items = store.snapshot(session_id)
+    assert [(item['menu_item_id'], item['quantity']) for item in items] == [(koshary, 3)]
+
+
+def test_checkout_of_an_empty_cart_raises(store, session_id):
+    with pytest.raises(CartEmpty):
+        store.checkout(session_id, lambda conn, items: None)
+
+
+def test_checkout_keeps_edits_made_meanwhile(store, menu, db_path, session_id):
+    restaurant_id, (koshary, pudding) = menu
+    add(store, session_id, restaurant_id, koshary)
+    store.flush(session_id)
+    extra = dict(menu_item(restaurant_id, pudding), quantity=1)
+
+    def place(conn, items):
+        # The customer adds an item while the order is being written
+        store.mutate(session_id, lambda items: items.setdefault(pudding, extra))
+        conn.execute('DELETE FROM cart_items WHERE cart_id IN '
+                     '(SELECT id FROM carts WHERE session_id = ?)', (session_id,))
+        conn.execute('DELETE FROM carts WHERE session_id = ?', (session_id,))
+        return [item['menu_item_id'] for item in items]
+
+    assert store.checkout(session_id, place) == [koshary]
+    assert store.stats()['dirty'] == 1
+    store.flush()
+    assert stored_quantities(db_path, session_id) == {koshary: 1, pudding: 1}
+
+
+def backdate(db_path, session_ids, days):
+    conn = sqlite3.connect(db_path)
+    with conn:
+        conn.executemany(
+            "UPDATE carts SET updated_at = datetime('now', ?) WHERE session_id = ?",
+            [(f'-{days} days', session_id) for session_id in session_ids]
+        )
+    conn.close()
+
+
+def stored_carts(db_path, session_ids):
+    conn = sqlite3.connect(db_path)
+    try:
+        return {row[0] for row in conn.execute(
+            f"SELECT session_id FROM carts WHERE session_id IN ({', '.join('?' * len(session_ids))})",
+            session_ids)}
+    finally:
+        conn.close()
+
+
+def test_sweep_deletes_abandoned_carts_in_batches(store, menu, db_path, monkeypatch):
+    monkeypatch.setattr(cart_store, 'SWEEP_PAUSE', 0)
+    restaurant_id, (koshary, pudding) = menu
+    old = [f'test-{uuid.uuid4()}' for _ in range(3)]
+    recent = f'test-{uuid.uuid4()}'
+    for session_id in old + [recent]:
+        add(store, session_id, restaurant_id, koshary)
+        add(store, session_id, restaurant_id, pudding)
+    store.flush()
+    backdate(db_path, old, 40)
+
+    sweeper = CartSweeper(store, max_age_days=30, batch_size=2)
+    deleted_carts, deleted_items = sweeper.sweep()
+
+    assert deleted_carts >= 3 and deleted_items >= 6
+    assert stored_carts(db_path, old + [recent]) == {recent}
+    assert stored_quantities(db_path, old[0]) == {}
+    stats = sweeper.stats()
+    assert stats['runs'] == 1 and stats['deleted_carts'] == deleted_carts
+    # Swept carts are gone from memory too
+    assert store.snapshot(old[0])[1] == []
+
+
+def test_swept_cart_with_unsaved_changes_is_kept(store, menu, db_path, session_id):
+    restaurant_id, (koshary, pudding) = menu
+    add(store, session_id, restaurant_id, koshary)
+    store.flush(session_id)
+    backdate(db_path, [session_id], 40)
+    add(store, session_id, restaurant_id, pudding)
+
+    CartSweeper(store, max_age_days=30).sweep()
+    assert stored_carts(db_path, [session_id]) == set()
+
+    # Written back as a new cart
+    store.flush(session_id)
+    assert stored_quantities(db_path, session_id) == {koshary: 1, pudding: 1}
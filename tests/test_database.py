@@ -0,0 +1,158 @@
+import sqlite3
+
+import pytest
+
+import database
+from database import ConnectionPool, PoolTimeout
+
+
+@pytest.fixture
+def pool(tmp_path):
+    pool = ConnectionPool(str(tmp_path / 'pool.db'), max_size=2, timeout=0.05)
+    yield pool
+    pool.close_idle()
+
+
+def test_released_connections_are_reused(pool):
+    conn = pool.acquire()
+    pool.release(conn)
+    assert pool.acquire() is conn
+
+    stats = pool.stats()
+    assert stats['open'] == 1
+    assert stats['checkouts'] == 2
+    assert stats['in_use'] == 1
+
+
+def test_connections_use_the_app_settings(pool):
+    conn = pool.acquire()
+    assert conn.row_factory is sqlite3.Row
+    assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+    assert conn.execute('PRAGMA busy_timeout').fetchone()[0] == database.BUSY_TIMEOUT_MS
+    pool.release(conn)
+
+
+def test_acquire_waits_then_times_out_when_exhausted(pool):
+    first, second = pool.acquire(), pool.acquire()
+    with pytest.raises(PoolTimeout):
+        pool.acquire()
+
+    pool.release(first)
+    assert pool.acquire() is first
+    pool.release(first)
+    pool.release(second)
+
+    stats = pool.stats()
+    assert stats['open'] == 2
+    assert stats['timeouts'] == 1
+    assert stats['peak_in_use'] == 2
+
+
+def test_release_rolls_back_uncommitted_writes(pool):
+    conn = pool.acquire()
+    conn.execute('CREATE TABLE notes (body TEXT)')
+    conn.commit()
+    conn.execute("INSERT INTO notes VALUES ('left open')")
+    pool.release(conn)
+
+    conn = pool.acquire()
+    assert not conn.in_transaction
+    assert conn.execute('SELECT COUNT(*) FROM notes').fetchone()[0] == 0
+    pool.release(conn)
+
+
+def test_request_connection_is_returned_on_teardown(app):
+    in_use = database.pool.stats()['in_use']
+    with app.app_context():
+        conn = database.get_db()
+        assert database.get_db() is conn
+        assert database.pool.stats()['in_use'] == in_use + 1
+    assert database.pool.stats()['in_use'] == in_use
+
+
+@pytest.fixture
+def notes(tmp_path):
+    conn = database.connect(str(tmp_path / 'notes.db'))
+    conn.execute('CREATE TABLE notes (body TEXT)')
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+def count_notes(conn):
+    return conn.execute('SELECT COUNT(*) FROM notes').fetchone()[0]
+
+
+def test_transaction_commits_or_rolls_back(notes):
+    with database.transaction(notes):
+        notes.execute("INSERT INTO notes VALUES ('kept')")
+    with pytest.raises(RuntimeError):
+        with database.transaction(notes):
+            notes.execute("INSERT INTO notes VALUES ('dropped')")
+            raise RuntimeError('boom')
+    assert count_notes(notes) == 1
+    assert not notes.in_transaction
+
+
+def test_transaction_rejects_nesting_and_unknown_modes(notes):
+    with pytest.raises(ValueError):
+        with database.transaction(notes, mode='LATER'):
+            pass
+    with database.transaction(notes):
+        with pytest.raises(RuntimeError):
+            with database.transaction(notes):
+                pass
+
+
+def test_transaction_restores_the_busy_timeout(notes):
+    with database.transaction(notes, busy_timeout=50):
+        assert notes.execute('PRAGMA busy_timeout').fetchone()[0] == 50
+    assert notes.execute('PRAGMA busy_timeout').fetchone()[0] == database.BUSY_TIMEOUT_MS
+
+
+def test_busy_transaction_is_retried(notes, monkeypatch):
+    monkeypatch.setattr(database, 'backoff_delay', lambda attempt: 0)
+    before = database.transaction_stats()
+    calls = []
+
+    def write(conn):
+        calls.append(1)
+        conn.execute("INSERT INTO notes VALUES ('attempt')")
+        if len(calls) < 3:
+            raise sqlite3.OperationalError('database is locked')
+        return len(calls)
+
+    assert database.run_in_transaction(write, notes) == 3
+    # Only the last attempt's insert survives
+    assert count_notes(notes) == 1
+    assert database.transaction_stats()['busy_retries'] == before['busy_retries'] + 2
+
+
+def test_busy_failure_is_raised_after_the_last_retry(notes, tmp_path, monkeypatch):
+    monkeypatch.setattr(database, 'backoff_delay', lambda attempt: 0)
+    before = database.transaction_stats()
+    holder = database.connect(str(tmp_path / 'notes.db'))
+    holder.execute('BEGIN IMMEDIATE')
+    try:
+        with pytest.raises(sqlite3.OperationalError) as excinfo:
+            database.run_in_transaction(lambda conn: None, notes, busy_timeout=0, retries=1)
+    finally:
+        holder.rollback()
+        holder.close()
+
+    assert database.is_busy_error(excinfo.value)
+    stats = database.transaction_stats()
+    assert stats['busy_retries'] == before['busy_retries'] + 1
+    assert stats['busy_failures'] == before['busy_failures'] + 1
+
+
+def test_other_errors_are_not_retried(notes):
+    calls = []
+
+    def write(conn):
+        calls.append(1)
+        conn.execute('INSERT INTO missing_table VALUES (1)')
+
+    with pytest.raises(sqlite3.OperationalError):
+        database.run_in_transaction(write, notes)
+    assert len(calls) == 1
@@ -0,0 +1,122 @@
+import sqlite3
+import threading
+
+import pytest
+
+from db_writer import DatabaseWriter, WriteTimeout
+
+
+@pytest.fixture
+def writer(tmp_path):
+    path = str(tmp_path / 'writer.db')
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE notes (body TEXT NOT NULL)')
+    conn.close()
+    writer = DatabaseWriter(db_name=path, enabled=True)
+    yield writer
+    writer.stop(timeout=5)
+
+
+def notes(writer):
+    conn = sqlite3.connect(writer.db_name)
+    try:
+        return sorted(row[0] for row in conn.execute('SELECT body FROM notes'))
+    finally:
+        conn.close()
+
+
+def insert(body):
+    def job(conn):
+        conn.execute('INSERT INTO notes (body) VALUES (?)', (body,))
+        return body
+    return job
+
+
+def hold(writer):
+    """Keep the writer busy until the returned event is set, so the jobs
+    submitted meanwhile are committed together as one batch."""
+    started, release = threading.Event(), threading.Event()
+
+    def job(conn):
+        started.set()
+        release.wait(5)
+
+    writer.submit(job)
+    assert started.wait(5)
+    return release
+
+
+def test_run_returns_result_after_commit(writer):
+    assert writer.run(insert('one')) == 'one'
+    assert notes(writer) == ['one']
+
+
+def test_failing_job_does_not_roll_back_its_batch(writer):
+    def fail(conn):
+        conn.execute('INSERT INTO notes (body) VALUES (?)', ('failed',))
+        raise RuntimeError('boom')
+
+    release = hold(writer)
+    before = writer.submit(insert('before'))
+    failing = writer.submit(fail)
+    after = writer.submit(insert('after'))
+    release.set()
+
+    assert before.result(5) == 'before'
+    assert after.result(5) == 'after'
+    with pytest.raises(RuntimeError):
+        failing.result(5)
+    assert notes(writer) == ['after', 'before']
+    stats = writer.stats()
+    assert stats['failed_jobs'] == 1
+    assert stats['largest_batch'] == 3
+
+
+def test_timed_out_job_is_withdrawn(writer):
+    release = hold(writer)
+    with pytest.raises(WriteTimeout):
+        writer.run(insert('late'), timeout=0.05)
+    release.set()
+    writer.stop(timeout=5)
+
+    assert notes(writer) == []
+    assert writer.stats()['timeouts'] == 1
+
+
+def test_disabled_writer_runs_jobs_inline(app):
+    inline = DatabaseWriter(enabled=False)
+
+    with app.app_context():
+        # Runs on the request's own connection, in the calling thread
+        assert inline.run(lambda conn: threading.current_thread().name) == threading.current_thread().name
+    assert inline.stats()['jobs'] == 0
+
+
+def test_concurrent_registrations_of_one_phone_create_one_user(client, db_path):
+    def register():
+        response = client.application.test_client().post('/users/register', json={
+            'first_name': 'Nour', 'last_name': 'Adel', 'phone': '01077778888', 'password': 'secret'
+        })
+        results.append(response.status_code)
+
+    results = []
+    threads = [threading.Thread(target=register) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(results) == [200, 400, 400, 400]
+    conn = sqlite3.connect(db_path)
+    assert conn.execute("SELECT COUNT(*) FROM users WHERE phone = '01077778888'").fetchone()[0] == 1
+    conn.close()
+
+
+def test_duplicate_partner_application_is_a_conflict(client):
+    application = {
+        'manager_name': 'Manager', 'manager_phone': '0100', 'restaurant_name': 'Sobhy Kaber',
+        'restaurant_phone': '0200', 'restaurant_email': 'sobhy@example.com',
+        'address': 'Shubra', 'has_license': 'yes'
+    }
+    assert client.post('/partners/apply', json=application).status_code == 201
+    assert client.post('/partners/apply', json=application).status_code == 409
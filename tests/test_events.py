@@ -0,0 +1,198 @@
+import asyncio
+import json
+import threading
+
+import pytest
+
+from events import EventHub, HubFull, PROCESS_TOKEN, hub
+
+
+def parse(chunks):
+    """(id, event, data) of the SSE events in chunks; comments are skipped."""
+    events = []
+    for chunk in chunks:
+        fields = dict(line.split(': ', 1) for line in chunk.strip().split('\n') if not line.startswith(':'))
+        if 'event' in fields:
+            events.append((fields.get('id'), fields['event'], json.loads(fields['data'])))
+    return events
+
+
+def event_id(seq):
+    return f'{PROCESS_TOKEN}-{seq}'
+
+
+def test_new_subscriber_gets_events_published_after_it_connected():
+    events = EventHub()
+    events.publish('restaurant:1', 'new_order', {'order_id': 1})
+    stream = events.subscribe('restaurant:1', stream_seconds=0.05)
+    assert next(stream) == 'retry: 3000\n\n'
+    events.publish('restaurant:1', 'new_order', {'order_id': 2})
+    events.publish('restaurant:2', 'new_order', {'order_id': 3})
+
+    assert parse(stream) == [(event_id(2), 'new_order', {'order_id': 2})]
+    assert events.stats()['subscribers'] == 0
+
+
+def test_reconnect_replays_the_events_after_last_event_id():
+    events = EventHub()
+    for order_id in (1, 2, 3):
+        events.publish('restaurant:1', 'new_order', {'order_id': order_id})
+
+    replayed = parse(events.subscribe('restaurant:1', event_id(1), stream_seconds=0.05))
+    assert [(id_, data['order_id']) for id_, _, data in replayed] == [(event_id(2), 2), (event_id(3), 3)]
+    assert parse(events.subscribe('restaurant:1', event_id(3), stream_seconds=0.05)) == []
+
+
+@pytest.mark.parametrize('last_event_id', ['0badf00d-2', event_id(1), 'garbage'])
+def test_unreplayable_last_event_id_asks_for_resync(last_event_id):
+    events = EventHub(backlog=2)
+    for order_id in (1, 2, 3, 4):
+        events.publish('restaurant:1', 'new_order', {'order_id': order_id})
+
+    assert parse(events.subscribe('restaurant:1', last_event_id, stream_seconds=0.05)) == [
+        (event_id(4), 'resync', {})
+    ]
+
+
+def test_subscribers_are_limited():
+    events = EventHub(max_subscribers=1)
+    stream = events.subscribe('restaurant:1')
+    with pytest.raises(HubFull):
+        events.subscribe('restaurant:2')
+
+    # A stream that was never iterated still frees its slot on close
+    stream.close()
+    stream.close()
+    events.subscribe('restaurant:2').close()
+    assert events.stats()['rejected'] == 1
+    assert events.stats()['subscribers'] == 0
+
+
+def test_restaurant_stream_is_refused_when_the_hub_is_full(client, monkeypatch):
+    monkeypatch.setattr(hub, 'max_subscribers', 0)
+    response = client.get('/restaurants/orders/1/stream')
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '30'
+
+
+def test_confirmed_order_is_pushed_to_its_restaurants(make_restaurant, place_order):
+    restaurant_id, (koshary, _) = make_restaurant()
+    stream = hub.subscribe(f'restaurant:{restaurant_id}', stream_seconds=0.05)
+    next(stream)
+    order_id = place_order([(restaurant_id, koshary, 1, 45.0)])
+
+    assert [(event, data) for _, event, data in parse(stream)] == [
+        ('new_order', {'order_id': order_id, 'restaurant_id': restaurant_id, 'status': 'pending'})
+    ]
+
+
+def test_polled_stream_reads_the_log_on_connect_and_on_notify():
+    events = EventHub()
+    log = [(1, 'status', {'status': 'pending'})]
+    calls = []
+
+    def fetch(after):
+        calls.append(after)
+        return [event for event in log if event[0] > after]
+
+    stream = events.subscribe_polled('order:1', fetch, stream_seconds=0.05)
+    assert next(stream) == 'retry: 3000\n\n'
+    assert parse([next(stream)]) == [('1', 'status', {'status': 'pending'})]
+    log.append((2, 'status', {'status': 'preparing'}))
+    events.notify('order:1')
+
+    assert parse(stream) == [('2', 'status', {'status': 'preparing'})]
+    assert calls[:2] == [0, 1]
+
+
+def test_notify_keeps_nothing_for_channels_without_subscribers():
+    events = EventHub()
+    events.notify('order:1')
+    assert events.stats()['channels'] == 0
+
+
+def restaurant_order_id(client, restaurant_id, order_id):
+    feed = client.get(f'/restaurants/orders/{restaurant_id}').get_json()
+    return next(o['restaurant_order_id'] for o in feed if o['id'] == order_id)
+
+
+def test_order_events_follow_status_changes(client, make_restaurant, place_order):
+    restaurant_id, (koshary, _) = make_restaurant()
+    order_id = place_order([(restaurant_id, koshary, 1, 45.0)])
+    ro_id = restaurant_order_id(client, restaurant_id, order_id)
+    for status in ('preparing', 'preparing', 'on_the_way'):
+        client.post(f'/restaurants/orders/update/{ro_id}', json={'status': status})
+
+    body = client.get(f'/orders/{order_id}/events').get_json()
+    # The repeated 'preparing' logged nothing
+    assert [e['status'] for e in body['events']] == ['pending', 'preparing', 'on_the_way']
+    assert {e['order_status'] for e in body['events']} == {'on_the_way'}
+    assert body['last_event_id'] == body['events'][-1]['id']
+
+    after = body['events'][0]['id']
+    body = client.get(f'/orders/{order_id}/events?after={after}').get_json()
+    assert [e['status'] for e in body['events']] == ['preparing', 'on_the_way']
+    assert client.get('/orders/999999/events').status_code == 404
+
+
+def test_order_stream_resumes_after_last_event_id(client, make_restaurant, place_order):
+    restaurant_id, (koshary, _) = make_restaurant()
+    order_id = place_order([(restaurant_id, koshary, 1, 45.0)])
+    ro_id = restaurant_order_id(client, restaurant_id, order_id)
+    client.post(f'/restaurants/orders/update/{ro_id}', json={'status': 'preparing'})
+    first_id = client.get(f'/orders/{order_id}/events').get_json()['events'][0]['id']
+
+    response = client.get(f'/orders/{order_id}/events/stream', headers={'Last-Event-ID': str(first_id)})
+    assert response.mimetype == 'text/event-stream'
+    chunks = iter(response.response)
+    assert next(chunks) == b'retry: 3000\n\n'
+    [(event_id, event, data)] = parse([next(chunks).decode()])
+    response.close()
+
+    assert int(event_id) > first_id
+    assert (event, data['status']) == ('status', 'preparing')
+    assert hub.stats()['subscribers'] == 0
+
+
+def collect_async(subscription):
+    async def collect():
+        return [chunk async for chunk in subscription]
+    return asyncio.run(collect())
+
+
+def test_async_stream_replays_like_the_sync_one():
+    events = EventHub()
+    for order_id in (1, 2, 3):
+        events.publish('restaurant:1', 'new_order', {'order_id': order_id})
+
+    stream = events.subscribe_async('restaurant:1', event_id(1), stream_seconds=0.05)
+    assert [data['order_id'] for _, _, data in parse(collect_async(stream))] == [2, 3]
+    assert parse(collect_async(events.subscribe_async('restaurant:1', 'other-1', stream_seconds=0.05))) == [
+        (event_id(3), 'resync', {})
+    ]
+    assert events.stats()['subscribers'] == 0
+
+
+def test_async_stream_wakes_on_publish_from_another_thread():
+    events = EventHub()
+
+    async def run():
+        stream = events.subscribe_async('restaurant:1', stream_seconds=1)
+        assert await stream.__anext__() == 'retry: 3000\n\n'
+        threading.Timer(0.05, events.publish, ('restaurant:1', 'new_order', {'order_id': 7})).start()
+        chunk = await asyncio.wait_for(stream.__anext__(), 0.5)
+        await stream.aclose()
+        return chunk
+
+    assert parse([asyncio.run(run())]) == [(event_id(1), 'new_order', {'order_id': 7})]
+    assert events.stats()['subscribers'] == 0
+
+
+def test_async_polled_stream_reads_the_log():
+    events = EventHub()
+
+    async def fetch(after):
+        return [(i, 'status', {'n': i}) for i in (1, 2) if i > after]
+
+    stream = events.subscribe_polled_async('order:1', fetch, last_id=1, stream_seconds=0.05)
+    assert parse(collect_async(stream)) == [('2', 'status', {'n': 2})]
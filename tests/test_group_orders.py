@@ -0,0 +1,50 @@
+def create_group_order(client, restaurant_id, items, members=('Amr', 'Mona', 'Hany')):
+    response = client.post('/group_orders/create', json={
+        'phone': '01033334444',
+        'delivery_location': 'Dokki',
+        'num_people': len(members),
+        'members': list(members),
+        'delivery_fee': 30,
+        'items': [{'restaurant_id': restaurant_id, 'menu_item_id': menu_item_id,
+                   'quantity': quantity, 'subtotal': subtotal, 'orderedBy': member}
+                  for menu_item_id, quantity, subtotal, member in items]
+    })
+    assert response.status_code == 201
+    return response.get_json()['order_id']
+
+
+def test_summary_groups_items_by_member(client, make_restaurant):
+    restaurant_id, (koshary, pudding) = make_restaurant()
+    order_id = create_group_order(client, restaurant_id, [
+        (koshary, 2, 90.0, 'Amr'), (pudding, 1, 20.0, 'Amr'), (koshary, 1, 45.0, 'Mona')
+    ])
+
+    summary = client.get(f'/group_orders/summary/{order_id}').get_json()
+    assert [m['member_name'] for m in summary['members']] == ['Amr', 'Mona', 'Hany']
+    assert [i['item_name'] for i in summary['member_items']['Amr']] == ['Koshary', 'Rice pudding']
+    assert summary['member_items']['Hany'] == []
+
+    totals = summary['member_totals']
+    assert totals['Amr']['subtotal'] == 110.0
+    assert totals['Hany'] == {'subtotal': 0, 'tax': 0, 'delivery_fee': 10.0, 'total': 10.0}
+    # Tax is shared by subtotal, the delivery fee evenly
+    assert totals['Amr']['tax'] == round(summary['order']['tax'] * 110 / 155, 2)
+    assert totals['Mona']['delivery_fee'] == 10.0
+
+
+def test_member_tax_shares_never_exceed_the_tax(client, make_restaurant):
+    restaurant_id, (koshary, pudding) = make_restaurant()
+    # The pudding was ordered by someone who is not a member
+    order_id = create_group_order(client, restaurant_id, [
+        (koshary, 1, 45.0, 'Amr'), (pudding, 1, 20.0, 'Guest')
+    ], members=('Amr', 'Mona'))
+
+    summary = client.get(f'/group_orders/summary/{order_id}').get_json()
+    tax = summary['order']['tax']
+    shares = [member['tax'] for member in summary['member_totals'].values()]
+    assert sum(shares) < tax
+    assert summary['member_totals']['Amr']['tax'] == round(tax * 45 / 65, 2)
+
+
+def test_summary_of_unknown_order_is_404(client):
+    assert client.get('/group_orders/summary/999999').status_code == 404
@@ -0,0 +1,74 @@
+import sqlite3
+
+from http_cache import conditional, make_etag
+
+
+def test_make_etag_depends_on_parts_and_host(app):
+    with app.test_request_context('/', base_url='http://a.example'):
+        etag = make_etag('menu', 1, 3)
+        assert make_etag('menu', 1, 3) == etag
+        assert make_etag('menu', 1, 4) != etag
+    with app.test_request_context('/', base_url='http://b.example'):
+        assert make_etag('menu', 1, 3) != etag
+
+
+def test_builds_response_with_etag(app):
+    with app.test_request_context('/'):
+        response = conditional('v1', lambda: {'ok': True})
+        assert response.status_code == 200
+        assert response.get_json() == {'ok': True}
+        assert response.get_etag() == ('v1', False)
+        assert response.cache_control.no_cache
+        assert response.cache_control.public
+
+
+def test_matching_etag_skips_build(app):
+    def build():
+        raise AssertionError('built despite a matching ETag')
+
+    with app.test_request_context('/', headers={'If-None-Match': '"v0", "v1"'}):
+        response = conditional('v1', build, max_age=30, private=True)
+        assert response.status_code == 304
+        assert response.get_data() == b''
+        assert response.get_etag() == ('v1', False)
+        assert response.cache_control.max_age == 30
+        assert response.cache_control.private
+
+
+def test_stale_etag_rebuilds(app):
+    with app.test_request_context('/', headers={'If-None-Match': '"v1"'}):
+        response = conditional('v2', lambda: 'fresh')
+        assert response.status_code == 200
+        assert response.get_etag() == ('v2', False)
+
+
+def test_errors_are_not_cached(app):
+    with app.test_request_context('/', headers={'If-None-Match': '"v1"'}):
+        assert conditional('v2', lambda: ({'error': 'not found'}, 404)).status_code == 404
+    with app.test_request_context('/'):
+        response = conditional('v1', lambda: ({'error': 'not found'}, 404))
+        assert response.get_etag() == (None, None)
+        assert not response.cache_control.public
+
+
+def test_without_etag(app):
+    with app.test_request_context('/', headers={'If-None-Match': '*'}):
+        response = conditional(None, lambda: 'body')
+        assert response.status_code == 200
+        assert response.get_etag() == (None, None)
+
+
+def test_order_summary_revalidates_until_its_items_change(client, db_path, make_restaurant, place_order):
+    restaurant_id, (koshary, _) = make_restaurant()
+    order_id = place_order([(restaurant_id, koshary, 1, 45.0)])
+    etag = client.get(f'/orders/summary/{order_id}').headers['ETag']
+    assert client.get(f'/orders/summary/{order_id}', headers={'If-None-Match': etag}).status_code == 304
+
+    conn = sqlite3.connect(db_path)
+    with conn:
+        conn.execute('UPDATE order_items SET quantity = 2 WHERE order_id = ?', (order_id,))
+    conn.close()
+    response = client.get(f'/orders/summary/{order_id}', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    assert 'private' in response.headers['Cache-Control']
@@ -0,0 +1,70 @@
+import base64
+import io
+import os
+
+import pytest
+
+import image_store
+
+PIL = pytest.importorskip('PIL.Image')
+
+
+@pytest.fixture(autouse=True)
+def media_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(image_store, 'MEDIA_DIR', str(tmp_path))
+    return tmp_path
+
+
+def png_data_url(size=(800, 600), color=(200, 40, 40)):
+    buffer = io.BytesIO()
+    PIL.new('RGB', size, color).save(buffer, format='PNG')
+    return 'data:image/png;base64,' + base64.b64encode(buffer.getvalue()).decode()
+
+
+def test_identical_uploads_share_one_file(media_dir):
+    key = image_store.store_data_url(png_data_url())
+    assert image_store.KEY_PATTERN.match(key) and key.endswith('.png')
+    assert image_store.store_data_url(png_data_url()) == key
+    assert image_store.store_data_url(png_data_url(color=(0, 0, 0))) != key
+    assert len([name for name in os.listdir(media_dir) if name.endswith('.png')]) == 2
+
+
+def test_thumbnail_fits_the_thumbnail_size():
+    key = image_store.store_data_url(png_data_url())
+    with PIL.open(image_store.image_path(key, thumbnail=True)) as thumb:
+        assert max(thumb.size) == max(image_store.THUMBNAIL_SIZE)
+
+
+@pytest.mark.parametrize('value', [
+    'not a data url',
+    'data:text/plain;base64,aGVsbG8=',
+    'data:image/tiff;base64,aGVsbG8=',
+])
+def test_store_rejects_anything_but_image_data_urls(value):
+    with pytest.raises(ValueError):
+        image_store.store_data_url(value)
+
+
+def test_normalize():
+    key = image_store.store_data_url(png_data_url())
+    assert image_store.normalize(None) is None
+    assert image_store.normalize(png_data_url()) == f'/images/{key}'
+    # The edit form sends back the absolute URL of the current image
+    assert image_store.normalize(f'http://localhost/images/thumbs/{key}') == f'/images/{key}'
+    assert image_store.normalize('https://cdn.example.com/a.jpg') == 'https://cdn.example.com/a.jpg'
+
+
+def test_images_are_served_immutable(client):
+    key = image_store.store_data_url(png_data_url())
+
+    response = client.get(f'/images/{key}')
+    assert response.status_code == 200
+    assert response.mimetype == 'image/png'
+    assert 'immutable' in response.headers['Cache-Control']
+    assert client.get(f'/images/thumbs/{key}').status_code == 200
+
+
+def test_unknown_or_malformed_keys_are_404(client):
+    assert client.get('/images/' + 'a' * 64 + '.png').status_code == 404
+    assert client.get('/images/..%2Fsecret.png').status_code == 404
+    assert client.get('/images/thumbs/not-a-key.jpg').status_code == 404
@@ -0,0 +1,64 @@
+import re
+
+import metrics
+from metrics import Histogram, RequestMetrics, render_stats
+
+
+def sample(text, name, **labels):
+    """Value of the sample name{labels...} in a Prometheus text page."""
+    for line in text.splitlines():
+        if line.startswith(name + '{') or line.startswith(name + ' '):
+            found = dict(re.findall(r'(\w+)="([^"]*)"', line.split(' ')[0]))
+            if all(found.get(k) == str(v) for k, v in labels.items()):
+                return float(line.rsplit(' ', 1)[1])
+    return None
+
+
+def test_histogram_buckets_are_upper_bounds():
+    histogram = Histogram((1, 10))
+    for value in (0.5, 1, 5, 50):
+        histogram.observe(value)
+    assert histogram.counts == [2, 1, 1]
+    assert histogram.sum == 56.5
+
+
+def test_render_is_cumulative_per_route():
+    recorded = RequestMetrics()
+    recorded.observe('orders', '/orders/<int:order_id>', 'GET', 200, 0.003, 512, None)
+    recorded.observe('orders', '/orders/<int:order_id>', 'GET', 404, 0.2, 40, None)
+    lines = []
+    recorded.render(lines)
+    text = '\n'.join(lines)
+
+    name = 'yallaorder_http_request_duration_seconds'
+    route = {'route': '/orders/<int:order_id>', 'method': 'GET'}
+    assert sample(text, f'{name}_bucket', le='0.005', **route) == 1
+    assert sample(text, f'{name}_bucket', le='+Inf', **route) == 2
+    assert sample(text, f'{name}_count', **route) == 2
+    assert sample(text, 'yallaorder_http_requests_total', status=404, **route) == 1
+    assert '# TYPE yallaorder_http_response_size_bytes histogram' in text
+
+
+def test_running_totals_are_counters_and_the_rest_gauges():
+    lines = []
+    render_stats(lines, 'cache', {'hits': 3, 'entries': 2, 'enabled': True, 'name': 'catalog'})
+    assert lines == [
+        '# TYPE yallaorder_cache_hits_total counter', 'yallaorder_cache_hits_total 3',
+        '# TYPE yallaorder_cache_entries gauge', 'yallaorder_cache_entries 2',
+        '# TYPE yallaorder_cache_enabled gauge', 'yallaorder_cache_enabled 1',
+    ]
+
+
+def test_metrics_endpoint_reports_requests_by_url_rule(client, make_restaurant):
+    restaurant_id, _ = make_restaurant()
+    client.get(f'/menu/list/{restaurant_id}')
+    client.get('/menu/list/999999')
+
+    response = client.get('/metrics')
+    assert response.content_type == metrics.CONTENT_TYPE
+    text = response.get_data(as_text=True)
+    # Both paths land in one series labelled with the rule
+    assert sample(text, 'yallaorder_http_requests_total',
+                  route='/menu/list/<int:restaurant_id>', method='GET', status=200) >= 2
+    assert f'/menu/list/{restaurant_id}' not in text
+    assert sample(text, 'yallaorder_db_pool_checkouts_total') > 0
@@ -0,0 +1,88 @@
+import sqlite3
+
+import pytest
+
+import migrations
+
+
+def index_names(path):
+    conn = sqlite3.connect(path)
+    try:
+        return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    finally:
+        conn.close()
+
+
+def test_versions_are_contiguous():
+    versions = [version for version, _, _ in migrations.discover()]
+    assert versions == list(range(1, len(versions) + 1))
+
+
+def test_upgrade_applies_every_migration_once(tmp_path):
+    path = str(tmp_path / 'fresh.db')
+    versions = [version for version, _, _ in migrations.discover()]
+
+    assert migrations.upgrade(path, log=None) == versions
+    assert migrations.upgrade(path, log=None) == []
+    assert migrations.status(path) == (versions[-1], [])
+    assert {'idx_orders_phone_created', 'idx_order_items_order'} <= index_names(path)
+
+
+def test_upgrade_stops_at_target(tmp_path):
+    path = str(tmp_path / 'partial.db')
+    assert migrations.upgrade(path, target=2, log=None) == [1, 2]
+    version, pending = migrations.status(path)
+    assert version == 2
+    assert pending[0][0] == 3
+
+
+def test_failed_migration_leaves_no_trace(tmp_path, monkeypatch):
+    scripts = tmp_path / 'scripts'
+    scripts.mkdir()
+    (scripts / '0001_notes.sql').write_text('CREATE TABLE notes (body TEXT);\n')
+    (scripts / '0002_broken.sql').write_text(
+        'CREATE TABLE tags (name TEXT);\nINSERT INTO missing_table VALUES (1);\n'
+    )
+    monkeypatch.setattr(migrations, 'MIGRATIONS_DIR', str(scripts))
+    path = str(tmp_path / 'broken.db')
+
+    with pytest.raises(sqlite3.OperationalError):
+        migrations.upgrade(path, log=None)
+
+    conn = sqlite3.connect(path)
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    conn.close()
+    assert 'notes' in tables and 'tags' not in tables
+    assert migrations.status(path) == (1, [(2, 'broken')])
+
+
+def test_split_statements_keeps_trigger_bodies_whole():
+    script = '''
+        CREATE TABLE a (x);
+        CREATE TRIGGER t AFTER INSERT ON a
+        BEGIN
+            INSERT INTO a VALUES (1);
+            DELETE FROM a;
+        END;
+        -- trailing comment
+    '''
+    statements = migrations.split_statements(script)
+    assert len(statements) == 2
+    assert statements[1].startswith('CREATE TRIGGER') and statements[1].endswith('END;')
+
+
+def test_feed_index_upgrade_replaces_the_old_index(tmp_path):
+    path = str(tmp_path / 'old.db')
+    migrations.upgrade(path, target=2, log=None)
+    conn = sqlite3.connect(path)
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_restaurant_orders_restaurant_status
+            ON restaurant_orders (restaurant_id, status)
+    ''')
+    conn.close()
+
+    migrations.upgrade(path, log=None)
+    indexes = index_names(path)
+    assert 'idx_restaurant_orders_restaurant_status' not in indexes
+    assert {'idx_restaurant_orders_restaurant_status_order',
+            'idx_restaurant_orders_restaurant_order'} <= indexes
@@ -0,0 +1,41 @@
+import pytest
+
+from routes.order_routes import combined_status
+
+
+@pytest.mark.parametrize('statuses, expected', [
+    ([], 'pending'),
+    (['delivered', 'preparing'], 'preparing'),
+    (['on_the_way', 'cancelled'], 'on_the_way'),
+    (['cancelled', 'cancelled'], 'cancelled'),
+])
+def test_combined_status_follows_the_slowest_restaurant(statuses, expected):
+    assert combined_status(statuses) == expected
+
+
+def test_history_by_phone_lists_items_and_restaurant_statuses(client, make_restaurant, place_order):
+    phone = '01011112222'
+    restaurant_id, (koshary, pudding) = make_restaurant()
+    other_id, (falafel,) = make_restaurant('Falafel Stand', [('Falafel', 10.0)])
+    first = place_order([(restaurant_id, koshary, 1, 45.0)], phone=phone)
+    second = place_order([(restaurant_id, pudding, 2, 20.0), (other_id, falafel, 1, 10.0)], phone=phone)
+    place_order([(restaurant_id, koshary, 1, 45.0)], phone='01099999999')
+
+    feed = client.get(f'/restaurants/orders/{other_id}').get_json()
+    client.post(f"/restaurants/orders/update/{feed[0]['restaurant_order_id']}", json={'status': 'delivered'})
+
+    orders = client.get(f'/orders/user/phone/{phone}').get_json()
+    assert [order['id'] for order in orders] == [second, first]
+    latest = orders[0]
+    assert sorted(item['item_name'] for item in latest['items']) == ['Falafel', 'Rice pudding']
+    assert {(s['restaurant_id'], s['status']) for s in latest['restaurant_statuses']} == {
+        (restaurant_id, 'pending'), (other_id, 'delivered')
+    }
+    # Only as far along as the slowest restaurant
+    assert latest['status'] == 'pending'
+
+
+def test_history_by_phone_is_empty_for_unknown_phone(client):
+    response = client.get('/orders/user/phone/00000000000')
+    assert response.status_code == 200
+    assert response.get_json() == []
@@ -0,0 +1,165 @@
+import sqlite3
+
+import pytest
+
+from order_store import (
+    OrderTotalMismatch, insert_order, insert_order_items, create_restaurant_orders, check_order_total,
+    set_restaurant_order_status, get_order_count, reconcile_order_counts
+)
+
+
+@pytest.fixture
+def conn(db_path):
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    yield conn
+    conn.rollback()
+    conn.close()
+
+
+def order_items(restaurant_id, item_ids, quantity=1, subtotal=10.0):
+    return [{'menu_item_id': item_id, 'restaurant_id': restaurant_id,
+             'quantity': quantity, 'subtotal': subtotal} for item_id in item_ids]
+
+
+def test_order_is_written_with_its_final_total(conn, make_restaurant):
+    restaurant_id, item_ids = make_restaurant()
+    cursor = conn.cursor()
+    order_id = insert_order(cursor, 'individual', '0100', 'Maadi', 20.0, 2.8, 15)
+    ids = insert_order_items(cursor, order_id, order_items(restaurant_id, item_ids))
+    check_order_total(cursor, order_id, 20.0, 2)
+
+    assert len(ids) == 2
+    assert cursor.execute('SELECT total FROM orders WHERE id = ?', (order_id,)).fetchone()[0] == 37.8
+    assert [row['id'] for row in cursor.execute(
+        'SELECT id FROM order_items WHERE order_id = ? ORDER BY id', (order_id,))] == ids
+
+
+def test_per_row_insert_triggers_are_retired(conn):
+    triggers = {row[0] for row in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'order_items'")}
+    assert not triggers & {'trg_recalculate_total_after_insert', 'trg_order_items_set_subtotal',
+                           'trg_order_items_update_subtotal'}
+
+
+@pytest.mark.parametrize('subtotal, item_count', [(25.0, 2), (20.0, 3)])
+def test_check_order_total_rejects_items_that_do_not_add_up(conn, make_restaurant, subtotal, item_count):
+    restaurant_id, item_ids = make_restaurant()
+    cursor = conn.cursor()
+    order_id = insert_order(cursor, 'individual', '0100', 'Maadi', subtotal, 0, 0)
+    insert_order_items(cursor, order_id, order_items(restaurant_id, item_ids))
+
+    with pytest.raises(OrderTotalMismatch):
+        check_order_total(cursor, order_id, subtotal, item_count)
+
+
+def test_restaurant_orders_are_created_once_per_restaurant(conn, make_restaurant):
+    first, _ = make_restaurant()
+    second, _ = make_restaurant('Falafel Stand')
+    cursor = conn.cursor()
+    order_id = insert_order(cursor, 'individual', '0100', 'Maadi', 0, 0, 0)
+
+    assert create_restaurant_orders(cursor, order_id, [second, first, second]) == [second, first]
+    rows = cursor.execute(
+        'SELECT restaurant_id, status FROM restaurant_orders WHERE order_id = ? ORDER BY id', (order_id,)
+    ).fetchall()
+    assert [tuple(row) for row in rows] == [(second, 'pending'), (first, 'pending')]
+
+
+def test_place_order_total_is_derived_from_the_items(client, make_restaurant):
+    restaurant_id, (koshary, pudding) = make_restaurant()
+    response = client.post('/orders/place', json={
+        'phone': '0100', 'delivery_location': 'Maadi', 'tax': 5, 'delivery_fee': 15,
+        'items': order_items(restaurant_id, [koshary], 2, 90.0) + order_items(restaurant_id, [pudding], 1, 20.0)
+    })
+    order_id = response.get_json()['order_id']
+
+    order = client.get(f'/orders/summary/{order_id}').get_json()
+    assert order['order']['total'] == 130.0
+    assert len(order['items']) == 2
+
+
+def status_events(cursor, restaurant_order_id):
+    return [row['status'] for row in cursor.execute(
+        'SELECT status FROM order_status_events WHERE restaurant_order_id = ? ORDER BY id',
+        (restaurant_order_id,))]
+
+
+def test_counts_follow_creation_and_status_changes(conn, make_restaurant):
+    restaurant_id, _ = make_restaurant()
+    cursor = conn.cursor()
+    for _ in range(2):
+        order_id = insert_order(cursor, 'individual', '0100', 'Maadi', 0, 0, 0)
+        create_restaurant_orders(cursor, order_id, [restaurant_id])
+    assert get_order_count(conn, restaurant_id, 'pending') == 2
+
+    ro_id = cursor.execute('SELECT id FROM restaurant_orders WHERE order_id = ?', (order_id,)).fetchone()[0]
+    assert set_restaurant_order_status(cursor, ro_id, 'preparing')['changed']
+    assert get_order_count(conn, restaurant_id, 'pending') == 1
+    assert get_order_count(conn, restaurant_id, 'preparing') == 1
+    assert get_order_count(conn, restaurant_id, 'delivered') == 0
+    assert status_events(cursor, ro_id) == ['pending', 'preparing']
+
+
+def test_setting_the_same_status_writes_nothing(conn, make_restaurant):
+    restaurant_id, _ = make_restaurant()
+    cursor = conn.cursor()
+    order_id = insert_order(cursor, 'individual', '0100', 'Maadi', 0, 0, 0)
+    create_restaurant_orders(cursor, order_id, [restaurant_id])
+    ro_id = cursor.execute('SELECT id FROM restaurant_orders WHERE order_id = ?', (order_id,)).fetchone()[0]
+
+    assert set_restaurant_order_status(cursor, ro_id, 'pending') == {
+        'order_id': order_id, 'restaurant_id': restaurant_id, 'changed': False
+    }
+    assert get_order_count(conn, restaurant_id, 'pending') == 1
+    assert status_events(cursor, ro_id) == ['pending']
+    assert set_restaurant_order_status(cursor, 999999, 'pending') is None
+
+
+def corrupt_count(db_path, restaurant_id, status, count):
+    conn = sqlite3.connect(db_path)
+    with conn:
+        conn.execute('''
+            INSERT INTO restaurant_order_counts (restaurant_id, status, count) VALUES (?, ?, ?)
+            ON CONFLICT (restaurant_id, status) DO UPDATE SET count = excluded.count
+        ''', (restaurant_id, status, count))
+    conn.close()
+
+
+def test_reconcile_finds_and_repairs_wrong_counts(db_path, make_restaurant, place_order):
+    restaurant_id, (koshary, _) = make_restaurant()
+    place_order([(restaurant_id, koshary, 1, 45.0)])
+    corrupt_count(db_path, restaurant_id, 'pending', 5)
+    corrupt_count(db_path, restaurant_id, 'delivered', 2)
+
+    conn = sqlite3.connect(db_path)
+    expected = [(restaurant_id, 'delivered', 2, 0), (restaurant_id, 'pending', 5, 1)]
+    assert [m for m in reconcile_order_counts(conn) if m[0] == restaurant_id] == expected
+    assert [m for m in reconcile_order_counts(conn, repair=True) if m[0] == restaurant_id] == expected
+    assert reconcile_order_counts(conn) == []
+    conn.close()
+
+
+def test_reconcile_command(client, db_path, make_restaurant, place_order):
+    restaurant_id, (koshary, _) = make_restaurant()
+    place_order([(restaurant_id, koshary, 1, 45.0)])
+    corrupt_count(db_path, restaurant_id, 'pending', 3)
+    runner = client.application.test_cli_runner()
+
+    result = runner.invoke(args=['reconcile-order-counts'])
+    assert result.exit_code == 1
+    assert f'Restaurant {restaurant_id} pending: stored 3, actual 1' in result.output
+
+    result = runner.invoke(args=['reconcile-order-counts', '--repair'])
+    assert result.exit_code == 0 and '(repaired)' in result.output
+    assert runner.invoke(args=['reconcile-order-counts']).output.strip() == 'Order counts are consistent'
+
+
+def test_pending_count_route(client, make_restaurant, place_order):
+    restaurant_id, (koshary, _) = make_restaurant()
+    for _ in range(3):
+        place_order([(restaurant_id, koshary, 1, 45.0)])
+    feed = client.get(f'/restaurants/orders/{restaurant_id}').get_json()
+    client.post(f"/restaurants/orders/update/{feed[0]['restaurant_order_id']}", json={'status': 'cancelled'})
+
+    assert client.get(f'/restaurants/orders/{restaurant_id}/pending-count').get_json() == {'count': 2}
@@ -0,0 +1,98 @@
+import pytest
+
+from pagination import (
+    InvalidCursor, decode_cursor, encode_cursor, fetch_limit, page_args, paginate_sorted, split_page
+)
+
+
+def test_cursor_round_trip():
+    values = ['2024-05-01 12:00:00', 42, 9.5]
+    token = encode_cursor(values)
+    assert '=' not in token
+    assert decode_cursor(token, 3) == values
+
+
+@pytest.mark.parametrize('token', [
+    'not base64!',
+    encode_cursor([1, 2]),           # wrong number of key columns
+    encode_cursor([[1], 2, 3]),      # not a scalar
+    encode_cursor([None, 2, 3]),
+    'eyJhIjogMX0',                   # {"a": 1}
+])
+def test_invalid_cursor(token):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(token, 3)
+
+
+def test_page_args(app):
+    with app.test_request_context('/?limit=500'):
+        assert page_args(20, 100, 2) == (100, None)
+    with app.test_request_context('/?limit=0'):
+        assert page_args(20, 100, 2) == (1, None)
+    with app.test_request_context('/'):
+        assert page_args(20, 100, 2) == (20, None)
+        assert page_args(None, 100, 2) == (None, None)
+    with app.test_request_context('/?cursor=' + encode_cursor(['a', 7])):
+        assert page_args(None, 100, 2) == (None, ['a', 7])
+
+
+def test_page_args_rejects_invalid_cursor(app):
+    with app.test_request_context('/?cursor=' + encode_cursor([7])):
+        with pytest.raises(InvalidCursor):
+            page_args(20, 100, 2)
+
+
+def test_split_page():
+    rows = [(5,), (4,), (3,)]
+    assert fetch_limit(2) == 3
+    page, next_cursor = split_page(rows, 2, key=lambda row: row)
+    assert page == [(5,), (4,)]
+    assert decode_cursor(next_cursor, 1) == [4]
+
+    assert split_page(rows[:2], 2, key=lambda row: row) == ([(5,), (4,)], None)
+    assert fetch_limit(None) == -1
+    assert split_page(rows, None, key=lambda row: row) == (rows, None)
+
+
+def test_paginate_sorted_walks_every_item():
+    items = list(range(1, 8))
+    key = lambda item: (item,)
+    seen, after = [], None
+    while True:
+        page, next_cursor = paginate_sorted(items, key, 3, after)
+        seen.extend(page)
+        if next_cursor is None:
+            break
+        after = decode_cursor(next_cursor, 1)
+    assert seen == items
+    assert paginate_sorted(items, key, None, [5]) == ([6, 7], None)
+
+
+def walk(client, url):
+    """Every row of a paged list endpoint, following X-Next-Cursor."""
+    rows, cursor = [], None
+    while True:
+        response = client.get(url + (f'&cursor={cursor}' if cursor else ''))
+        assert response.status_code == 200
+        rows.extend(response.get_json())
+        cursor = response.headers.get('X-Next-Cursor')
+        if not cursor:
+            return rows
+        assert f'cursor={cursor}' in response.headers['Link']
+
+
+def test_menu_list_pages_cover_the_whole_menu(client, make_restaurant):
+    names = [f'Dish {i}' for i in range(7)]
+    restaurant_id, _ = make_restaurant(items=[(name, 10.0) for name in reversed(names)])
+
+    assert [item['name'] for item in walk(client, f'/menu/list/{restaurant_id}?limit=3')] == names
+    assert len(client.get(f'/menu/list/{restaurant_id}').get_json()) == 7
+
+
+def test_order_history_pages_cover_every_order(client, make_restaurant, place_order):
+    restaurant_id, (koshary, _) = make_restaurant()
+    placed = [place_order([(restaurant_id, koshary, 1, 45.0)], phone='01055556666') for _ in range(5)]
+
+    orders = walk(client, '/orders/user/phone/01055556666?limit=2')
+    assert [order['id'] for order in orders] == placed[::-1]
+    assert client.get('/orders/user/phone/01055556666?cursor=bad').status_code == 400
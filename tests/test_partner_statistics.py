@@ -0,0 +1,76 @@
+import os
+import sqlite3
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from routes.partner_routes import statistics_cache
+
+
+@pytest.fixture
+def tokyo_time():
+    """Run with the server's local time nine hours ahead of UTC."""
+    old = os.environ.get('TZ')
+    os.environ['TZ'] = 'Asia/Tokyo'
+    time.tzset()
+    yield
+    if old is None:
+        del os.environ['TZ']
+    else:
+        os.environ['TZ'] = old
+    time.tzset()
+
+
+def statistics(client):
+    response = client.get('/partners/statistics')
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def day_counts(stats):
+    return {day['date']: day['count'] for day in stats['applications']['by_day']}
+
+
+def apply(client):
+    return client.post('/partners/apply', json={
+        'manager_name': 'Manager', 'manager_phone': '0100', 'restaurant_name': 'Fatayer House',
+        'restaurant_phone': '0200', 'restaurant_email': f'{uuid.uuid4()}@example.com',
+        'address': 'Giza', 'has_license': 'yes'
+    })
+
+
+def test_application_is_counted_as_soon_as_it_is_submitted(client):
+    before = statistics(client)
+    assert apply(client).status_code == 201
+    after = statistics(client)
+
+    today = datetime.now(timezone.utc).date().isoformat()
+    assert after['total'] == before['total'] + 1
+    assert after['pending'] == before['pending'] + 1
+    assert after['applications']['last_7_days'] == before['applications']['last_7_days'] + 1
+    assert day_counts(after)[today] == day_counts(before)[today] + 1
+    assert len(after['applications']['by_day']) == 30
+
+
+def test_local_applied_at_is_bucketed_by_utc_day(client, db_path, tokyo_time):
+    today = datetime.now(timezone.utc).date()
+    statistics_cache.clear()
+    before = day_counts(statistics(client))
+
+    # 20:00 UTC today is 05:00 tomorrow in Tokyo, which is what gets stored
+    local = datetime.combine(today + timedelta(days=1), datetime.min.time()).replace(hour=5)
+    conn = sqlite3.connect(db_path)
+    with conn:
+        conn.execute('''
+            INSERT INTO partner_applications
+                (manager_name, manager_phone, restaurant_name, restaurant_phone,
+                 restaurant_email, address, has_license, applied_at)
+            VALUES ('Manager', '0100', 'Late Night Grill', '0200', ?, 'Giza', 'yes', ?)
+        ''', (f'{uuid.uuid4()}@example.com', local.isoformat()))
+    conn.close()
+    statistics_cache.clear()
+
+    after = day_counts(statistics(client))
+    assert after[today.isoformat()] == before[today.isoformat()] + 1
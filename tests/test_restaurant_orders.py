@@ -0,0 +1,50 @@
+def test_feed_lists_newest_orders_first_with_their_items(client, make_restaurant, place_order):
+    restaurant_id, (koshary, pudding) = make_restaurant()
+    other_id, (falafel,) = make_restaurant('Falafel Stand', [('Falafel', 10.0)])
+    first = place_order([(restaurant_id, koshary, 2, 45.0)])
+    second = place_order([(restaurant_id, pudding, 1, 20.0), (other_id, falafel, 3, 10.0)])
+
+    response = client.get(f'/restaurants/orders/{restaurant_id}')
+    assert response.status_code == 200
+    assert 'X-Next-Cursor' not in response.headers
+    orders = response.get_json()
+    assert [order['id'] for order in orders] == [second, first]
+    # Only this restaurant's items, and their subtotal
+    assert [item['name'] for item in orders[0]['items']] == ['Rice pudding']
+    assert orders[0]['subtotal'] == 20.0
+    assert orders[1]['items'][0]['quantity'] == 2
+
+
+def test_feed_filters_by_status(client, make_restaurant, place_order):
+    restaurant_id, (koshary, _) = make_restaurant()
+    delivered = place_order([(restaurant_id, koshary, 1, 45.0)])
+    pending = place_order([(restaurant_id, koshary, 1, 45.0)])
+    [order] = [o for o in client.get(f'/restaurants/orders/{restaurant_id}').get_json()
+               if o['id'] == delivered]
+    client.post(f"/restaurants/orders/update/{order['restaurant_order_id']}", json={'status': 'delivered'})
+
+    ids = [o['id'] for o in client.get(f'/restaurants/orders/{restaurant_id}?status=pending').get_json()]
+    assert ids == [pending]
+    ids = [o['id'] for o in client.get(f'/restaurants/orders/{restaurant_id}?status=Delivered, pending').get_json()]
+    assert ids == [pending, delivered]
+
+
+def test_feed_pages_with_the_next_cursor(client, make_restaurant, place_order):
+    restaurant_id, (koshary, _) = make_restaurant()
+    placed = [place_order([(restaurant_id, koshary, 1, 45.0)]) for _ in range(5)]
+
+    seen, cursor = [], None
+    while True:
+        url = f'/restaurants/orders/{restaurant_id}?limit=2'
+        response = client.get(url + (f'&cursor={cursor}' if cursor else ''))
+        page = response.get_json()
+        assert len(page) <= 2
+        seen.extend(order['id'] for order in page)
+        cursor = response.headers.get('X-Next-Cursor')
+        if not cursor:
+            break
+    assert seen == placed[::-1]
+
+
+def test_feed_rejects_a_bad_cursor(client):
+    assert client.get('/restaurants/orders/1?cursor=not-a-cursor').status_code == 400
@@ -0,0 +1,93 @@
+import sqlite3
+import uuid
+
+import pytest
+
+from search import match_query, clamp_limit, MAX_LIMIT
+
+
+def unique_word():
+    """A word no other test's rows contain."""
+    return 'w' + uuid.uuid4().hex[:10]
+
+
+def fts_ids(db_path, table, word):
+    conn = sqlite3.connect(db_path)
+    try:
+        return [row[0] for row in conn.execute(
+            f'SELECT rowid FROM {table} WHERE {table} MATCH ?', (match_query(word),))]
+    finally:
+        conn.close()
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('piz', '"piz"*'),
+    ('  Pizza  marg ', '"Pizza"* "marg"*'),
+    ('fish OR "chips" NEAR(x)', '"fish"* "OR"* "chips"* "NEAR"* "x"*'),
+    ('كشري', '"كشري"*'),
+    ('*-"()', None),
+])
+def test_match_query_quotes_every_word_as_a_prefix(text, expected):
+    assert match_query(text) == expected
+
+
+def test_clamp_limit():
+    assert clamp_limit(None) == 20
+    assert clamp_limit(0) == 1
+    assert clamp_limit(10 ** 6) == MAX_LIMIT
+
+
+def test_menu_index_follows_menu_item_writes(db_path, make_restaurant):
+    word, renamed = unique_word(), unique_word()
+    _, (item_id,) = make_restaurant(items=[(f'{word} platter', 50.0)])
+    assert fts_ids(db_path, 'menu_items_fts', word) == [item_id]
+
+    conn = sqlite3.connect(db_path)
+    with conn:
+        conn.execute('UPDATE menu_items SET name = ? WHERE id = ?', (renamed, item_id))
+    assert fts_ids(db_path, 'menu_items_fts', word) == []
+    assert fts_ids(db_path, 'menu_items_fts', renamed) == [item_id]
+
+    with conn:
+        conn.execute('DELETE FROM menu_items WHERE id = ?', (item_id,))
+    conn.close()
+    assert fts_ids(db_path, 'menu_items_fts', renamed) == []
+
+
+def test_restaurant_index_holds_approved_partners_only(db_path, make_restaurant):
+    word = unique_word()
+    restaurant_id, _ = make_restaurant(f'{word} Grill')
+    assert fts_ids(db_path, 'restaurants_fts', word) == [restaurant_id]
+
+    conn = sqlite3.connect(db_path)
+    with conn:
+        conn.execute("UPDATE partner_applications SET status = 'rejected' WHERE id = ?", (restaurant_id,))
+    assert fts_ids(db_path, 'restaurants_fts', word) == []
+
+    with conn:
+        conn.execute("UPDATE partner_applications SET status = 'approved' WHERE id = ?", (restaurant_id,))
+    conn.close()
+    assert fts_ids(db_path, 'restaurants_fts', word) == [restaurant_id]
+
+
+def test_menu_search_ranks_name_matches_first(client, db_path, make_restaurant):
+    word = unique_word()
+    restaurant_id, (in_description, in_name) = make_restaurant(items=[('Soup', 15.0), (f'{word} soup', 25.0)])
+    conn = sqlite3.connect(db_path)
+    with conn:
+        conn.execute('UPDATE menu_items SET description = ? WHERE id = ?', (f'With {word}', in_description))
+    conn.close()
+
+    body = client.get(f'/restaurant-menu/search?q={word[:-2]}').get_json()
+    assert [item['id'] for item in body['menu_items']] == [in_name, in_description]
+    assert body['menu_items'][0]['restaurant_id'] == restaurant_id
+
+
+def test_restaurant_search_by_name_prefix(client, make_restaurant):
+    word = unique_word()
+    restaurant_id, _ = make_restaurant(f'{word} Kitchen')
+
+    body = client.get(f'/restaurants/search?q={word[:-2]} kit').get_json()
+    assert [r['id'] for r in body['restaurants']] == [restaurant_id]
+    assert client.get('/restaurants/search?q=').status_code == 400
+    assert client.get('/restaurants/search?q=%22*').get_json()['restaurants'] == []